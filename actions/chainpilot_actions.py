@@ -1,44 +1,104 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
 from web3 import Web3
 import web3
 from web3.exceptions import TransactionNotFound, TimeExhausted, ContractLogicError
+from web3.logs import DISCARD
 import time
 from datetime import datetime
-from utils import load_abi, get_logger
-from config import CONTRACT_ADDRESSES, NETWORK
+from itertools import islice
+from utils import load_abi, get_logger, batch_call
+from config import CONFIRMATION, CONTRACT_ADDRESSES, SIMULATION, TASK_LISTING, WALLET_POOL
+from tx_manager import TransactionManager, get_transaction_manager, suggest_fees
+from signer import get_pool_signers, get_signer
+from wallet_pool import WalletPool
+from erc20 import ERC20Client
+from payments import PaymentsBatcher
+from tx_simulator import RevertDecoder, TransactionSimulator
+from rpc_recorder import make_provider
+from tx_history import get_tx_history
+from confirmation import ConfirmationPolicy, ConfirmationTracker, policy_for
+from tx_encoder import ContractEncoder, checksum, task_hash as compute_task_hash
 
 logger = get_logger(__name__)
 
+# "active" is every task not yet cancelled or executed (the Scheduler marks both isCancelled).
+TASK_STATUSES = ("active", "pending", "expired", "closed", "all")
+
+# Contract names to ABI file names
+ABI_NAMES = {
+    "Executor": "ChainPilotExecutor",
+    "Scheduler": "ChainPilotScheduler",
+    "Payments": "PaymentsModule"
+}
+
 class ChainPilotActions:
-    def __init__(self, wallet_address: str, private_key: str):
-        self.w3 = Web3(Web3.HTTPProvider(NETWORK["rpc_url"]))
+    def __init__(self, wallet_address: str, private_key: Optional[str] = None,
+                 pool_private_keys: Optional[List[str]] = None):
+        self.w3 = Web3(make_provider())
+        self._contracts: Dict[str, Any] = {}
+        self._encoders: Dict[str, ContractEncoder] = {}
         if not self.w3.is_connected():
             raise ConnectionError("Failed to connect to Base mainnet. Check the RPC URL.")
         
-        if not private_key.startswith("0x") or len(private_key) != 66 or len(bytes.fromhex(private_key[2:])) != 32:
+        if private_key is not None and (not private_key.startswith("0x") or len(private_key) != 66 or len(bytes.fromhex(private_key[2:])) != 32):
             raise ValueError("Invalid private key length. Must be 32 bytes (66 hex chars with 0x prefix).")
         if not wallet_address.startswith("0x") or len(wallet_address) != 42:
             raise ValueError("Invalid wallet address format. Must be 0x followed by 40 hex characters.")
         
         self.wallet_address = Web3.to_checksum_address(wallet_address)
-        self.private_key = private_key
+        # With SIGNER_SOCKET set, the key stays in the signer process and private_key may be omitted.
+        self.signer = get_signer(private_key)
+        if self.signer.address != self.wallet_address:
+            raise ValueError(f"Signer address {self.signer.address} does not match wallet address {self.wallet_address}.")
+        self.tx_manager = get_transaction_manager(self.w3, self.signer)
+        # Independent sends are spread across the pool; scheduling and cancelling stay on the primary
+        # wallet because the Scheduler ties task ownership to msg.sender.
+        if pool_private_keys is None:
+            pool_private_keys = WALLET_POOL["private_keys"]
+        self.pool = WalletPool(self.w3, [self.signer] + get_pool_signers(pool_private_keys))
+        self.simulator = TransactionSimulator(
+            self.w3, RevertDecoder.from_abi_names(["ChainPilotExecutor", "ChainPilotScheduler"])
+        )
+        self.erc20 = ERC20Client(self.w3, self.tx_manager)
+        self._payments: Optional[PaymentsBatcher] = None
+        self.history = get_tx_history()
+        self.confirmations = ConfirmationTracker(self.w3)
         logger.info(f"Initialized ChainPilotActions with wallet address: {self.wallet_address}")
 
     def get_contract(self, contract_name: str) -> Any:
-        """Helper to get a contract instance."""
-        # Map contract names to ABI file names
-        abi_name_map = {
-            "Executor": "ChainPilotExecutor",
-            "Scheduler": "ChainPilotScheduler"
-        }
-        abi_name = abi_name_map.get(contract_name, contract_name)
-        contract_address = Web3.to_checksum_address(CONTRACT_ADDRESSES.get(contract_name))
-        if not contract_address:
+        """Helper to get a contract instance (built once per name; contracts are read-only)."""
+        if contract_name in self._contracts:
+            return self._contracts[contract_name]
+        abi_name = ABI_NAMES.get(contract_name, contract_name)
+        if not CONTRACT_ADDRESSES.get(contract_name):
             raise ValueError(f"Contract address for {contract_name} not found in config.")
+        contract_address = checksum(CONTRACT_ADDRESSES.get(contract_name))
         abi = load_abi(abi_name)["abi"]
-        return self.w3.eth.contract(address=contract_address, abi=abi)
+        self._contracts[contract_name] = self.w3.eth.contract(address=contract_address, abi=abi)
+        return self._contracts[contract_name]
+
+    def get_encoder(self, contract_name: str) -> ContractEncoder:
+        """Precompiled calldata encoder for a contract's writes (built once per name)."""
+        if contract_name not in self._encoders:
+            abi = load_abi(ABI_NAMES.get(contract_name, contract_name))["abi"]
+            self._encoders[contract_name] = ContractEncoder(self.get_contract(contract_name).address, abi)
+        return self._encoders[contract_name]
+
+    def _build_and_send_transaction(self, tx: Dict[str, Any], retries: int = 3, delay: int = 5,
+                                    tx_manager: Optional[TransactionManager] = None,
+                                    policy: Optional[ConfirmationPolicy] = None) -> Any:
+        """Send ``tx`` and wait for it to be mined; returns the mined hash, or a "Failed to execute" message.
+
+        With a ``policy``, waits as the policy says instead and returns
+        ``{"tx_hash", "receipt", "confirmation"}`` (no receipt for ``broadcast``).
+        """
+        tx_manager = tx_manager or self.tx_manager
+        if SIMULATION["enabled"]:
+            verdict = self.simulator.simulate(tx)
+            if not verdict["ok"]:
+                logger.warning(f"Pre-flight simulation rejected transaction: {verdict['message']}")
+                return f"Failed to execute: transaction would revert with {verdict['message']}"
 
-    def _build_and_send_transaction(self, tx: Dict[str, Any], retries: int = 3, delay: int = 5) -> str:
         try:
             gas_estimate = self.w3.eth.estimate_gas(tx)
             tx['gas'] = int(gas_estimate * 1.5)
@@ -48,24 +108,28 @@ class ChainPilotActions:
             tx['gas'] = 1_000_000
 
         if 'maxFeePerGas' not in tx or 'maxPriorityFeePerGas' not in tx:
-            base_fee = self.w3.eth.get_block('latest')['baseFeePerGas']
-            max_priority_fee = self.w3.eth.max_priority_fee
-            max_fee = int(base_fee * 1.5 + max_priority_fee)
-            tx['maxFeePerGas'] = max_fee
-            tx['maxPriorityFeePerGas'] = max_priority_fee
-            logger.info(f"Set maxFeePerGas: {max_fee}, maxPriorityFeePerGas: {max_priority_fee}")
+            tx.update(suggest_fees(self.w3))
+            logger.info(f"Set maxFeePerGas: {tx['maxFeePerGas']}, maxPriorityFeePerGas: {tx['maxPriorityFeePerGas']}")
 
         attempt = 0
         while attempt < retries:
             try:
-                signed_tx = self.w3.eth.account.sign_transaction(tx, self.private_key)
-                tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-                receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+                # The manager assigns the nonce and replaces the transaction with fee bumps while it is stuck.
+                tx_hash = tx_manager.send(tx)
+                if policy is not None and not policy.waits_for_receipt:
+                    logger.info(f"Transaction broadcast: {tx_hash} (policy: {policy})")
+                    return {"tx_hash": tx_hash, **self.confirmations.settle(tx_manager, tx_hash, policy)}
+                receipt = tx_manager.wait_for_receipt(tx_hash, timeout=CONFIRMATION["timeout"])
                 if receipt["status"] == 0:
                     raise ValueError("Transaction failed on the blockchain.")
-                logger.info(f"Transaction successful: {tx_hash.hex()}")
-                return tx_hash.hex()
-            except (TransactionNotFound, TimeExhausted, ValueError) as e:
+                mined_hash = receipt["transactionHash"].hex()
+                logger.info(f"Transaction successful: {mined_hash}")
+                break
+            except TimeExhausted as e:
+                # The nonce is still tracked by the replacement engine; resending would only queue a duplicate.
+                logger.error(f"Transaction still pending after fee bumps: {e}")
+                raise Exception(f"Transaction still pending after {tx_manager.max_bumps} fee bumps: {e}")
+            except (TransactionNotFound, ValueError) as e:
                 attempt += 1
                 logger.warning(f"Transaction attempt {attempt}/{retries} failed: {e}")
                 if attempt == retries:
@@ -80,6 +144,13 @@ class ChainPilotActions:
                 logger.error(f"Unexpected error during transaction: {e}")
                 raise e
 
+        if policy is None:
+            return mined_hash
+        # Outside the retry loop: a reorg or finality timeout must not resend an already-mined transaction.
+        outcome = self.confirmations.confirm(receipt, policy)
+        logger.info(f"Transaction {mined_hash} reached {outcome['confirmation']['status']} (policy: {policy})")
+        return {"tx_hash": outcome["receipt"]["transactionHash"].hex(), **outcome}
+
     def check_executor_permissions(self, wallet_provider: Dict, args: Dict[str, Any]) -> Dict[str, Any]:
         try:
             executor_contract = self.get_contract("Executor")
@@ -112,59 +183,43 @@ class ChainPilotActions:
             if not isinstance(args["amount"], (int, float)) or args["amount"] <= 0:
                 raise ValueError("Amount must be a positive number.")
 
-            to_address = Web3.to_checksum_address(args["to"])
-            executor_contract = self.get_contract("Executor")
+            to_address = checksum(args["to"])
+            executor = self.get_encoder("Executor")
 
             value_wei = self.w3.to_wei(args["amount"], "ether")
+            policy = policy_for("send_tokens", args.get("confirmation"), value_wei)
 
-            balance = self.w3.eth.get_balance(self.wallet_address)
-            if balance < value_wei:
-                raise ValueError(f"Insufficient ETH balance: {self.w3.from_wei(balance, 'ether')} ETH available, "
-                               f"{self.w3.from_wei(value_wei, 'ether')} ETH required.")
-
-            payload = Web3.to_hex(Web3.to_bytes(hexstr="0x"))
-            task_hash = Web3.keccak(hexstr=Web3.to_hex(Web3.solidity_keccak(
-                ['address', 'bytes', 'uint256'],
-                [to_address, Web3.to_bytes(hexstr=payload), value_wei]
-            )))
-            logger.info(f"Task hash: {task_hash.hex()}")
-
-            deadline = int(time.time()) + 86400
-            logger.info(f"Calling approveTask with target: {to_address}, payload: {payload}, value: {value_wei}, deadline: {deadline}")
-
-            approve_task_tx = executor_contract.functions.approveTask(
-                to_address,
-                Web3.to_bytes(hexstr=payload),
-                value_wei,
-                deadline
-            ).build_transaction({
-                'from': self.wallet_address,
-                'nonce': self.w3.eth.get_transaction_count(self.wallet_address),
-                'chainId': NETWORK["chain_id"],
-            })
-            approve_task_hash = self._build_and_send_transaction(approve_task_tx)
-            if isinstance(approve_task_hash, str) and "Failed to execute" in approve_task_hash:
-                return {"status": "error", "message": approve_task_hash}
-
-            execute_tx = executor_contract.functions.executeTask(
-                self.wallet_address,
-                to_address,
-                task_hash,
-                value_wei
-            ).build_transaction({
-                'from': self.wallet_address,
-                'value': value_wei,
-                'nonce': self.w3.eth.get_transaction_count(self.wallet_address) + 1,
-                'chainId': NETWORK["chain_id"],
-            })
-            execute_hash = self._build_and_send_transaction(execute_tx)
-            if isinstance(execute_hash, str) and "Failed to execute" in execute_hash:
-                return {"status": "error", "message": execute_hash}
+            # The balance check is the pool's in-memory ledger: value plus fees for approveTask and executeTask
+            # is held until each transaction reserves its own max cost.
+            fee_reserve = WALLET_POOL["send_gas_reserve"] * suggest_fees(self.w3)["maxFeePerGas"]
+            # approveTask and executeTask must come from the same wallet: approvals are keyed by msg.sender.
+            with self.pool.acquire(value_wei + fee_reserve) as wallet:
+                payload = b""
+                # executeTask looks the approval up by the contract's getTaskHash, computed here without an RPC.
+                task_hash = compute_task_hash(to_address, payload, value_wei)
+                logger.info(f"Task hash: {Web3.to_hex(task_hash)}")
 
-            return {
-                "status": "success",
-                "tx_hash": f"{approve_task_hash}, {execute_hash}"
-            }
+                deadline = int(time.time()) + 86400
+                logger.info(f"Calling approveTask with target: {to_address}, payload: 0x, value: {value_wei}, deadline: {deadline}")
+
+                approve_task_tx = executor.transaction("approveTask", to_address, payload, value_wei, deadline,
+                                                       sender=wallet.address)
+                approve_task_hash = self._build_and_send_transaction(approve_task_tx, tx_manager=wallet.tx_manager)
+                if isinstance(approve_task_hash, str) and "Failed to execute" in approve_task_hash:
+                    return {"status": "error", "message": approve_task_hash}
+
+                execute_tx = executor.transaction("executeTask", wallet.address, to_address, task_hash, value_wei,
+                                                  sender=wallet.address, value=value_wei)
+                # The approval always waits for inclusion (executeTask needs it); the policy applies to the transfer.
+                execute = self._build_and_send_transaction(execute_tx, tx_manager=wallet.tx_manager, policy=policy)
+                if isinstance(execute, str) and "Failed to execute" in execute:
+                    return {"status": "error", "message": execute}
+
+                return {
+                    "status": "success",
+                    "tx_hash": f"{approve_task_hash}, {execute['tx_hash']}",
+                    "confirmation": execute["confirmation"]
+                }
         except ValueError as ve:
             logger.warning(f"Validation error in send_tokens: {ve}")
             return {"status": "error", "message": str(ve)}
@@ -180,12 +235,60 @@ class ChainPilotActions:
             logger.error(f"Error sending tokens: {e}", exc_info=True)
             return {"status": "error", "message": str(e)}
 
+    def batch_send_tokens(self, wallet_provider: Dict, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Pay several recipients through PaymentsModule, chunked into gas-bounded batch transactions."""
+        try:
+            recipients = args.get("recipients") or []
+            if not recipients:
+                raise ValueError("Missing 'recipients' for batch send.")
+            for recipient in recipients:
+                if not recipient.get("to") or not isinstance(recipient.get("amount"), (int, float)) or recipient["amount"] <= 0:
+                    raise ValueError("Each recipient needs a 'to' address and a positive 'amount'.")
+
+            if self._payments is None:
+                self._payments = PaymentsBatcher(self.w3, self.get_contract("Payments"), self.erc20)
+
+            token = args.get("token")
+            total_wei = 0 if token else sum(self.w3.to_wei(r["amount"], "ether") for r in recipients)
+            policy = policy_for("batch_send_tokens", args.get("confirmation"), total_wei)
+            if not policy.waits_for_receipt:
+                # Per-recipient results come from the batch receipts, so batches always wait for inclusion.
+                policy = ConfirmationPolicy("inclusion")
+            if token:
+                results = self._payments.send_erc20(token, recipients)
+            else:
+                with self.pool.acquire(total_wei) as wallet:
+                    results = self._payments.send_eth(wallet.tx_manager, recipients)
+
+            failed = [r for r in results if r["status"] != "success"]
+            tx_hashes = list(dict.fromkeys(r["tx_hash"] for r in results))
+            confirmation: Dict[str, Any] = {"policy": str(policy), "status": "included"}
+            if policy.deeper_than_inclusion:
+                receipts = batch_call(self.w3, [(self.w3.eth.get_transaction_receipt, h) for h in tx_hashes])
+                confirmation["transactions"] = [self.confirmations.confirm(r, policy)["confirmation"] for r in receipts]
+                confirmation["status"] = policy.mode if policy.mode != "confirmations" else "confirmed"
+            logger.info(f"Batch send paid {len(results) - len(failed)}/{len(results)} recipients in {len(tx_hashes)} transaction(s)")
+            return {
+                "status": "error" if failed else "success",
+                "message": (f"Paid {len(results) - len(failed)} of {len(results)} recipients "
+                            f"in {len(tx_hashes)} batch transaction(s)."),
+                "tx_hash": ", ".join(tx_hashes),
+                "results": results,
+                "confirmation": confirmation,
+            }
+        except ValueError as ve:
+            logger.warning(f"Validation error in batch_send_tokens: {ve}")
+            return {"status": "error", "message": str(ve)}
+        except Exception as e:
+            logger.error(f"Error in batch send: {e}", exc_info=True)
+            return {"status": "error", "message": str(e)}
+
     def schedule_transfers(self, wallet_provider: Dict[str, Any], args: Dict[str, Any]) -> Dict[str, Any]:
         try:
             scheduler_contract = self.get_contract("Scheduler")
             execute_at = int(args["time"])
             expiry_at = execute_at + 86400  # 24-hour expiry
-            target = Web3.to_checksum_address(args["to"])
+            target = checksum(args["to"])
             payload = b""
             value = 0  # Set to 0 as the function is not payable
 
@@ -194,23 +297,26 @@ class ChainPilotActions:
             if execute_at <= current_time:
                 raise ValueError("Schedule time must be in the future.")
 
-            tx = scheduler_contract.functions.scheduleTask(
-                execute_at, expiry_at, target, payload, value
-            ).build_transaction({
-                'from': self.wallet_address,
-                'nonce': self.w3.eth.get_transaction_count(self.wallet_address),
-                'chainId': NETWORK["chain_id"],
-                'value': 0  # Explicitly set value to 0
-            })
-            tx_hash = self._build_and_send_transaction(tx)
-            if isinstance(tx_hash, str) and "Failed to execute" in tx_hash:
-                return {"status": "error", "message": tx_hash}
+            tx = self.get_encoder("Scheduler").transaction(
+                "scheduleTask", execute_at, expiry_at, target, payload, value, sender=self.wallet_address
+            )
+            outcome = self._build_and_send_transaction(
+                tx, policy=policy_for("schedule_transfers", args.get("confirmation")))
+            if isinstance(outcome, str) and "Failed to execute" in outcome:
+                return {"status": "error", "message": outcome}
+            tx_hash, receipt = outcome["tx_hash"], outcome["receipt"]
+            # Broadcast-only schedules have no receipt yet; the chain watcher records their task id.
+            if self.history and receipt is not None:
+                for event in scheduler_contract.events.TaskScheduled().process_receipt(receipt, errors=DISCARD):
+                    self.history.record_task(event["args"]["taskId"], "task_scheduled",
+                                             Web3.to_hex(receipt["transactionHash"]), self.wallet_address)
 
             logger.info(f"Scheduled transfer with tx hash: {tx_hash}")
             return {
                 "status": "success",
                 "message": f"Scheduled transfer to {target} at {datetime.fromtimestamp(execute_at).strftime('%Y-%m-%d %H:%M:%S')}.",
-                "tx_hash": tx_hash
+                "tx_hash": tx_hash,
+                "confirmation": outcome["confirmation"]
             }
         except ValueError as ve:
             logger.warning(f"Validation error in schedule_transfers: {ve}")
@@ -219,24 +325,75 @@ class ChainPilotActions:
             logger.error(f"Error scheduling transfer: {e}", exc_info=True)
             return {"status": "error", "message": str(e)}
 
-    def list_tasks(self, wallet_provider: Dict, args: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            scheduler_contract = self.get_contract("Scheduler")
-            task_count = scheduler_contract.functions.taskIdCounter().call()
+    def iter_tasks(self, after: Optional[int] = None, status: str = "active", since: Optional[int] = None,
+                   until: Optional[int] = None, chunk_size: int = TASK_LISTING["chunk_size"]) -> Iterator[Dict[str, Any]]:
+        """Yield this wallet's tasks in task id order, starting after task id ``after``.
+
+        Task ids are resolved ``chunk_size`` at a time with one batched read and only that chunk
+        is held, so the first task arrives after a single round trip and memory stays flat
+        however many tasks exist. ``since``/``until`` filter on the execution time. Arguments
+        are validated eagerly; a ValueError is raised before anything is read.
+        """
+        if status not in TASK_STATUSES:
+            raise ValueError(f"Invalid task status '{status}'. Use one of: {', '.join(TASK_STATUSES)}.")
+        if after is not None and after < 0:
+            raise ValueError("'after' must be a task ID (0 or greater).")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1.")
+        return self._scan_tasks(-1 if after is None else after, status, since, until, chunk_size)
+
+    def _scan_tasks(self, after: int, status: str, since: Optional[int], until: Optional[int],
+                    chunk_size: int) -> Iterator[Dict[str, Any]]:
+        scheduler_contract = self.get_contract("Scheduler")
+        task_count = scheduler_contract.functions.taskIdCounter().call()
+        for start in range(after + 1, task_count, chunk_size):
+            task_ids = range(start, min(start + chunk_size, task_count))
+            tasks = batch_call(self.w3, [scheduler_contract.functions.tasks(task_id) for task_id in task_ids])
+            now = int(time.time())
             jobs = []
+            for task_id, task in zip(task_ids, tasks):
+                if task[2].lower() != self.wallet_address.lower():
+                    continue
+                state = "closed" if task[7] else "expired" if task[1] and now > task[1] else "pending"
+                if status == "active" and state == "closed" or status not in ("active", "all") and state != status:
+                    continue
+                if since is not None and task[0] < since or until is not None and task[0] >= until:
+                    continue
+                jobs.append({
+                    "task_id": task_id,
+                    "timestamp": task[0],
+                    "to_address": task[4],
+                    "amount": self.w3.from_wei(task[6], "ether") if task[6] else 0,
+                    "status": state,
+                    "tx_hash": "N/A"
+                })
+            if jobs and self.history:
+                recorded = self.history.task_transactions([job["task_id"] for job in jobs])
+                for job in jobs:
+                    job["tx_hash"] = (recorded.get(job["task_id"]) or {}).get("scheduled_tx") or "N/A"
+            yield from jobs
 
-            for task_id in range(task_count):
-                task = scheduler_contract.functions.tasks(task_id).call()
-                if task[2].lower() == self.wallet_address.lower() and not task[7]:  # owner and not cancelled
-                    jobs.append({
-                        "task_id": task_id,
-                        "timestamp": task[0],
-                        "to_address": task[4],
-                        "amount": self.w3.from_wei(task[6], "ether") if task[6] else 0,
-                        "tx_hash": "N/A"
-                    })
-            logger.info(f"Found {len(jobs)} active tasks for {self.wallet_address}")
-            return {"status": "success", "jobs": jobs}
+    def list_tasks(self, wallet_provider: Dict, args: Dict[str, Any]) -> Dict[str, Any]:
+        """One page of tasks: ``args`` takes limit, after (task id cursor), status, since and until.
+
+        ``next_cursor`` is the last task id of a full page (pass it back as ``after``) and None
+        once the listing is exhausted. It is not probed ahead, since finding the next match could
+        mean scanning every remaining task; a full final page is followed by one empty page.
+        """
+        try:
+            limit = int(args.get("limit") or TASK_LISTING["page_size"])
+            if not 1 <= limit <= TASK_LISTING["max_page_size"]:
+                raise ValueError(f"limit must be between 1 and {TASK_LISTING['max_page_size']}.")
+            tasks = self.iter_tasks(after=args.get("after"), status=args.get("status") or "active",
+                                    since=args.get("since"), until=args.get("until"))
+            jobs = list(islice(tasks, limit))
+            tasks.close()
+            next_cursor = jobs[-1]["task_id"] if len(jobs) == limit else None
+            logger.info(f"Found {len(jobs)} tasks for {self.wallet_address} (next cursor: {next_cursor})")
+            return {"status": "success", "jobs": jobs, "next_cursor": next_cursor}
+        except ValueError as ve:
+            logger.warning(f"Validation error in list_tasks: {ve}")
+            return {"status": "error", "message": str(ve)}
         except Exception as e:
             logger.error(f"Error listing tasks: {e}", exc_info=True)
             return {"status": "error", "message": str(e)}
@@ -257,16 +414,15 @@ class ChainPilotActions:
             if task[7]:
                 raise ValueError(f"Task ID {task_id} is already cancelled.")
 
-            tx = scheduler_contract.functions.cancelTask(task_id).build_transaction({
-                'from': self.wallet_address,
-                'nonce': self.w3.eth.get_transaction_count(self.wallet_address),
-                'chainId': NETWORK["chain_id"],
-            })
-            tx_hash = self._build_and_send_transaction(tx)
-            if isinstance(tx_hash, str) and "Failed to execute" in tx_hash:
-                return {"status": "error", "message": tx_hash}
+            tx = self.get_encoder("Scheduler").transaction("cancelTask", task_id, sender=self.wallet_address)
+            outcome = self._build_and_send_transaction(tx, policy=policy_for("cancel_tasks", args.get("confirmation")))
+            if isinstance(outcome, str) and "Failed to execute" in outcome:
+                return {"status": "error", "message": outcome}
+            tx_hash = outcome["tx_hash"]
+            if self.history:
+                self.history.record_task(task_id, "task_cancelled", Web3.to_hex(hexstr=tx_hash), self.wallet_address)
             logger.info(f"Cancelled task {task_id} with tx hash: {tx_hash}")
-            return {"status": "success", "tx_hash": tx_hash}
+            return {"status": "success", "tx_hash": tx_hash, "confirmation": outcome["confirmation"]}
         except ValueError as ve:
             logger.warning(f"Validation error in cancel_tasks: {ve}")
             return {"status": "error", "message": str(ve)}
@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
+
+from utils import get_logger
+from config import ADMISSION
+
+logger = get_logger(__name__)
+
+# Lower number runs first. Sends and cancels are time-critical; reads can wait or be shed.
+LANE_PRIORITY = {"high": 0, "normal": 1, "low": 2}
+ACTION_LANES = {
+    "send_tokens": "high",
+    "batch_send_tokens": "high",
+    "cancel_tasks": "high",
+    "schedule_transfers": "normal",
+    "create_trigger": "normal",
+    "list_tasks": "low",
+    "check_executor_permissions": "low",
+    "check_scheduler_permissions": "low",
+    "help": "low",
+}
+
+
+def lane_for(action: Optional[str]) -> str:
+    # Unparsed input (e.g. a "yes" confirmation reply) is treated as ordinary work.
+    return ACTION_LANES.get(action, "normal")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; ``retry_after`` is the suggested wait in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class AdmissionController:
+    """Per-client rate limits plus a bounded, prioritised queue in front of command execution.
+
+    ``check_rate`` applies a token bucket per client and one per (client, action) for actions
+    with their own limit; both must have a token or neither is charged. ``slot`` caps concurrent
+    executions at ``max_concurrency``. Requests that cannot start immediately wait in a priority
+    queue (high lane before normal before low, FIFO within a lane). Each lane holds at most
+    ``max_queue[lane]`` waiters and nobody waits longer than ``max_wait``; either limit sheds
+    the request with AdmissionRejected so overload turns into fast 429s instead of a growing
+    tail. Long-lived streams never take a command slot: ``open_stream`` admits at most
+    ``max_streams`` of them, without queueing. All state lives on the event loop, so no
+    locking is needed.
+    """
+
+    def __init__(self, client_rate: float = ADMISSION["client_rate"], client_burst: float = ADMISSION["client_burst"],
+                 action_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_concurrency: int = ADMISSION["max_concurrency"],
+                 max_queue: Optional[Dict[str, int]] = None,
+                 max_wait: float = ADMISSION["max_wait"], idle_ttl: float = ADMISSION["idle_ttl"],
+                 max_streams: int = ADMISSION["max_streams"]):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.action_limits = ADMISSION["action_limits"] if action_limits is None else action_limits
+        self.max_concurrency = max_concurrency
+        self.max_queue = ADMISSION["max_queue"] if max_queue is None else max_queue
+        self.max_wait = max_wait
+        self.idle_ttl = idle_ttl
+        self.max_streams = max_streams
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._last_prune = time.monotonic()
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued: Counter = Counter()
+        self._sequence = itertools.count()
+        self._streams = 0
+        self._service_time = 1.0  # EWMA of execution seconds, used for Retry-After
+        self.shed: Counter = Counter()
+
+    def _bucket(self, key: Hashable, rate: float, burst: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        # Idle buckets have refilled completely, so dropping them is indistinguishable from keeping them.
+        if now - self._last_prune < self.idle_ttl:
+            return
+        self._last_prune = now
+        for key in [k for k, b in self._buckets.items() if now - b.updated > self.idle_ttl]:
+            del self._buckets[key]
+
+    def check_rate(self, client: str, action: Optional[str]) -> None:
+        now = time.monotonic()
+        self._prune(now)
+        buckets = [self._bucket(("client", client), self.client_rate, self.client_burst)]
+        if action in self.action_limits:
+            buckets.append(self._bucket(("action", client, action), *self.action_limits[action]))
+        wait = max(bucket.wait_time(now) for bucket in buckets)
+        if wait > 0:
+            self.shed["rate_limited"] += 1
+            raise AdmissionRejected(f"Rate limit exceeded for {action or 'command'}; slow down.", wait)
+        for bucket in buckets:
+            bucket.take()
+
+    def _retry_after(self) -> float:
+        backlog = sum(self._queued.values()) + self._active
+        return max(1.0, self._service_time * backlog / self.max_concurrency)
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():  # skip waiters that timed out or disconnected
+                waiter.set_result(None)  # hand the slot over without freeing it
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, action: Optional[str]) -> AsyncIterator[None]:
+        lane = lane_for(action)
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+        else:
+            if self._queued[lane] >= self.max_queue[lane]:
+                self.shed[f"{lane}_queue_full"] += 1
+                raise AdmissionRejected(f"Server busy: {lane}-priority queue is full.", self._retry_after())
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (LANE_PRIORITY[lane], next(self._sequence), waiter))
+            self._queued[lane] += 1
+            try:
+                await asyncio.wait_for(waiter, self.max_wait)
+            except asyncio.TimeoutError:
+                self.shed[f"{lane}_wait_timeout"] += 1
+                raise AdmissionRejected(f"Server busy: queued longer than {self.max_wait:g}s.", self._retry_after())
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release()  # the slot was handed over just as the client went away
+                raise
+            finally:
+                self._queued[lane] -= 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+            self._release()
+
+    def open_stream(self) -> Callable[[], None]:
+        """Admit a stream against its own budget; returns its release, which is safe to call more than once."""
+        if self._streams >= self.max_streams:
+            self.shed["streams_full"] += 1
+            # An open stream has no predictable end, so suggest the longest a command would be queued.
+            raise AdmissionRejected("Server busy: too many open streams.", self.max_wait)
+        self._streams += 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._streams -= 1
+        return release
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "streams": self._streams,
+            "queued": {lane: self._queued[lane] for lane in LANE_PRIORITY},
+            "shed": dict(self.shed),
+            "service_time": round(self._service_time, 3),
+            "tracked_buckets": len(self._buckets),
+        }
+
+
+def retry_after_header(rejection: AdmissionRejected) -> Dict[str, str]:
+    return {"Retry-After": str(math.ceil(rejection.retry_after))}
@@ -1,14 +1,32 @@
-from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from chatbot import ChainPilotAgent
+from idempotency import IdempotencyStore
+from admission import AdmissionController, AdmissionRejected, retry_after_header
+from nlp_parser import parse_command
+from intent_parser import unconfirmed
+from chain_watcher import ChainWatcher
+from event_bus import EventLog, bus
+from config import ADMISSION, WATCHER
+from shared_state import get_nonce_store, get_shared_store, get_wallet_store
+from triggers import get_trigger_store, normalize_condition
+from tx_simulator import RevertDecoder
+from utils import preload_abis
+from web3 import Web3
 from typing import Optional
 from dotenv import load_dotenv
 import os
 import logging
 import logging.handlers
 from datetime import datetime
+import asyncio
+import json
+import threading
 
 # Configure logging with rotation
 logger = logging.getLogger(__name__)
@@ -72,12 +90,26 @@ app.add_middleware(
 class CommandRequest(BaseModel):
     command: str
     confirm: Optional[bool] = None
+    idempotency_key: Optional[str] = None  # alternative to the Idempotency-Key header
+    confirmation: Optional[str] = None  # broadcast | inclusion | confirmations:N | safe | finalized
 
 class CommandResponse(BaseModel):
     status: str
-    message: str
+    message: str = ""
     tx_hash: Optional[str] = None
     jobs: Optional[list] = None
+    next_cursor: Optional[int] = None
+    results: Optional[list] = None
+    confirmation: Optional[dict] = None
+
+class TriggerRequest(BaseModel):
+    command: str  # e.g. "send 0.1 ETH to 0x..."
+    conditions: list  # all must hold, e.g. [{"type": "base_fee", "op": "<", "value": 0.05}]
+    once: bool = True
+    cooldown_blocks: int = 0  # for repeating triggers: blocks to wait after each firing
+    max_fires: Optional[int] = None  # for repeating triggers; defaults to TRIGGERS_MAX_FIRES
+    expires_at: Optional[int] = None  # unix seconds
+    confirm: bool = False  # required when only the language model could interpret a fund-moving command
 
 # Initialize agent
 def initialize_agent(max_retries=3):
@@ -93,7 +125,58 @@ def initialize_agent(max_retries=3):
                 raise HTTPException(status_code=500, detail=f"Failed to initialize ChainPilotAgent: {str(e)}")
             continue
 
-agent = initialize_agent()
+# Read-only and shared state is built at import: under `gunicorn --preload` that happens once in the master
+# and every worker inherits it. The agent holds RPC sessions, threads and the ledger's SQLite handle, none of
+# which survive a fork, so each worker builds its own on first use.
+preload_abis()
+RevertDecoder.from_abi_names(["ChainPilotExecutor", "ChainPilotScheduler"])
+shared_store = get_shared_store()
+get_nonce_store()
+get_wallet_store()
+
+idempotency_store = IdempotencyStore()
+admission = AdmissionController()
+_agent: Optional[ChainPilotAgent] = None
+_watcher: Optional[ChainWatcher] = None
+_agent_lock = threading.Lock()
+
+def get_agent() -> ChainPilotAgent:
+    global _agent, _watcher
+    with _agent_lock:
+        if _agent is None:
+            # Opened per worker (SQLite handles do not survive the fork); every worker appends to and tails one log.
+            bus.attach_log(EventLog())
+            _agent = initialize_agent()
+            # One watcher per worker tracks its own transactions; duplicate task events collapse in the shared log.
+            _watcher = ChainWatcher(_agent.actions.w3, _agent.actions.get_contract("Scheduler"))
+            _watcher.add_head_listener(_agent.actions.pool.note_head)
+        return _agent
+
+def client_id(req: Request) -> str:
+    # Behind a trusted proxy (ADMISSION_TRUST_FORWARDED_FOR) the first X-Forwarded-For hop is the real client.
+    if ADMISSION["trust_forwarded_for"]:
+        forwarded = req.headers.get("x-forwarded-for", "").split(",")[0].strip()
+        if forwarded:
+            return forwarded
+    return req.client.host
+
+def check_rate(req: Request, action: str) -> None:
+    """Per-client rate limit, as for /command; raises 429 when exceeded."""
+    try:
+        admission.check_rate(client_id(req), action)
+    except AdmissionRejected as rejected:
+        logger.warning(f"Rate limited {action} from IP: {req.client.host}")
+        raise HTTPException(status_code=429, detail={"error": str(rejected)}, headers=retry_after_header(rejected))
+
+async def run_admitted(req: Request, action: str, fn, *args, **kwargs):
+    """Run blocking ``fn`` on the threadpool behind the same rate limit and priority lanes as /command."""
+    check_rate(req, action)
+    try:
+        async with admission.slot(action):
+            return await run_in_threadpool(fn, *args, **kwargs)
+    except AdmissionRejected as rejected:
+        logger.warning(f"Shedding {action} from IP: {req.client.host}: {rejected}")
+        raise HTTPException(status_code=429, detail={"error": str(rejected)}, headers=retry_after_header(rejected))
 
 # Custom exception handler
 @app.exception_handler(Exception)
@@ -122,36 +205,236 @@ async def root_head():
     response_model=dict,
 )
 async def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "admission": admission.status(), "shared_state": shared_store.stats()}
 
 @app.post(
     "/command",
     summary="Execute a ChainPilot command",
-    description="Supported commands: check_executor_permissions, check_scheduler_permissions, send_tokens, schedule_transfers, list_tasks, cancel_tasks, help.",
+    description="Supported commands: check_executor_permissions, check_scheduler_permissions, send_tokens, schedule_transfers, list_tasks (first page; see /tasks and /tasks/stream), cancel_tasks, help. Send an Idempotency-Key header (or idempotency_key field) to make retries safe: repeats return the stored or in-progress result instead of executing again. Requests are rate limited per client and action; under load, sends and cancels run ahead of reads and excess requests get 429 with Retry-After. `confirmation` picks how long a send waits (broadcast, inclusion, confirmations:N, safe, finalized); the policy applied is reported in the response.",
     response_model=CommandResponse,
 )
-async def command(request: CommandRequest, req: Request):
+async def command(request: CommandRequest, req: Request, response: Response,
+                  idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
     client_ip = req.client.host
     logger.info(f"Received {req.method} request for command: {request.command} from IP: {client_ip}")
+    key = idempotency_key or request.idempotency_key
+    # Rules only: lane classification must not wait on the LLM tier (free-form commands land in the normal lane).
+    action = parse_command(request.command).get("action")
+
+    async def execute():
+        try:
+            async with admission.slot(action):
+                return await run_in_threadpool(get_agent().process_command, request.command, confirm=request.confirm,
+                                             confirmation=request.confirmation)
+        except AdmissionRejected as rejected:
+            logger.warning(f"Shedding {action or 'command'} from IP: {client_ip}: {rejected}")
+            raise HTTPException(status_code=429, detail={"error": str(rejected)}, headers=retry_after_header(rejected))
+
     try:
-        response = agent.process_command(request.command, confirm=request.confirm)
-        if response.get("status") == "error":
-            logger.warning(f"Command failed: {response.get('message')} from IP: {client_ip}")
-            raise HTTPException(status_code=400, detail={"error": response.get("message", "Command execution failed")})
+        try:
+            admission.check_rate(client_id(req), action)
+        except AdmissionRejected as rejected:
+            logger.warning(f"Rate limited {action or 'command'} from IP: {client_ip}")
+            raise HTTPException(status_code=429, detail={"error": str(rejected)}, headers=retry_after_header(rejected))
+        if key:
+            try:
+                future, owner = idempotency_store.begin(key, (request.command, request.confirm, request.confirmation))
+            except ValueError as ve:
+                raise HTTPException(status_code=422, detail={"error": str(ve)})
+            if owner:
+                try:
+                    result = await execute()
+                except Exception as e:
+                    idempotency_store.fail(key, e)
+                    raise
+                idempotency_store.finish(key, result)
+            else:
+                logger.info(f"Replaying result for Idempotency-Key {key} from IP: {client_ip}")
+                response.headers["Idempotent-Replayed"] = "true"
+                result = await asyncio.wrap_future(future)
+        else:
+            result = await execute()
+        if result.get("status") == "error":
+            logger.warning(f"Command failed: {result.get('message')} from IP: {client_ip}")
+            raise HTTPException(status_code=400, detail={"error": result.get("message", "Command execution failed")})
         logger.info("Command executed successfully.")
-        return CommandResponse(**response)
+        return CommandResponse(**result)
     except HTTPException as he:
         raise he
     except Exception as e:
         logger.error(f"Error processing command: {str(e)} from IP: {client_ip}", exc_info=True)
         raise HTTPException(status_code=500, detail={"error": f"Error processing command: {str(e)}"})
 
+@app.get(
+    "/history",
+    summary="Query the local transaction history",
+    description="Newest first. Filter by wallet, status (pending, confirmed, failed, replaced) and broadcast time range (unix seconds); page with the returned next_cursor. Served from the local ledger without RPC calls.",
+    response_model=dict,
+)
+async def history(wallet: Optional[str] = None, status: Optional[str] = None, since: Optional[float] = None,
+                  until: Optional[float] = None, cursor: Optional[int] = None, limit: int = 50):
+    ledger = get_agent().actions.history
+    if ledger is None:
+        raise HTTPException(status_code=404, detail={"error": "Transaction history is disabled (TX_HISTORY_ENABLED=false)."})
+    if wallet is not None:
+        if not Web3.is_address(wallet):
+            raise HTTPException(status_code=400, detail={"error": "Invalid wallet address."})
+        wallet = Web3.to_checksum_address(wallet)
+    if status is not None and status not in ("pending", "confirmed", "failed", "replaced"):
+        raise HTTPException(status_code=400, detail={"error": "status must be pending, confirmed, failed or replaced."})
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail={"error": "limit must be between 1 and 500."})
+    return await run_in_threadpool(ledger.query, wallet=wallet, status=status, since=since, until=until,
+                                   cursor=cursor, limit=limit)
+
+@app.get(
+    "/tasks",
+    summary="List the agent wallet's scheduled tasks, one page at a time",
+    description="Task id order. Filter by status (active, pending, expired, closed, all) and execution time range (unix seconds); pass the returned next_cursor as `after` for the next page.",
+    response_model=CommandResponse,
+)
+async def tasks(req: Request, after: Optional[int] = None, status: str = "active", since: Optional[int] = None,
+                until: Optional[int] = None, limit: Optional[int] = None):
+    result = await run_admitted(req, "list_tasks", get_agent().actions.list_tasks, {},
+                                {"after": after, "status": status, "since": since, "until": until, "limit": limit})
+    if result.get("status") == "error":
+        raise HTTPException(status_code=400, detail={"error": result.get("message")})
+    return CommandResponse(**result)
+
+@app.get(
+    "/tasks/stream",
+    summary="Stream the agent wallet's scheduled tasks as NDJSON",
+    description="Same filters as /tasks, without a page limit: one JSON task per line, written as each batch of task ids is resolved. A failure mid-stream ends it with an {\"error\": ...} line. Open streams have their own per-worker budget (ADMISSION_MAX_STREAMS) and never take a command slot; past it the request gets 429.",
+)
+async def tasks_stream(req: Request, after: Optional[int] = None, status: str = "active",
+                       since: Optional[int] = None, until: Optional[int] = None):
+    check_rate(req, "list_tasks")
+    try:
+        scan = get_agent().actions.iter_tasks(after=after, status=status, since=since, until=until)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail={"error": str(ve)})
+    # Taken before the response starts, so a shed stream still gets a 429 rather than a truncated body.
+    try:
+        release = admission.open_stream()
+    except AdmissionRejected as rejected:
+        logger.warning(f"Shedding task stream from IP: {req.client.host}: {rejected}")
+        raise HTTPException(status_code=429, detail={"error": str(rejected)}, headers=retry_after_header(rejected))
+    logger.info(f"Task stream opened from IP: {req.client.host}")
+
+    def lines():
+        try:
+            for job in scan:
+                yield json.dumps(jsonable_encoder(job)) + "\n"
+        except Exception as e:
+            logger.error(f"Task stream failed: {e}", exc_info=True)
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    async def body():
+        try:
+            # Each chunk of task ids is read on a worker thread, so the event loop never waits on RPC.
+            async for line in iterate_in_threadpool(lines()):
+                yield line
+        finally:
+            release()  # a client that disconnects mid-stream frees the stream at once
+
+    # The response owns the stream slot from here: its background task releases it even if the body never starts.
+    try:
+        return StreamingResponse(body(), media_type="application/x-ndjson", background=BackgroundTask(release),
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    except Exception:
+        release()
+        raise
+
+@app.post(
+    "/triggers",
+    summary="Register a command to run when on-chain conditions hold",
+    description="Conditions (all must hold): balance {address, op, value in ETH}, token_balance {token, address, op, value in tokens}, base_fee {op, value in gwei}, time_window {start, end} and block {op, value}; op is one of >, >=, <, <=, ==. The trigger engine (python triggers.py) checks every active trigger on each new block. A fund-moving command that only the language model could interpret is rejected unless confirm is true.",
+    response_model=dict,
+)
+async def create_trigger(request: TriggerRequest, req: Request):
+    agent = get_agent()
+
+    def register():
+        parsed = agent.parser.parse(request.command)
+        args = agent._map_action_args(parsed)  # the same validation the command would get when sent directly
+        if unconfirmed(parsed, request.confirm):
+            raise ValueError(f"Command was interpreted as {parsed['action']} with {args}; "
+                             f"resend with confirm: true to register it.")
+        conditions = [normalize_condition(condition, agent.actions.erc20.to_base_units)
+                      for condition in request.conditions]
+        return get_trigger_store().add(request.command, parsed, conditions, once=request.once,
+                                       cooldown_blocks=request.cooldown_blocks, expires_at=request.expires_at,
+                                       max_fires=request.max_fires)
+
+    try:
+        trigger_id = await run_admitted(req, "create_trigger", register)
+    except (ValueError, AttributeError, TypeError) as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+    logger.info(f"Registered trigger {trigger_id}: {request.command}")
+    return {"status": "success", "trigger": get_trigger_store().get(trigger_id)}
+
+@app.get(
+    "/triggers",
+    summary="List registered triggers",
+    description="Filter by status: active, firing, fired, failed, expired or cancelled.",
+    response_model=dict,
+)
+async def list_triggers(status: Optional[str] = None):
+    return {"status": "success", "triggers": await run_in_threadpool(get_trigger_store().list, status)}
+
+@app.delete(
+    "/triggers/{trigger_id}",
+    summary="Cancel an active trigger",
+    response_model=dict,
+)
+async def cancel_trigger(trigger_id: int):
+    if not await run_in_threadpool(get_trigger_store().cancel, trigger_id):
+        raise HTTPException(status_code=404, detail={"error": f"No active trigger {trigger_id}."})
+    return {"status": "success", "message": f"Trigger {trigger_id} cancelled."}
+
+@app.get(
+    "/events",
+    summary="Stream wallet events (Server-Sent Events)",
+    description="Pushes tx_broadcast, tx_replaced, tx_confirmed, tx_failed, tx_reorged, task_scheduled, task_cancelled and task_executed events. Filters to `wallet` if given, otherwise to the agent's wallets. Events from every server worker reach every stream, with one id sequence, so reconnecting clients resume after Last-Event-ID on any worker.",
+)
+async def events(req: Request, wallet: Optional[str] = None,
+                 last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")):
+    if wallet is not None and not Web3.is_address(wallet):
+        raise HTTPException(status_code=400, detail={"error": "Invalid wallet address."})
+    wallets = [wallet] if wallet else get_agent().actions.pool.addresses
+    resume_from = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    subscription = bus.subscribe(wallets, resume_from)
+    logger.info(f"Event stream opened for {', '.join(wallets)} from IP: {req.client.host} ({bus.subscriber_count} connected)")
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), WATCHER["heartbeat"])
+                except asyncio.TimeoutError:
+                    if await req.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            bus.unsubscribe(subscription)
+            logger.info(f"Event stream closed from IP: {req.client.host}")
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.on_event("startup")
 async def startup_event():
+    await run_in_threadpool(get_agent)
+    _watcher.start()
     logger.info("ChainPilot API started.")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if _watcher is not None:
+        _watcher.stop()
     logger.info("ChainPilot API shutting down.")
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+"""End-to-end latency/throughput benchmark for ChainPilotAgent and the /command API.
+
+Usage (from the repository root, with ``npx hardhat node`` running)::
+
+    python -m benchmarks.e2e_benchmark --commands 200 --concurrency 8 --mix send=4,schedule=2,list=3,cancel=1
+    python -m benchmarks.e2e_benchmark --target api --output results.json
+
+Contracts are deployed fresh and the agent is pointed at the local node through the RPC_URL,
+CHAIN_ID and CONTRACT_* environment variables before it is imported. ``--target agent`` calls
+``ChainPilotAgent.process_command`` directly; ``--target api`` goes through the FastAPI app
+in-process. Commands are drawn from the weighted ``--mix`` and issued from ``--concurrency``
+threads. The report (JSON) holds p50/p95/p99 latency overall and per command kind,
+transactions/s and JSON-RPC requests/calls per command, so runs can be diffed over time.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from eth_account import Account
+
+from benchmarks.local_chain import RPCCounter, connect, deploy_core_contracts, fund_wallets
+
+COMMAND_KINDS = ("send", "schedule", "list", "cancel")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in COMMAND_KINDS:
+            raise ValueError(f"Unknown command kind '{kind}'; expected one of {', '.join(COMMAND_KINDS)}.")
+        weights[kind] = int(weight or 1)
+    return weights
+
+
+def configure_environment(rpc_url: str, chain_id: int, addresses: Dict[str, str], keys: List[str]) -> None:
+    """Point config.py at the local chain; must run before chatbot/api are imported."""
+    os.environ.update({
+        "RPC_URL": rpc_url,
+        "CHAIN_ID": str(chain_id),
+        "CONTRACT_EXECUTOR_ADDRESS": addresses["Executor"],
+        "CONTRACT_SCHEDULER_ADDRESS": addresses["Scheduler"],
+        "WALLET_ADDRESS": Account.from_key(keys[0]).address,
+        "WALLET_PRIVATE_KEY": keys[0],
+        "WALLET_POOL_PRIVATE_KEYS": ",".join(keys[1:]),
+    })
+    os.environ.pop("SIGNER_SOCKET", None)
+    # api.py refuses to start without these even though the agent reads RPC_URL/CHAIN_ID above.
+    os.environ.update({"NETWORK_RPC_URL": rpc_url, "NETWORK_CHAIN_ID": str(chain_id)})
+    for name in ("ALCHEMY_API_KEY", "BASESCAN_API_KEY"):
+        os.environ.setdefault(name, "unused")
+
+
+def make_runner(target: str) -> Callable[[str, Optional[bool]], Dict[str, Any]]:
+    if target == "agent":
+        from chatbot import ChainPilotAgent
+        agent = ChainPilotAgent()
+        return lambda command, confirm=None: agent.process_command(command, confirm=confirm)
+
+    from fastapi.testclient import TestClient
+    import api
+    client = TestClient(api.app)
+
+    def run(command: str, confirm: Optional[bool] = None) -> Dict[str, Any]:
+        response = client.post("/command", json={"command": command, "confirm": confirm})
+        body = response.json()
+        if response.status_code != 200:
+            detail = body.get("detail", body)
+            return {"status": "error", "message": detail.get("error") if isinstance(detail, dict) else str(detail)}
+        return body
+    return run
+
+
+class Workload:
+    """Builds benchmark commands; cancels consume task ids scheduled during setup."""
+
+    def __init__(self, mix: Dict[str, int], recipient: str, amount: float, seed: int):
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.recipient = recipient
+        self.amount = amount
+        self.random = random.Random(seed)
+        self.cancel_ids: List[int] = []
+
+    def plan(self, count: int) -> List[str]:
+        return self.random.choices(self.kinds, weights=self.weights, k=count)
+
+    def command(self, kind: str) -> Dict[str, Any]:
+        if kind == "send":
+            return {"command": f"send_tokens {self.amount} to {self.recipient}"}
+        if kind == "schedule":
+            # schedule_transfers validates against wall-clock time; an hour ahead also clears the contract's 60s minimum.
+            return {"command": f"schedule_transfers {self.amount} to {self.recipient} at {int(time.time()) + 3600}"}
+        if kind == "list":
+            return {"command": "list tasks"}
+        return {"command": f"cancel_tasks {self.cancel_ids.pop()}", "confirm": True}
+
+
+def prepare_cancels(run: Callable[..., Dict[str, Any]], workload: Workload, count: int) -> None:
+    for _ in range(count):
+        result = run(workload.command("schedule")["command"])
+        if result.get("status") != "success":
+            raise RuntimeError(f"Setup scheduling failed: {result.get('message')}")
+    jobs: List[Dict[str, Any]] = []
+    page = run("list tasks")
+    while True:
+        jobs += page.get("jobs") or []
+        if page.get("next_cursor") is None:
+            break
+        page = run(f"list tasks after {page['next_cursor']}")
+    workload.cancel_ids = [job["task_id"] for job in jobs][-count:] if count else []
+
+
+def summarize(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = [s["latency"] for s in samples]
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        statuses[sample["status"]] = statuses.get(sample["status"], 0) + 1
+    return {
+        "count": len(samples),
+        "statuses": statuses,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(max(latencies) if latencies else None),
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ChainPilot end-to-end benchmark")
+    parser.add_argument("--rpc", default="http://127.0.0.1:8545")
+    parser.add_argument("--target", choices=["agent", "api"], default="agent")
+    parser.add_argument("--commands", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--mix", default="send=4,schedule=2,list=3,cancel=1",
+                        help="Weighted command kinds, e.g. send=4,schedule=2,list=3,cancel=1")
+    parser.add_argument("--wallets", type=int, default=4, help="Pool wallets in addition to the primary one")
+    parser.add_argument("--amount", type=float, default=0.0001, help="ETH per send/schedule")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    w3 = connect(args.rpc)
+    addresses = deploy_core_contracts(w3)
+    keys = fund_wallets(w3, 1 + args.wallets)
+    configure_environment(args.rpc, w3.eth.chain_id, addresses, keys)
+    run = make_runner(args.target)
+
+    workload = Workload(parse_mix(args.mix), Account.create().address, args.amount, args.seed)
+    plan = workload.plan(args.commands)
+    prepare_cancels(run, workload, plan.count("cancel"))
+    commands = [(kind, workload.command(kind)) for kind in plan]
+
+    def timed(item: Any) -> Dict[str, Any]:
+        kind, command = item
+        started = time.perf_counter()
+        try:
+            result = run(command["command"], command.get("confirm"))
+        except Exception as e:
+            result = {"status": "exception", "message": str(e)}
+        return {
+            "kind": kind,
+            "latency": time.perf_counter() - started,
+            "status": result.get("status", "unknown"),
+            "transactions": len([h for h in (result.get("tx_hash") or "").split(",") if h.strip()]),
+        }
+
+    with RPCCounter() as rpc:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            samples = list(executor.map(timed, commands))
+        elapsed = time.perf_counter() - started
+    traffic = rpc.snapshot()
+
+    transactions = sum(s["transactions"] for s in samples)
+    report = {
+        "target": args.target,
+        "commands": args.commands,
+        "concurrency": args.concurrency,
+        "mix": parse_mix(args.mix),
+        "wallets": 1 + args.wallets,
+        "elapsed_seconds": round(elapsed, 3),
+        "commands_per_second": round(len(samples) / elapsed, 2) if elapsed else None,
+        "transactions": transactions,
+        "transactions_per_second": round(transactions / elapsed, 2) if elapsed else None,
+        "latency": summarize(samples),
+        "by_kind": {kind: summarize([s for s in samples if s["kind"] == kind])
+                    for kind in COMMAND_KINDS if any(s["kind"] == kind for s in samples)},
+        "rpc": {
+            "requests": traffic["requests"],
+            "calls": traffic["calls"],
+            "requests_per_command": round(traffic["requests"] / len(samples), 2) if samples else None,
+            "calls_per_command": round(traffic["calls"] / len(samples), 2) if samples else None,
+            "methods": traffic["methods"],
+        },
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
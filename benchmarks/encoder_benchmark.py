@@ -0,0 +1,138 @@
+"""Micro-benchmark: per-transaction CPU cost of building Executor/Scheduler writes.
+
+Usage (from the repository root; no node needed)::
+
+    python -m benchmarks.encoder_benchmark --iterations 2000
+
+``before`` is the previous path: ``Web3.to_checksum_address``, a ``solidity_keccak`` task hash and
+``contract.functions.X(...).build_transaction``. ``after`` is the precompiled ``tx_encoder`` path.
+Both run against an in-process provider that answers instantly with canned values, so the
+timings are pure CPU. The RPCs ``build_transaction`` issues on its own (gas estimate, fee reads,
+chain id validation) are counted per transaction. The calldata both paths produce is compared
+before timing. The report is printed as JSON.
+"""
+import argparse
+import json
+import time
+from collections import Counter
+from typing import Any, Callable, Dict
+
+from web3 import Web3
+from web3.providers import BaseProvider
+
+from tx_encoder import ContractEncoder, checksum, task_hash
+from utils import load_abi
+
+EXECUTOR = "0x3175F8bDBEE3FaE7e3369eB352BADcd4237161AC"
+SCHEDULER = "0x1dc4052FDEc1CC197a280B19a657704bc1910BBf"
+SENDER = "0xab4862f2d4a158F2460f30126a697C4180933924"
+TARGET = "0x70997970c51812dc3a010c7d01b50e0d17dc79c8"  # lower case, as users type it
+CHAIN_ID = 8453
+
+
+class CannedProvider(BaseProvider):
+    """Answers the reads build_transaction makes with fixed values and counts them."""
+
+    RESPONSES = {
+        "eth_chainId": hex(CHAIN_ID),
+        "eth_estimateGas": hex(60_000),
+        "eth_maxPriorityFeePerGas": hex(10**6),
+        "eth_gasPrice": hex(10**8),
+        "eth_getBlockByNumber": {
+            "number": "0x1", "hash": "0x" + "11" * 32, "parentHash": "0x" + "00" * 32, "timestamp": hex(1_700_000_000),
+            "baseFeePerGas": hex(10**8), "gasLimit": hex(30_000_000), "gasUsed": "0x0", "transactions": [],
+        },
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.methods: Counter = Counter()
+
+    def make_request(self, method: str, params: Any) -> Dict[str, Any]:
+        self.methods[method] += 1
+        return {"jsonrpc": "2.0", "id": 1, "result": self.RESPONSES[method]}
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+
+def time_per_call(fn: Callable[[], Any], iterations: int) -> float:
+    """Mean microseconds per call."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Transaction encoder micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    provider = CannedProvider()
+    w3 = Web3(provider)
+    executor = w3.eth.contract(address=EXECUTOR, abi=load_abi("ChainPilotExecutor")["abi"])
+    scheduler = w3.eth.contract(address=SCHEDULER, abi=load_abi("ChainPilotScheduler")["abi"])
+    executor_encoder = ContractEncoder(EXECUTOR, load_abi("ChainPilotExecutor")["abi"])
+    scheduler_encoder = ContractEncoder(SCHEDULER, load_abi("ChainPilotScheduler")["abi"])
+    value, deadline, execute_at = 10**15, 1_800_000_000, 1_800_000_000
+
+    def send_before() -> list:
+        to_address = Web3.to_checksum_address(TARGET)
+        digest = Web3.keccak(hexstr=Web3.to_hex(Web3.solidity_keccak(
+            ['address', 'bytes', 'uint256'], [to_address, b"", value])))
+        return [
+            executor.functions.approveTask(to_address, b"", value, deadline).build_transaction(
+                {'from': SENDER, 'chainId': CHAIN_ID}),
+            executor.functions.executeTask(SENDER, to_address, digest, value).build_transaction(
+                {'from': SENDER, 'value': value, 'chainId': CHAIN_ID}),
+        ]
+
+    def send_after() -> list:
+        to_address = checksum(TARGET)
+        digest = task_hash(to_address, b"", value)
+        return [
+            executor_encoder.transaction("approveTask", to_address, b"", value, deadline, sender=SENDER, chain_id=CHAIN_ID),
+            executor_encoder.transaction("executeTask", SENDER, to_address, digest, value, sender=SENDER, value=value,
+                                         chain_id=CHAIN_ID),
+        ]
+
+    def schedule_before() -> list:
+        return [scheduler.functions.scheduleTask(execute_at, execute_at + 86400, Web3.to_checksum_address(TARGET), b"", 0)
+                .build_transaction({'from': SENDER, 'chainId': CHAIN_ID, 'value': 0})]
+
+    def schedule_after() -> list:
+        return [scheduler_encoder.transaction("scheduleTask", execute_at, execute_at + 86400, checksum(TARGET), b"", 0,
+                                              sender=SENDER, chain_id=CHAIN_ID)]
+
+    def cancel_before() -> list:
+        return [scheduler.functions.cancelTask(42).build_transaction({'from': SENDER, 'chainId': CHAIN_ID})]
+
+    def cancel_after() -> list:
+        return [scheduler_encoder.transaction("cancelTask", 42, sender=SENDER, chain_id=CHAIN_ID)]
+
+    cases = {"send_tokens": (send_before, send_after), "schedule_transfers": (schedule_before, schedule_after),
+             "cancel_tasks": (cancel_before, cancel_after)}
+    report: Dict[str, Any] = {"iterations": args.iterations, "actions": {}}
+    for name, (before, after) in cases.items():
+        old, new = before(), after()
+        # approveTask calldata must match; executeTask differs by design (the corrected task hash).
+        if old[0]["data"] != new[0]["data"]:
+            raise AssertionError(f"{name}: encoder calldata differs from build_transaction")
+        provider.methods.clear()
+        before_us = time_per_call(before, args.iterations)
+        rpcs = sum(provider.methods.values()) / (args.iterations * len(old))
+        after_us = time_per_call(after, args.iterations)
+        report["actions"][name] = {
+            "transactions": len(old),
+            "before_us_per_tx": round(before_us / len(old), 1),
+            "after_us_per_tx": round(after_us / len(new), 1),
+            "speedup": round(before_us / after_us, 1),
+            "hidden_rpcs_per_tx_before": round(rpcs, 2),
+            "hidden_rpc_methods_before": dict(provider.methods),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
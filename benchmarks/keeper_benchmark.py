@@ -0,0 +1,95 @@
+"""Benchmark the Scheduler keeper against thousands of due tasks on a local Hardhat node.
+
+Usage (from the repository root, with ``npx hardhat node`` running)::
+
+    python -m benchmarks.keeper_benchmark --tasks 2000 --wallets 4
+
+Contracts are deployed fresh, ``--tasks`` tasks are scheduled at the minimum lead time, the
+node clock is advanced past ``executeAt`` and a single keeper pass is timed. The report is
+printed as JSON.
+
+``getPendingTasks`` scans every task on-chain, so each windowed read costs roughly 10k gas per
+task ever scheduled; beyond ~2500 tasks raise the node's block gas limit (which caps eth_call).
+"""
+import argparse
+import json
+import time
+
+from eth_abi import encode
+from web3 import Web3
+
+from benchmarks.local_chain import DEV_PRIVATE_KEY, advance_time, connect, deploy_core_contracts, fund_wallets
+from scheduler.keeper import SchedulerKeeper
+from signer import get_signer
+from tx_manager import get_transaction_manager
+from utils import load_abi
+from wallet_pool import WalletPool
+
+SCHEDULE_TASK_SELECTOR = Web3.keccak(text="scheduleTask(uint64,uint64,address,bytes,uint256)")[:4]
+
+
+def schedule_tasks(w3: Web3, scheduler_address: str, count: int, batch_size: int = 200) -> None:
+    manager = get_transaction_manager(w3, get_signer(DEV_PRIVATE_KEY))
+    chain_id = w3.eth.chain_id
+    for offset in range(0, count, batch_size):
+        # Re-read the clock per batch: scheduleTask requires executeAt at least 60s ahead of the including block.
+        execute_at = w3.eth.get_block('latest')['timestamp'] + 120
+        data = Web3.to_hex(SCHEDULE_TASK_SELECTOR + encode(
+            ["uint64", "uint64", "address", "bytes", "uint256"],
+            [execute_at, execute_at + 86400, manager.address, b"", 0],
+        ))
+        txs = [{"to": scheduler_address, "data": data, "value": 0, "gas": 250_000, "chainId": chain_id}
+               for _ in range(min(batch_size, count - offset))]
+        for tx_hash in manager.send_batch(txs):
+            manager.wait_for_receipt(tx_hash)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Keeper throughput benchmark")
+    parser.add_argument("--rpc", default="http://127.0.0.1:8545")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--wallets", type=int, default=4, help="Keeper signer wallets")
+    parser.add_argument("--max-batch", type=int, default=100)
+    args = parser.parse_args()
+
+    w3 = connect(args.rpc)
+    addresses = deploy_core_contracts(w3)
+    scheduler = w3.eth.contract(address=addresses["Scheduler"], abi=load_abi("ChainPilotScheduler")["abi"])
+
+    started = time.monotonic()
+    schedule_tasks(w3, scheduler.address, args.tasks)
+    schedule_elapsed = time.monotonic() - started
+    advance_time(w3, 180)
+
+    pool = WalletPool.from_private_keys(w3, fund_wallets(w3, args.wallets))
+    # Everything is due within the last few minutes, so one window covers it.
+    keeper = SchedulerKeeper(w3, scheduler, pool, window=3600, lookback=3600, max_batch=args.max_batch)
+
+    discover_started = time.monotonic()
+    now = w3.eth.get_block('latest')['timestamp']
+    found = keeper.find_due_tasks(now)
+    discover_elapsed = time.monotonic() - discover_started
+
+    execute_started = time.monotonic()
+    results = keeper.execute(found["due"])
+    execute_elapsed = time.monotonic() - execute_started
+
+    statuses = {}
+    for result in results:
+        statuses[result.get("status", "unknown")] = statuses.get(result.get("status", "unknown"), 0) + 1
+    print(json.dumps({
+        "tasks": args.tasks,
+        "wallets": args.wallets,
+        "max_batch": args.max_batch,
+        "schedule_seconds": round(schedule_elapsed, 3),
+        "discover_seconds": round(discover_elapsed, 3),
+        "execute_seconds": round(execute_elapsed, 3),
+        "due": len(found["due"]),
+        "skipped": len(found["skipped"]),
+        "statuses": statuses,
+        "executions_per_second": round(len(results) / execute_elapsed, 2) if execute_elapsed else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
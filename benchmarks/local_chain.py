@@ -0,0 +1,118 @@
+"""Helpers for running benchmarks against a local Hardhat (or anvil) node.
+
+Start a node with ``npx hardhat node`` from packages/hardhat; it listens on 127.0.0.1:8545 and
+funds the well-known development account used below.
+"""
+import threading
+from collections import Counter
+from typing import Any, Dict, List
+
+from eth_account import Account
+from web3 import Web3, HTTPProvider
+
+from utils import load_abi
+
+LOCAL_RPC_URL = "http://127.0.0.1:8545"
+
+# Hardhat/anvil development account #0 (also the deployer in hardhat.config.ts). Never use it on a public network.
+DEV_PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+
+
+def connect(rpc_url: str = LOCAL_RPC_URL) -> Web3:
+    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    if not w3.is_connected():
+        raise ConnectionError(f"No local node at {rpc_url}. Start one with `npx hardhat node` in packages/hardhat.")
+    return w3
+
+
+def _send(w3: Web3, private_key: str, tx: Dict[str, Any]) -> Dict[str, Any]:
+    account = Account.from_key(private_key)
+    tx = {
+        "from": account.address,
+        "nonce": w3.eth.get_transaction_count(account.address, "pending"),
+        "chainId": w3.eth.chain_id,
+        **tx,
+    }
+    if "maxFeePerGas" not in tx:
+        tx.setdefault("gasPrice", w3.eth.gas_price)
+    if "gas" not in tx:
+        tx["gas"] = w3.eth.estimate_gas(tx)
+    raw = account.sign_transaction(tx).raw_transaction
+    return w3.eth.wait_for_transaction_receipt(w3.eth.send_raw_transaction(raw))
+
+
+def deploy(w3: Web3, artifact: str, args: List[Any], private_key: str = DEV_PRIVATE_KEY) -> str:
+    """Deploy a contract from its artifact in abis/ (or contracts/) and return its address."""
+    data = load_abi(artifact)
+    if not data["bytecode"] or data["bytecode"] == "0x":
+        raise ValueError(f"{artifact}.json has no bytecode; compile it with `yarn hardhat compile` first.")
+    factory = w3.eth.contract(abi=data["abi"], bytecode=data["bytecode"])
+    receipt = _send(w3, private_key, {"data": factory.constructor(*args).data_in_transaction})
+    return receipt["contractAddress"]
+
+
+def deploy_core_contracts(w3: Web3, private_key: str = DEV_PRIVATE_KEY) -> Dict[str, str]:
+    """Mirror packages/hardhat/deploy/01_deploy_core_contracts.ts: Executor, then Scheduler pointing at it."""
+    executor = deploy(w3, "ChainPilotExecutor", [], private_key)
+    scheduler = deploy(w3, "ChainPilotScheduler", [executor], private_key)
+    return {"Executor": executor, "Scheduler": scheduler}
+
+
+def fund_wallets(w3: Web3, count: int, amount_eth: float = 10.0, private_key: str = DEV_PRIVATE_KEY) -> List[str]:
+    """Create ``count`` throwaway wallets funded from the dev account; returns their private keys."""
+    keys = []
+    for _ in range(count):
+        account = Account.create()
+        _send(w3, private_key, {"to": account.address, "value": w3.to_wei(amount_eth, "ether"), "gas": 21000})
+        keys.append(Web3.to_hex(account.key))
+    return keys
+
+
+def advance_time(w3: Web3, seconds: int) -> None:
+    """Move the node's clock forward and mine a block so the new timestamp is visible."""
+    w3.provider.make_request("evm_increaseTime", [seconds])
+    w3.provider.make_request("evm_mine", [])
+
+
+class RPCCounter:
+    """Counts JSON-RPC traffic from every HTTPProvider in the process while active.
+
+    ``requests`` is HTTP round trips (a JSON-RPC batch is one), ``calls`` the individual
+    methods inside them. Agents build their own providers, so the class methods are patched.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.calls = 0
+        self.methods: Counter = Counter()
+        self._lock = threading.Lock()
+        self._originals = None
+
+    def __enter__(self) -> "RPCCounter":
+        counter = self
+        make_request, make_batch_request = HTTPProvider.make_request, HTTPProvider.make_batch_request
+
+        def counted_request(provider, method, params):
+            counter._record([method])
+            return make_request(provider, method, params)
+
+        def counted_batch(provider, requests):
+            counter._record([method for method, _ in requests])
+            return make_batch_request(provider, requests)
+
+        self._originals = (make_request, make_batch_request)
+        HTTPProvider.make_request, HTTPProvider.make_batch_request = counted_request, counted_batch
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        HTTPProvider.make_request, HTTPProvider.make_batch_request = self._originals
+
+    def _record(self, methods: List[str]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.calls += len(methods)
+            self.methods.update(methods)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": self.requests, "calls": self.calls, "methods": dict(self.methods)}
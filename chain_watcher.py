@@ -0,0 +1,172 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from eth_abi import decode
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from utils import get_logger, batch_call
+from config import WATCHER
+from event_bus import EventBus, bus as default_bus
+from tx_manager import publish_receipt
+
+logger = get_logger(__name__)
+
+TASK_SCHEDULED_TOPIC = Web3.keccak(text="TaskScheduled(uint256,address,address,address,uint64,uint64,bytes32,uint256)")
+TASK_CANCELLED_TOPIC = Web3.keccak(text="TaskCancelled(uint256)")
+# The Scheduler also declares the Executor's TaskExecuted; this is its own (taskId, executor) overload.
+TASK_EXECUTED_TOPIC = Web3.keccak(text="TaskExecuted(uint256,address)")
+
+
+def _topic_int(topic: Any) -> int:
+    return int.from_bytes(bytes(topic), "big")
+
+
+def _topic_address(topic: Any) -> str:
+    return Web3.to_checksum_address(bytes(topic)[-20:])
+
+
+class ChainWatcher:
+    """Single shared poller that turns chain state into EventBus events.
+
+    Once per new head it reads the new blocks' transaction hashes and the Scheduler's task logs
+    (one eth_getLogs per range), then publishes ``tx_confirmed`` / ``tx_failed`` for
+    transactions this process broadcast and ``task_scheduled`` / ``task_cancelled`` /
+    ``task_executed`` for tasks. However many clients are connected, upstream cost is this one
+    loop.
+    """
+
+    def __init__(self, w3: Web3, scheduler_contract: Any, event_bus: EventBus = default_bus,
+                 poll_interval: float = WATCHER["poll_interval"], max_block_range: int = WATCHER["max_block_range"]):
+        self.w3 = w3
+        self.scheduler = scheduler_contract
+        self.bus = event_bus
+        self.poll_interval = poll_interval
+        self.max_block_range = max_block_range
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, int]] = {}  # tx hash -> (wallet, nonce), every version of a nonce
+        self._fresh: Set[str] = set()
+        self._task_owners: Dict[int, str] = {}
+        self._last_block: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._head_listeners: List[Callable[[int], None]] = []
+        self.bus.add_listener(self._on_event)
+
+    def add_head_listener(self, listener: Callable[[int], None]) -> None:
+        """Call ``listener(block_number)`` from the watcher thread whenever a new head is seen."""
+        self._head_listeners.append(listener)
+
+    def _settle(self, wallet: str, nonce: int) -> bool:
+        """Stop tracking every version of a nonce; False if it was already settled."""
+        with self._lock:
+            hashes = [h for h, owner in self._pending.items() if owner == (wallet, nonce)]
+            for tx_hash in hashes:
+                self._pending.pop(tx_hash, None)
+                self._fresh.discard(tx_hash)
+        return bool(hashes)
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        if event["type"] in ("tx_broadcast", "tx_replaced"):
+            with self._lock:
+                self._pending[event["tx_hash"]] = (event["wallet"], event["nonce"])
+                self._fresh.add(event["tx_hash"])
+        elif event["type"] in ("tx_confirmed", "tx_failed"):
+            # Settled by a TransactionManager waiting on its own receipt.
+            self._settle(event["wallet"], event["nonce"])
+
+    def _publish_receipt(self, receipt: Dict[str, Any]) -> None:
+        with self._lock:
+            owner = self._pending.get(Web3.to_hex(receipt["transactionHash"]))
+        if owner is not None and self._settle(*owner):
+            publish_receipt(owner[0], owner[1], receipt)
+
+    def _check_fresh(self) -> None:
+        # A transaction can be mined before its broadcast event arrives here, i.e. in a block already scanned.
+        with self._lock:
+            fresh, self._fresh = list(self._fresh), set()
+        for tx_hash in fresh:
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+            if receipt is not None:
+                self._publish_receipt(receipt)
+
+    def _scan_transactions(self, blocks: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            pending = set(self._pending)
+        mined = [Web3.to_hex(h) for block in blocks for h in block["transactions"] if Web3.to_hex(h) in pending]
+        for receipt in batch_call(self.w3, [(self.w3.eth.get_transaction_receipt, h) for h in mined]):
+            self._publish_receipt(receipt)
+
+    def _owners(self, task_ids: List[int]) -> Dict[int, str]:
+        unknown = [task_id for task_id in dict.fromkeys(task_ids) if task_id not in self._task_owners]
+        for task_id, task in zip(unknown, batch_call(self.w3, [self.scheduler.functions.tasks(t) for t in unknown])):
+            self._task_owners[task_id] = task[2]
+        return {task_id: self._task_owners[task_id] for task_id in task_ids}
+
+    def _scan_tasks(self, from_block: int, to_block: int) -> None:
+        logs = self.w3.eth.get_logs({
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "address": self.scheduler.address,
+            "topics": [[TASK_SCHEDULED_TOPIC, TASK_CANCELLED_TOPIC, TASK_EXECUTED_TOPIC]],
+        })
+        owners = self._owners([_topic_int(log["topics"][1]) for log in logs
+                               if bytes(log["topics"][0]) != bytes(TASK_SCHEDULED_TOPIC)])
+        for log in logs:
+            topic, task_id = bytes(log["topics"][0]), _topic_int(log["topics"][1])
+            common = {"task_id": task_id, "tx_hash": Web3.to_hex(log["transactionHash"]), "block": log["blockNumber"]}
+            if topic == bytes(TASK_SCHEDULED_TOPIC):
+                user = _topic_address(log["topics"][2])
+                target, execute_at, expiry_at, _, value = decode(
+                    ["address", "uint64", "uint64", "bytes32", "uint256"], bytes(log["data"]))
+                self._task_owners[task_id] = user
+                self.bus.publish("task_scheduled", user, **common, target=Web3.to_checksum_address(target),
+                                 execute_at=execute_at, expiry_at=expiry_at, value=value)
+            elif topic == bytes(TASK_CANCELLED_TOPIC):
+                self.bus.publish("task_cancelled", owners[task_id], **common)
+            else:
+                self.bus.publish("task_executed", owners[task_id], **common,
+                                 executor=_topic_address(log["topics"][2]))
+
+    def poll(self) -> None:
+        """Process every block since the last poll (at most ``max_block_range`` per call)."""
+        self._check_fresh()
+        head = self.w3.eth.block_number
+        if self._last_block is None:
+            self._last_block = head  # start from the current head; history is served by list_tasks
+            return
+        if head <= self._last_block:
+            return
+        for listener in self._head_listeners:
+            listener(head)
+        from_block = self._last_block + 1
+        to_block = min(head, self._last_block + self.max_block_range)
+        blocks = batch_call(self.w3, [(self.w3.eth.get_block, n) for n in range(from_block, to_block + 1)])
+        self._scan_transactions(blocks)
+        self._scan_tasks(from_block, to_block)
+        self._last_block = to_block
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Chain watcher error: {e}", exc_info=True)
+            self._stop.wait(self.poll_interval)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="chain-watcher", daemon=True)
+            self._thread.start()
+            logger.info(f"Chain watcher started (Scheduler {self.scheduler.address})")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
@@ -1,13 +1,16 @@
 import sys
 import os
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import pytz
 from actions.chainpilot_actions import ChainPilotActions
 from wallet_provider import wallet_provider_dict
-from nlp_parser import parse_command
-from config import CONTRACT_ADDRESSES, NETWORK
+from intent_parser import get_intent_parser, unconfirmed
+from tx_history import command_context
+from config import CONTRACT_ADDRESSES, NETWORK, SIGNER
+from idempotency import RequestCoalescer
+from confirmation import ConfirmationPolicy
 
 # Clear existing handlers to avoid duplicate logging
 for handler in logging.getLogger().handlers[:]:
@@ -15,35 +18,49 @@ for handler in logging.getLogger().handlers[:]:
 
 logger = logging.getLogger(__name__)
 
+# Commands that never send a transaction; safe to share one execution between identical requests.
+READ_ONLY_ACTIONS = {"check_executor_permissions", "check_scheduler_permissions", "list_tasks", "help"}
+
 class ChainPilotAgent:
-    def __init__(self):
+    def __init__(self, pool_private_keys: Optional[List[str]] = None):
         wallet_address = os.getenv("WALLET_ADDRESS")
         private_key = os.getenv("WALLET_PRIVATE_KEY")
 
         if not wallet_address:
             raise ValueError("WALLET_ADDRESS environment variable is not set")
-        if not private_key:
+        if not private_key and not SIGNER["socket"]:
             raise ValueError("WALLET_PRIVATE_KEY environment variable is not set")
 
         if not wallet_address.startswith("0x") or len(wallet_address) != 42:
             raise ValueError("Invalid wallet address format. Must be 0x followed by 40 hex characters.")
-        if not private_key.startswith("0x") or len(private_key) != 66:
+        if private_key and (not private_key.startswith("0x") or len(private_key) != 66):
             raise ValueError("Invalid private key format. Must be 0x followed by 64 hex characters.")
 
-        self.actions = ChainPilotActions(wallet_address, private_key)
+        # pool_private_keys defaults to WALLET_POOL_PRIVATE_KEYS; sends fan out across the primary wallet plus these.
+        self.actions = ChainPilotActions(wallet_address, private_key or None, pool_private_keys=pool_private_keys)
         self.cat_tz = pytz.timezone("Africa/Kigali")
         self.pending_action = None
+        self._coalescer = RequestCoalescer()
+        self.parser = get_intent_parser()
 
     def _map_action_args(self, parsed_command: Dict[str, Any]) -> Dict[str, Any]:
         action = parsed_command.get("action")
         args: Dict[str, Any] = {}
 
-        if action in ["check_executor_permissions", "check_scheduler_permissions", "list_tasks"]:
+        if action in ["check_executor_permissions", "check_scheduler_permissions"]:
             return args
+        elif action == "list_tasks":
+            # Paging options; absent keys fall back to the first page of active tasks.
+            args = {key: parsed_command[key] for key in ("limit", "after", "status", "since", "until")
+                    if parsed_command.get(key) is not None}
         elif action == "send_tokens":
             args = {"to": parsed_command.get("to"), "amount": parsed_command.get("amount")}
             if not all(args.values()):
                 raise ValueError("Missing 'to' or 'amount' for send tokens.")
+        elif action == "batch_send_tokens":
+            args = {"recipients": parsed_command.get("recipients") or []}
+            if not args["recipients"]:
+                raise ValueError("Missing recipients for batch send.")
         elif action == "schedule_transfers":
             args = {"to": parsed_command.get("to"), "amount": parsed_command.get("amount"), "time": parsed_command.get("time")}
             if not args["time"]:
@@ -62,6 +79,7 @@ class ChainPilotAgent:
             "check_executor_permissions": self.actions.check_executor_permissions,
             "check_scheduler_permissions": self.actions.check_scheduler_permissions,
             "send_tokens": self.actions.send_tokens,
+            "batch_send_tokens": self.actions.batch_send_tokens,
             "schedule_transfers": self.actions.schedule_transfers,
             "list_tasks": self.actions.list_tasks,
             "cancel_tasks": self.actions.cancel_tasks,
@@ -77,11 +95,14 @@ class ChainPilotAgent:
             "➡️ `send_tokens <amount> to <address>`\n"
             "  Send ETH via the Executor contract .\n\n"
 
+            "➡️ `send_tokens <amount> to <address>, <address>, ...`\n"
+            "  Send the same amount to several addresses in batched transactions.\n\n"
+
             "➡️ `schedule_transfers <amount> to <address> at <timestamp>`\n"
             "  Schedule ETH transfers via the Scheduler contract.\n\n"
 
-            "➡️ `list_tasks`\n"
-            "  List all your currently scheduled tasks.\n\n"
+            "➡️ `list_tasks` / `list_tasks after <task_id>`\n"
+            "  List your currently scheduled tasks, a page at a time.\n\n"
 
             "➡️ `cancel_tasks <task_id>`\n"
             "  Cancel a previously scheduled task using its task ID.\n\n"
@@ -106,21 +127,34 @@ class ChainPilotAgent:
                 friendly = raw_msg
             else:
                 friendly = f"Error: {raw_msg}. Please retry or contact support."
-            return {"status": "error", "message": friendly}
-
-    def process_command(self, command: str, confirm: bool = None) -> Dict[str, Any]:
+            formatted = {"status": "error", "message": friendly}
+            # Partially failed batch sends still report which recipients were paid.
+            for key in ("tx_hash", "results", "confirmation"):
+                if result.get(key):
+                    formatted[key] = result[key]
+            return formatted
+
+    def process_command(self, command: str, confirm: bool = None, confirmation: Optional[str] = None) -> Dict[str, Any]:
+        """``confirmation`` overrides the configured confirmation policy for a transaction-sending command."""
         try:
+            if confirmation:
+                confirmation = str(ConfirmationPolicy.parse(confirmation))
             command_lower = command.lower().strip()
             if self.pending_action and command_lower in ["yes", "no"]:
                 if command_lower == "yes":
                     confirm = True
                 else:
+                    aborted = self.pending_action["parsed_command"].get("action")
                     self.pending_action = None
-                    return {"status": "success", "message": "Cancel action aborted."}
+                    return {"status": "success",
+                            "message": "Cancel action aborted." if aborted == "cancel_tasks" else "Action aborted."}
                 parsed = self.pending_action["parsed_command"]
                 action = parsed.get("action")
                 args = self._map_action_args(parsed)
-                result = self._execute_action(action, args)
+                if confirmation or self.pending_action.get("confirmation"):
+                    args["confirmation"] = confirmation or self.pending_action["confirmation"]
+                with command_context(self.pending_action.get("command", command), action):
+                    result = self._execute_action(action, args)
                 self.pending_action = None
                 return self._format_result(result, action, args)
 
@@ -128,12 +162,18 @@ class ChainPilotAgent:
             if command_lower in ["hello", "hi", "help"]:
                 return self._execute_action("help", {})
 
-            parsed_command = parse_command(command)
+            parsed_command = self.parser.parse(command)
             logger.info(f"Parsed Command: {parsed_command}")
 
             action = parsed_command.get("action")
+            if unconfirmed(parsed_command, confirm):
+                # Free-form text the model interpreted: show what would run before any funds move.
+                args = self._map_action_args(parsed_command)
+                self.pending_action = {"parsed_command": parsed_command, "command": command, "confirmation": confirmation}
+                return {"status": "prompt", "action": action, "args": args,
+                        "message": f"I understood this as {action} with {args}. Reply with 'yes' to proceed or 'no' to abort."}
             if action == "cancel_tasks" and confirm is None:
-                self.pending_action = {"parsed_command": parsed_command}
+                self.pending_action = {"parsed_command": parsed_command, "command": command, "confirmation": confirmation}
                 task_id = parsed_command.get("task_id")
                 return {"status": "prompt", "message": f"Are you sure you want to cancel task {task_id}? Reply with 'yes' or 'no'."}
 
@@ -141,7 +181,14 @@ class ChainPilotAgent:
                 return {"status": "error", "message": "❌ Invalid command. Type 'help' for available actions."}
 
             args = self._map_action_args(parsed_command)
-            result = self._execute_action(action, args)
+            if confirmation and action not in READ_ONLY_ACTIONS:
+                args["confirmation"] = confirmation
+            if action in READ_ONLY_ACTIONS:
+                # Identical concurrent reads (e.g. clients polling "list tasks") share one execution.
+                return self._coalescer.run((action, repr(sorted(args.items()))),
+                                           lambda: self._format_result(self._execute_action(action, args), action, args))
+            with command_context(command, action):
+                result = self._execute_action(action, args)
             return self._format_result(result, action, args)
 
         except ValueError as ve:
@@ -1,10 +1,12 @@
 # cli.py
 import argparse
 import sys
-from ChainPilot.actions.chainpilot_actions import send_token
-from scheduler.job_scheduler import add_scheduled_job
-from utils import log, error
-from wallet_provider import wallet_provider
+from scheduler.job_scheduler import schedule_job, send_token
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+USDC_CONTRACT = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"  # Example: USDC contract address
 
 def main():
     parser = argparse.ArgumentParser(description="ChainPilot CLI Tool")
@@ -27,25 +29,21 @@ def main():
     if args.command == "transfer":
         recipient_address = args.to_address
         amount = args.amount
-        token_contract = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"  # Example: USDC contract address
         try:
-            tx_hash = send_token(wallet_provider, recipient_address, amount, token_contract)
-            log(f"Transaction sent successfully! Hash: {tx_hash}")
+            result = send_token(recipient_address, amount, USDC_CONTRACT)
+            if result["status"] != "success":
+                raise ValueError(result["message"])
+            logger.info(f"Transaction sent successfully! Hash: {result['transaction_hash']}")
         except Exception as e:
-            error(f"Transfer failed: {str(e)}")
+            logger.error(f"Transfer failed: {str(e)}")
 
     elif args.command == "schedule":
         try:
-            job = {
-                "type": "transfer",
-                "to_address": args.to_address,
-                "amount": args.amount,
-                "timestamp": args.timestamp
-            }
-            add_scheduled_job(job)
-            log("Transfer scheduled successfully.")
+            timestamp = int(args.timestamp)
+            schedule_job(f"cli-{timestamp}-{args.to_address}", args.amount, args.to_address, USDC_CONTRACT, timestamp)
+            logger.info("Transfer scheduled successfully.")
         except Exception as e:
-            error(f"Scheduling failed: {str(e)}")
+            logger.error(f"Scheduling failed: {str(e)}")
     else:
         parser.print_help()
 
@@ -6,11 +6,166 @@ load_dotenv()
 CONTRACT_ADDRESSES = {
     "Executor": os.getenv("CONTRACT_EXECUTOR_ADDRESS", "0x3175F8bDBEE3FaE7e3369eB352BADcd4237161AC"),
     "Scheduler": os.getenv("CONTRACT_SCHEDULER_ADDRESS", "0x1dc4052FDEc1CC197a280B19a657704bc1910BBf"),
+    "Payments": os.getenv("CONTRACT_PAYMENTS_ADDRESS"),  # PaymentsModule; not deployed on mainnet yet
 }
 
 NETWORK = {
-    "rpc_url": f"https://base-mainnet.g.alchemy.com/v2/{os.getenv('ALCHEMY_API_KEY', 'eIHNpCWBx2UK_lG1EoqlrlCBdYu1bZK1')}",
-    "chain_id": 8453,  # Base mainnet chain ID
+    # RPC_URL / CHAIN_ID point the agent at another chain, e.g. a local Hardhat node for benchmarks.
+    "rpc_url": os.getenv("RPC_URL") or f"https://base-mainnet.g.alchemy.com/v2/{os.getenv('ALCHEMY_API_KEY', 'eIHNpCWBx2UK_lG1EoqlrlCBdYu1bZK1')}",
+    "chain_id": int(os.getenv("CHAIN_ID", 8453)),  # Base mainnet chain ID
+}
+
+RPC_RECORDING = {
+    "record_file": os.getenv("RPC_RECORD_FILE"),  # log every JSON-RPC exchange here (".gz" compresses)
+    "replay_file": os.getenv("RPC_REPLAY_FILE"),  # serve JSON-RPC from a recording instead of the network
+    "replay_latency": os.getenv("RPC_REPLAY_LATENCY", "recorded"),  # none | recorded | fixed:MS | uniform:LO,HI | normal:MEAN,SD | lognormal:MEDIAN,SIGMA
+    "replay_seed": int(os.getenv("RPC_REPLAY_SEED")) if os.getenv("RPC_REPLAY_SEED") else None,
+    "replay_strict": os.getenv("RPC_REPLAY_STRICT", "false").lower() == "true",
+}
+
+IDEMPOTENCY = {
+    "path": os.getenv("IDEMPOTENCY_PATH", os.path.join("data", "idempotency.sqlite3")),  # shared by every API worker
+    "max_keys": int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10_000)),
+    "ttl": float(os.getenv("IDEMPOTENCY_TTL", 86400)),  # seconds a completed result is replayed for a repeated key
+    "claim_timeout": float(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT", 900)),  # seconds before an unfinished claim is taken over
+    "poll_interval": float(os.getenv("IDEMPOTENCY_POLL_INTERVAL", 0.2)),  # how often a repeat on another worker checks
+}
+
+ADMISSION = {
+    "client_rate": float(os.getenv("ADMISSION_CLIENT_RATE", 5)),  # requests per second per client
+    "client_burst": float(os.getenv("ADMISSION_CLIENT_BURST", 20)),
+    # Per client and action: (requests per second, burst)
+    "action_limits": {
+        "send_tokens": (1, 5),
+        "batch_send_tokens": (0.2, 2),
+        "schedule_transfers": (1, 5),
+        "cancel_tasks": (1, 5),
+        "list_tasks": (2, 10),
+        "create_trigger": (0.2, 5),
+    },
+    "max_concurrency": int(os.getenv("ADMISSION_MAX_CONCURRENCY", 8)),  # commands executing at once per worker
+    "max_queue": {"high": 64, "normal": 32, "low": 16},  # waiters per priority lane before shedding
+    "max_streams": int(os.getenv("ADMISSION_MAX_STREAMS", 4)),  # open /tasks/stream responses per worker, outside max_concurrency
+    "max_wait": float(os.getenv("ADMISSION_MAX_WAIT", 30)),  # seconds a request may queue before a 429
+    "idle_ttl": 600,  # seconds before an idle client's buckets are dropped
+    "trust_forwarded_for": os.getenv("ADMISSION_TRUST_FORWARDED_FOR", "false").lower() == "true",
+}
+
+WATCHER = {
+    "poll_interval": float(os.getenv("WATCHER_POLL_INTERVAL", 2)),  # seconds between head checks (~one Base block)
+    "max_block_range": int(os.getenv("WATCHER_MAX_BLOCK_RANGE", 500)),  # blocks per eth_getLogs when catching up
+    "queue_size": int(os.getenv("WATCHER_QUEUE_SIZE", 256)),  # buffered events per connected client
+    "history": int(os.getenv("WATCHER_HISTORY", 1024)),  # recent events kept for Last-Event-ID resume
+    "heartbeat": float(os.getenv("WATCHER_HEARTBEAT", 15)),  # seconds between SSE keep-alive comments
+    # Shared by every API worker so /events sees all workers' events with one id sequence
+    "event_log": os.getenv("WATCHER_EVENT_LOG", os.path.join("data", "events.sqlite3")),
+    "event_poll_interval": float(os.getenv("WATCHER_EVENT_POLL_INTERVAL", 0.25)),  # seconds between event log reads
+}
+
+INTENT_PARSER = {
+    # Tier behind the rule parser for free-form commands: openai | stub | none
+    "backend": os.getenv("INTENT_BACKEND", "openai" if os.getenv("OPENAI_API_KEY") else "none"),
+    "model": os.getenv("INTENT_MODEL", "gpt-4o-mini"),
+    "cache_ttl": float(os.getenv("INTENT_CACHE_TTL", 3600)),
+    "max_concurrency": int(os.getenv("INTENT_MAX_CONCURRENCY", 4)),
+    "timeout": float(os.getenv("INTENT_TIMEOUT", 10)),  # seconds per model call and per wait for a slot
+    "stub_file": os.getenv("INTENT_STUB_FILE"),  # JSON {template: intent} for the offline stub backend
+}
+
+TX_HISTORY = {
+    "enabled": os.getenv("TX_HISTORY_ENABLED", "true").lower() == "true",
+    "path": os.getenv("TX_HISTORY_PATH", os.path.join("data", "tx_history.sqlite3")),
+}
+
+TASK_LISTING = {
+    "page_size": int(os.getenv("TASK_PAGE_SIZE", 50)),  # list_tasks default when no limit is given
+    "max_page_size": int(os.getenv("TASK_MAX_PAGE_SIZE", 500)),
+    "chunk_size": int(os.getenv("TASK_SCAN_CHUNK", 100)),  # task ids resolved per batched RPC read
+}
+
+TX_REPLACEMENT = {
+    "stuck_blocks": int(os.getenv("TX_STUCK_BLOCKS", 3)),  # Base produces a block every ~2s
+    "bump_percent": float(os.getenv("TX_BUMP_PERCENT", 12.5)),
+    "max_bumps": int(os.getenv("TX_MAX_BUMPS", 5)),
+    "max_fee_cap_wei": int(float(os.getenv("TX_MAX_FEE_CAP_GWEI", 0)) * 10**9) or None,
+    "poll_interval": float(os.getenv("TX_POLL_INTERVAL", 2)),
+}
+
+CONFIRMATION = {
+    # Policies: broadcast | inclusion | confirmations:N | safe | finalized. A command may pass its own.
+    "default": os.getenv("CONFIRMATION_POLICY", "inclusion"),
+    # Per action, e.g. CONFIRMATION_POLICIES="send_tokens=broadcast,cancel_tasks=confirmations:3"
+    "actions": dict(item.split("=", 1) for item in os.getenv("CONFIRMATION_POLICIES", "").split(",") if "=" in item),
+    "high_value_wei": int(float(os.getenv("CONFIRMATION_HIGH_VALUE_ETH", 0)) * 10**18),  # 0 disables the upgrade
+    "high_value": os.getenv("CONFIRMATION_HIGH_VALUE_POLICY", "confirmations:3"),
+    "timeout": float(os.getenv("CONFIRMATION_TIMEOUT", 120)),  # seconds to first inclusion
+    "finality_timeout": float(os.getenv("CONFIRMATION_FINALITY_TIMEOUT", 1800)),  # seconds to reach a deeper policy
+    "poll_interval": float(os.getenv("CONFIRMATION_POLL_INTERVAL", 2)),
+    "follow_workers": int(os.getenv("CONFIRMATION_FOLLOW_WORKERS", 4)),  # background waiters for broadcast-only sends
+}
+
+SHARED_STATE = {
+    # Unset: an anonymous shared mmap, shared by workers forked after it is created (gunicorn --preload).
+    # Set: a file any process on the host can map, e.g. /dev/shm/chainpilot.state
+    "path": os.getenv("SHARED_STATE_PATH"),
+    "slots": int(os.getenv("SHARED_STATE_SLOTS", 4096)),
+    "slot_size": int(os.getenv("SHARED_STATE_SLOT_SIZE", 512)),  # bytes; larger values are not cached
+    "fee_ttl": float(os.getenv("SHARED_FEE_TTL", 2)),  # seconds a fee snapshot is reused (~one Base block); 0 disables
+    "nonce_ttl": float(os.getenv("SHARED_NONCE_TTL", 300)),  # idle seconds before a nonce cursor is re-read from chain
+    "nonce_slots": int(os.getenv("SHARED_NONCE_SLOTS", 256)),  # separate, non-evicting table for nonce cursors
+    "wallet_slots": int(os.getenv("SHARED_WALLET_SLOTS", 64)),  # non-evicting table for wallet pool ledgers
+    "wallet_slot_size": int(os.getenv("SHARED_WALLET_SLOT_SIZE", 8192)),  # bytes; one ledger with its pending nonces
+}
+
+SIMULATION = {
+    "enabled": os.getenv("SIMULATION_ENABLED", "true").lower() == "true",
+    "cache_ttl": float(os.getenv("SIMULATION_CACHE_TTL", 12)),  # seconds; about six Base blocks
+    "cache_size": int(os.getenv("SIMULATION_CACHE_SIZE", 1024)),
+}
+
+SIGNER = {
+    "socket": os.getenv("SIGNER_SOCKET"),  # Unix socket of a `python signer.py` process; unset signs in-process
+    "workers": int(os.getenv("SIGNER_WORKERS", min(4, os.cpu_count() or 1))),
+    "parallel_threshold": int(os.getenv("SIGNER_PARALLEL_THRESHOLD", 32)),
+}
+
+WALLET_POOL = {
+    # Extra signer keys, comma separated; the primary WALLET_PRIVATE_KEY is always part of the pool.
+    "private_keys": [key.strip() for key in os.getenv("WALLET_POOL_PRIVATE_KEYS", "").split(",") if key.strip()],
+    "min_balance_eth": float(os.getenv("WALLET_POOL_MIN_BALANCE_ETH", 0.01)),
+    "balance_ttl": float(os.getenv("WALLET_POOL_BALANCE_TTL", 30)),  # re-read fallback when no ChainWatcher feeds new heads
+    "send_gas_reserve": int(os.getenv("WALLET_POOL_SEND_GAS_RESERVE", 400_000)),  # gas held for fees per send_tokens
+    "alert_interval": float(os.getenv("WALLET_POOL_ALERT_INTERVAL", 3600)),
+    "hold_ttl": float(os.getenv("WALLET_POOL_HOLD_TTL", 300)),  # seconds before a dead worker's hold stops counting
+    "topup_webhook": os.getenv("WALLET_POOL_TOPUP_WEBHOOK"),
+}
+
+KEEPER = {
+    "window": int(os.getenv("KEEPER_WINDOW", 3600)),  # seconds covered by each getPendingTasks read
+    "lookback": int(os.getenv("KEEPER_LOOKBACK", 86400)),  # matches the 24h expiry used by schedule_transfers
+    "expiry_margin": int(os.getenv("KEEPER_EXPIRY_MARGIN", 6)),  # skip tasks expiring before inclusion is likely
+    "poll_interval": float(os.getenv("KEEPER_POLL_INTERVAL", 10)),
+    "max_batch": int(os.getenv("KEEPER_MAX_BATCH", 100)),
+    "read_chunk": int(os.getenv("KEEPER_READ_CHUNK", 500)),
+    "default_gas": int(os.getenv("KEEPER_DEFAULT_GAS", 300_000)),
+    "revert_backoff": float(os.getenv("KEEPER_REVERT_BACKOFF", 60)),  # seconds before a reverted task is retried, doubling per revert
+    "max_reverts": int(os.getenv("KEEPER_MAX_REVERTS", 5)),  # reverts after which a task is no longer executed
+}
+
+TRIGGERS = {
+    "path": os.getenv("TRIGGERS_PATH", os.path.join("data", "triggers.sqlite3")),  # shared by the API and the engine
+    "poll_interval": float(os.getenv("TRIGGERS_POLL_INTERVAL", 1)),  # head checks per ~2s Base block
+    "read_chunk": int(os.getenv("TRIGGERS_READ_CHUNK", 500)),  # balance reads per JSON-RPC batch
+    "fire_workers": int(os.getenv("TRIGGERS_FIRE_WORKERS", 4)),
+    "max_active": int(os.getenv("TRIGGERS_MAX_ACTIVE", 10000)),
+    "max_fires": int(os.getenv("TRIGGERS_MAX_FIRES", 100)),  # cap (and default) for repeating triggers
+    "min_cooldown_blocks": int(os.getenv("TRIGGERS_MIN_COOLDOWN_BLOCKS", 30)),  # repeating sends: ~1 min on Base
+}
+
+PAYMENTS = {
+    "max_batch_gas": int(os.getenv("PAYMENTS_MAX_BATCH_GAS", 5_000_000)),
+    "base_gas": 60_000,  # intrinsic cost plus the batch call's own bookkeeping
+    "eth_recipient_gas": 36_000,  # value transfer to a possibly new account
 }
 
 WALLET = {
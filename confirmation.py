@@ -0,0 +1,166 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from web3 import Web3
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+from utils import get_logger, batch_call
+from config import CONFIRMATION
+from event_bus import bus
+from tx_manager import TransactionManager, publish_receipt
+
+logger = get_logger(__name__)
+
+MODES = ("broadcast", "inclusion", "confirmations", "safe", "finalized")
+
+
+class ConfirmationPolicy:
+    """How long a send waits before it is reported: a spec such as ``broadcast``, ``inclusion``,
+    ``confirmations:3`` (or just ``3``), ``safe`` or ``finalized``."""
+
+    def __init__(self, mode: str, confirmations: int = 1):
+        if mode not in MODES:
+            raise ValueError(f"Unknown confirmation policy '{mode}'. Use one of: {', '.join(MODES)}.")
+        if mode == "confirmations" and confirmations < 1:
+            raise ValueError("Confirmation count must be at least 1.")
+        if mode == "confirmations" and confirmations == 1:
+            mode = "inclusion"
+        self.mode = mode
+        self.confirmations = confirmations if mode == "confirmations" else 1
+
+    @classmethod
+    def parse(cls, spec: Any) -> "ConfirmationPolicy":
+        if isinstance(spec, ConfirmationPolicy):
+            return spec
+        text = str(spec).strip().lower()
+        name, _, count = text.partition(":")
+        if name.isdigit():
+            name, count = "confirmations", name
+        if name == "confirmations":
+            if not count.isdigit():
+                raise ValueError(f"Confirmation policy '{spec}' needs a count, e.g. confirmations:3.")
+            return cls(name, int(count))
+        return cls(name)
+
+    @property
+    def waits_for_receipt(self) -> bool:
+        return self.mode != "broadcast"
+
+    @property
+    def deeper_than_inclusion(self) -> bool:
+        return self.mode in ("confirmations", "safe", "finalized")
+
+    def __str__(self) -> str:
+        return f"confirmations:{self.confirmations}" if self.mode == "confirmations" else self.mode
+
+    def __repr__(self) -> str:
+        return f"ConfirmationPolicy({str(self)!r})"
+
+
+def policy_for(action: str, override: Optional[Any] = None, value_wei: int = 0) -> ConfirmationPolicy:
+    """The policy a send runs under: the command's own choice, else the action's configured
+    policy, raised to the high-value policy for sends of at least CONFIRMATION_HIGH_VALUE_ETH."""
+    if override:
+        return ConfirmationPolicy.parse(override)
+    policy = ConfirmationPolicy.parse(CONFIRMATION["actions"].get(action, CONFIRMATION["default"]))
+    if CONFIRMATION["high_value_wei"] and value_wei >= CONFIRMATION["high_value_wei"]:
+        high = ConfirmationPolicy.parse(CONFIRMATION["high_value"])
+        if MODES.index(high.mode) > MODES.index(policy.mode) or (
+                high.mode == policy.mode and high.confirmations > policy.confirmations):
+            return high
+    return policy
+
+
+class ConfirmationTracker:
+    """Waits for a transaction to reach a ConfirmationPolicy, re-checking it against the canonical chain.
+
+    ``inclusion`` waits for the receipt as before. Deeper policies then poll, with one batched
+    read per poll, for the receipt's block at its height and for the head (``confirmations``) or
+    the ``safe`` / ``finalized`` tagged block. If the block at the receipt's height no longer
+    has the receipt's hash, the transaction was reorged out. A ``tx_reorged`` event is
+    published, and the transaction is re-located (or waited for again) before depth is counted
+    anew. ``broadcast`` returns straight away. A background worker keeps waiting on the
+    transaction, so fee bumping and settlement still happen.
+    """
+
+    def __init__(self, w3: Web3, poll_interval: float = CONFIRMATION["poll_interval"],
+                 timeout: float = CONFIRMATION["timeout"], finality_timeout: float = CONFIRMATION["finality_timeout"],
+                 follow_workers: int = CONFIRMATION["follow_workers"]):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.finality_timeout = finality_timeout
+        self._followers = ThreadPoolExecutor(max_workers=follow_workers, thread_name_prefix="tx-follow")
+
+    def _follow(self, tx_manager: TransactionManager, tx_hash: str) -> None:
+        try:
+            receipt = tx_manager.wait_for_receipt(tx_hash, timeout=self.finality_timeout)
+            logger.info(f"Broadcast-only tx {tx_hash} mined in block {receipt['blockNumber']} (status {receipt['status']})")
+        except Exception as e:
+            logger.warning(f"Stopped following broadcast-only tx {tx_hash}: {e}")
+
+    def _relocate(self, receipt: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        """Find where a reorged-out transaction landed, waiting for it to be mined again if needed."""
+        tx_hash = Web3.to_hex(receipt["transactionHash"])
+        logger.warning(f"Tx {tx_hash} was reorged out of block {receipt['blockNumber']}")
+        bus.publish("tx_reorged", receipt["from"], tx_hash=tx_hash, block=receipt["blockNumber"],
+                    block_hash=Web3.to_hex(receipt["blockHash"]))
+        try:
+            new_receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            new_receipt = None
+        if new_receipt is None:
+            remaining = max(deadline - time.monotonic(), self.poll_interval)
+            new_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=remaining,
+                                                                   poll_latency=self.poll_interval)
+        nonce = self.w3.eth.get_transaction(tx_hash)["nonce"]
+        publish_receipt(receipt["from"], nonce, new_receipt)
+        return new_receipt
+
+    def _await_depth(self, receipt: Dict[str, Any], policy: ConfirmationPolicy) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.finality_timeout
+        tag = policy.mode if policy.mode in ("safe", "finalized") else "latest"
+        while True:
+            block, target = batch_call(self.w3, [(self.w3.eth.get_block, receipt["blockNumber"]),
+                                                 (self.w3.eth.get_block, tag)])
+            if bytes(block["hash"]) != bytes(receipt["blockHash"]):
+                receipt = self._relocate(receipt, deadline)
+                continue
+            depth = target["number"] - receipt["blockNumber"] + 1
+            if depth >= policy.confirmations:
+                return {"receipt": receipt, "depth": depth}
+            if time.monotonic() >= deadline:
+                raise TimeExhausted(f"Tx {Web3.to_hex(receipt['transactionHash'])} did not reach {policy} "
+                                    f"within {self.finality_timeout}s (depth {max(depth, 0)})")
+            time.sleep(self.poll_interval)
+
+    def confirm(self, receipt: Dict[str, Any], policy: ConfirmationPolicy) -> Dict[str, Any]:
+        """Take an already-mined receipt to ``policy``; returns ``{"receipt", "confirmation"}``."""
+        depth = None
+        if policy.deeper_than_inclusion and receipt["status"] == 1:
+            reached = self._await_depth(receipt, policy)
+            receipt, depth = reached["receipt"], reached["depth"]
+        return {"receipt": receipt, "confirmation": self.summary(policy, receipt, depth)}
+
+    def settle(self, tx_manager: TransactionManager, tx_hash: str, policy: ConfirmationPolicy) -> Dict[str, Any]:
+        """Wait for a just-sent transaction according to ``policy``.
+
+        Returns ``{"receipt", "confirmation"}``; the receipt is None for ``broadcast``.
+        """
+        if not policy.waits_for_receipt:
+            self._followers.submit(self._follow, tx_manager, tx_hash)
+            return {"receipt": None, "confirmation": {"policy": str(policy), "status": "broadcast", "tx_hash": tx_hash}}
+        return self.confirm(tx_manager.wait_for_receipt(tx_hash, timeout=self.timeout), policy)
+
+    @staticmethod
+    def summary(policy: ConfirmationPolicy, receipt: Dict[str, Any], depth: Optional[int] = None) -> Dict[str, Any]:
+        status = {"safe": "safe", "finalized": "finalized"}.get(policy.mode, "confirmed") if depth else "included"
+        return {
+            "policy": str(policy),
+            "status": status if receipt["status"] == 1 else "reverted",
+            "tx_hash": Web3.to_hex(receipt["transactionHash"]),
+            "block": receipt["blockNumber"],
+            "block_hash": Web3.to_hex(receipt["blockHash"]),
+            "confirmations": depth or 1,
+        }
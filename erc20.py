@@ -0,0 +1,185 @@
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from web3 import Web3
+
+from utils import load_abi, get_logger, batch_call
+from tx_manager import TransactionManager
+
+logger = get_logger(__name__)
+
+# Applied to a gas estimate, which is then reused for that token and function for GAS_TTL seconds.
+GAS_MARGIN = 1.5
+GAS_TTL = 300
+
+
+class ERC20Client:
+    """ERC-20 reads and transfers built on contracts/ERC20.json and the shared TransactionManager.
+
+    Token metadata (decimals, symbol) is read once per token and cached; balance and allowance
+    checks go out as a single JSON-RPC batch. Transfers reuse the manager's nonce sequence and
+    fee policy, so token payouts interleave safely with the Executor/Scheduler transactions.
+    """
+
+    def __init__(self, w3: Web3, tx_manager: TransactionManager):
+        self.w3 = w3
+        self.tx_manager = tx_manager
+        self.abi = load_abi("ERC20")["abi"]
+        self._contracts: Dict[str, Any] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._gas_limits: Dict[tuple, Tuple[int, float]] = {}  # (token, fn) -> (gas limit, monotonic expiry)
+        self._chain_id: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def chain_id(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+    def contract(self, token: str) -> Any:
+        token = Web3.to_checksum_address(token)
+        with self._lock:
+            if token not in self._contracts:
+                self._contracts[token] = self.w3.eth.contract(address=token, abi=self.abi)
+            return self._contracts[token]
+
+    def _metadata_calls(self, token: str) -> list:
+        contract = self.contract(token)
+        return [contract.functions.decimals(), contract.functions.symbol()]
+
+    def metadata(self, token: str) -> Dict[str, Any]:
+        """Return ``{"decimals", "symbol"}`` for a token, reading it from chain only once."""
+        token = Web3.to_checksum_address(token)
+        if token not in self._metadata:
+            decimals, symbol = batch_call(self.w3, self._metadata_calls(token))
+            self._metadata[token] = {"decimals": decimals, "symbol": symbol}
+        return self._metadata[token]
+
+    def to_base_units(self, token: str, amount: float) -> int:
+        return int(Decimal(str(amount)) * (Decimal(10) ** self.metadata(token)["decimals"]))
+
+    def from_base_units(self, token: str, value: int) -> Decimal:
+        return Decimal(value) / (Decimal(10) ** self.metadata(token)["decimals"])
+
+    def read_state(self, token: str, owner: str, spender: Optional[str] = None) -> Dict[str, Any]:
+        """Read balance (and allowance for ``spender``) in one batch, filling the metadata cache on a miss."""
+        token = Web3.to_checksum_address(token)
+        contract = self.contract(token)
+        calls = [contract.functions.balanceOf(owner)]
+        if spender:
+            calls.append(contract.functions.allowance(owner, spender))
+        needs_metadata = token not in self._metadata
+        if needs_metadata:
+            calls.extend(self._metadata_calls(token))
+
+        results = batch_call(self.w3, calls)
+        state = {"balance": results[0]}
+        if spender:
+            state["allowance"] = results[1]
+        if needs_metadata:
+            self._metadata[token] = {"decimals": results[-2], "symbol": results[-1]}
+        return state
+
+    def _build(self, token: str, fn_name: str, args: list) -> Dict[str, Any]:
+        contract = self.contract(token)
+        tx = {
+            "to": contract.address,
+            "data": contract.encode_abi(fn_name, args=args),
+            "value": 0,
+            "chainId": self.chain_id,
+            "from": self.tx_manager.address,
+        }
+        key = (contract.address, fn_name)
+        cached = self._gas_limits.get(key)
+        if cached is None or time.monotonic() >= cached[1]:
+            cached = (int(self.w3.eth.estimate_gas(tx) * GAS_MARGIN), time.monotonic() + GAS_TTL)
+            self._gas_limits[key] = cached
+        tx["gas"] = cached[0]
+        return tx
+
+    def _finish(self, tx: Dict[str, Any], tx_hash: str, wait: bool) -> Dict[str, Any]:
+        if not wait:
+            return {"status": "success", "transaction_hash": tx_hash}
+        receipt = self.tx_manager.wait_for_receipt(tx_hash)
+        mined_hash = Web3.to_hex(receipt["transactionHash"])
+        if receipt["status"] == 0:
+            if receipt["gasUsed"] >= tx["gas"]:
+                # The cached limit was too low for this call (e.g. a first-time recipient); estimate afresh next time.
+                for key in [key for key in self._gas_limits if key[0] == tx["to"]]:
+                    self._gas_limits.pop(key, None)
+                return {"status": "error", "message": "Token transfer ran out of gas.", "transaction_hash": mined_hash}
+            return {"status": "error", "message": "Token transfer reverted on-chain.", "transaction_hash": mined_hash}
+        return {"status": "success", "transaction_hash": mined_hash}
+
+    def transfer(self, token: str, to: str, amount: float, wait: bool = True) -> Dict[str, Any]:
+        """Transfer ``amount`` whole tokens from the manager's wallet to ``to``."""
+        owner = self.tx_manager.address
+        state = self.read_state(token, owner)
+        value = self.to_base_units(token, amount)
+        symbol = self.metadata(token)["symbol"]
+        if state["balance"] < value:
+            raise ValueError(f"Insufficient {symbol} balance: {self.from_base_units(token, state['balance'])} "
+                             f"{symbol} available, {amount} {symbol} required.")
+        tx = self._build(token, "transfer", [Web3.to_checksum_address(to), value])
+        tx_hash = self.tx_manager.send(tx)
+        logger.info(f"Sent {amount} {symbol} to {to}, tx hash: {tx_hash}")
+        return self._finish(tx, tx_hash, wait)
+
+    def transfer_from(self, token: str, from_address: str, to: str, amount: float, wait: bool = True) -> Dict[str, Any]:
+        """Move ``amount`` whole tokens from ``from_address`` using the wallet's allowance."""
+        from_address = Web3.to_checksum_address(from_address)
+        state = self.read_state(token, from_address, spender=self.tx_manager.address)
+        value = self.to_base_units(token, amount)
+        symbol = self.metadata(token)["symbol"]
+        if state["allowance"] < value:
+            raise ValueError(f"Insufficient {symbol} allowance: {self.from_base_units(token, state['allowance'])} "
+                             f"{symbol} approved, {amount} {symbol} required.")
+        if state["balance"] < value:
+            raise ValueError(f"Insufficient {symbol} balance on {from_address}: "
+                             f"{self.from_base_units(token, state['balance'])} {symbol} available.")
+        tx = self._build(token, "transferFrom", [from_address, Web3.to_checksum_address(to), value])
+        tx_hash = self.tx_manager.send(tx)
+        logger.info(f"Moved {amount} {symbol} from {from_address} to {to}, tx hash: {tx_hash}")
+        return self._finish(tx, tx_hash, wait)
+
+    def batch_transfer(self, transfers: List[Dict[str, Any]], wait: bool = True) -> List[Dict[str, Any]]:
+        """Send many ``{"token", "to", "amount"}`` transfers, possibly across tokens, as one pipelined batch.
+
+        Balances for every token involved are read in one batch and checked against the per-token
+        totals, then all transactions are signed together and broadcast at consecutive nonces.
+        """
+        if not transfers:
+            return []
+        owner = self.tx_manager.address
+        tokens = list(dict.fromkeys(Web3.to_checksum_address(t["token"]) for t in transfers))
+        missing = [token for token in tokens if token not in self._metadata]
+        calls = [self.contract(token).functions.balanceOf(owner) for token in tokens]
+        for token in missing:
+            calls.extend(self._metadata_calls(token))
+        results = batch_call(self.w3, calls)
+        balances = dict(zip(tokens, results[:len(tokens)]))
+        for index, token in enumerate(missing):
+            offset = len(tokens) + 2 * index
+            self._metadata[token] = {"decimals": results[offset], "symbol": results[offset + 1]}
+
+        totals: Dict[str, int] = {}
+        values = []
+        for transfer in transfers:
+            token = Web3.to_checksum_address(transfer["token"])
+            value = self.to_base_units(token, transfer["amount"])
+            totals[token] = totals.get(token, 0) + value
+            values.append((token, Web3.to_checksum_address(transfer["to"]), value))
+        # Reject an unaffordable batch before paying for any gas estimates.
+        for token, total in totals.items():
+            if balances[token] < total:
+                symbol = self._metadata[token]["symbol"]
+                raise ValueError(f"Insufficient {symbol} balance for batch: {self.from_base_units(token, balances[token])} "
+                                 f"{symbol} available, {self.from_base_units(token, total)} {symbol} required.")
+
+        txs = [self._build(token, "transfer", [to, value]) for token, to, value in values]
+        hashes = self.tx_manager.send_batch(txs)
+        logger.info(f"Broadcast {len(hashes)} token transfers across {len(tokens)} token(s)")
+        return [{**transfer, **self._finish(tx, tx_hash, wait)} for transfer, tx, tx_hash in zip(transfers, txs, hashes)]
@@ -0,0 +1,211 @@
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from web3 import Web3
+
+from utils import get_logger
+from config import WATCHER
+
+logger = get_logger(__name__)
+
+
+class Subscription:
+    """One consumer's bounded asyncio queue of events, optionally filtered to a set of wallets."""
+
+    def __init__(self, wallets: Optional[Iterable[str]], loop: asyncio.AbstractEventLoop, queue_size: int,
+                 last_id: int = 0):
+        self.wallets = {Web3.to_checksum_address(w) for w in wallets} if wallets else None
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.last_id = last_id
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return self.wallets is None or event.get("wallet") in self.wallets
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        # Runs on the subscriber's loop. A consumer that falls behind loses its oldest events, never blocks publishers.
+        if event["id"] <= self.last_id:
+            return  # already delivered from the resume replay
+        self.last_id = event["id"]
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class EventLog:
+    """SQLite sequence of events shared by every process on the host (e.g. each gunicorn worker).
+
+    Appends get one global, increasing id, so Last-Event-ID means the same thing whichever
+    worker a client reconnects to. Chain-derived events carry a ``dedupe`` key, so the same
+    task log seen by every worker's ChainWatcher is stored once. Only the last ``history``
+    events are kept.
+    """
+
+    def __init__(self, path: str = WATCHER["event_log"], history: int = WATCHER["history"]):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.history = history
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "dedupe TEXT UNIQUE, body TEXT NOT NULL)")
+
+    def append(self, event: Dict[str, Any], dedupe: Optional[str]) -> Optional[int]:
+        """Store ``event`` (without its id); returns the id, or None if another process already stored it."""
+        with self._lock:
+            cursor = self._db.execute("INSERT OR IGNORE INTO events (dedupe, body) VALUES (?, ?)",
+                                      (dedupe, json.dumps(event, default=str)))
+            if not cursor.rowcount:
+                return None
+            event_id = cursor.lastrowid
+            if event_id % 100 == 0:
+                self._db.execute("DELETE FROM events WHERE id <= ?", (event_id - self.history,))
+        return event_id
+
+    def since(self, after_id: int, limit: int = 500) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute("SELECT id, body FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                                    (after_id, limit)).fetchall()
+        return [{"id": event_id, **json.loads(body)} for event_id, body in rows]
+
+    def last_id(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+
+def _dedupe_key(event: Dict[str, Any]) -> Optional[str]:
+    # Identifies one on-chain fact, whichever process observed it.
+    if not event.get("tx_hash"):
+        return None
+    return f"{event['type']}:{event['tx_hash']}:{event.get('task_id', '')}:{event.get('block', '')}"
+
+
+class EventBus:
+    """Process-wide fan-out of wallet events (transactions and Scheduler tasks).
+
+    Publishers are plain threads (TransactionManager, ChainWatcher); subscribers are asyncio
+    consumers such as the /events stream, plus synchronous listeners. Every event gets an
+    increasing ``id`` and the last ``history`` events are kept so a reconnecting client can
+    resume from its Last-Event-ID.
+
+    With an ``EventLog`` attached, events are appended to it and subscribers are fed by a
+    thread tailing the log instead, so a client sees events published by any worker and ids
+    are shared across workers. Synchronous listeners still see only this process's events,
+    on the publishing thread.
+    """
+
+    def __init__(self, queue_size: int = WATCHER["queue_size"], history: int = WATCHER["history"],
+                 poll_interval: float = WATCHER["event_poll_interval"]):
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history: deque = deque(maxlen=history)
+        self._subscriptions: List[Subscription] = []
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._log: Optional[EventLog] = None
+        self._tail_id = 0
+        self._tail: Optional[threading.Thread] = None
+
+    def attach_log(self, log: EventLog) -> None:
+        """Route subscriber delivery through ``log``; call it in each worker after the fork."""
+        with self._lock:
+            self._log = log
+            self._tail_id = log.last_id()
+
+    def _run_tail(self) -> None:
+        while True:
+            try:
+                events = self._log.since(self._tail_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Event log read failed: {e}")
+                events = []
+            for event in events:
+                with self._lock:
+                    self._tail_id = event["id"]
+                    subscriptions = [s for s in self._subscriptions if s.matches(event)]
+                self._deliver(subscriptions, event)
+            if not events:
+                time.sleep(self.poll_interval)
+
+    def _deliver(self, subscriptions: List[Subscription], event: Dict[str, Any]) -> None:
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                self.unsubscribe(subscription)  # its loop has closed
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def subscribe(self, wallets: Optional[Iterable[str]] = None, last_event_id: Optional[int] = None) -> Subscription:
+        """Must be called from the consuming event loop; ``wallets=None`` receives everything."""
+        subscription = Subscription(wallets, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                history = self._log.since(last_event_id, self._history.maxlen) if self._log is not None else self._history
+                for event in history:
+                    if event["id"] > last_event_id and subscription.matches(event):
+                        subscription.deliver(event)
+            self._subscriptions.append(subscription)
+            if self._log is not None and (self._tail is None or not self._tail.is_alive()):
+                self._tail = threading.Thread(target=self._run_tail, name="event-log-tail", daemon=True)
+                self._tail.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    def publish(self, event_type: str, wallet: Optional[str], **data: Any) -> Dict[str, Any]:
+        """Thread-safe; returns the published event."""
+        event = {
+            "type": event_type,
+            "wallet": Web3.to_checksum_address(wallet) if wallet else None,
+            "timestamp": int(time.time()),
+            **data,
+        }
+        subscriptions: List[Subscription] = []
+        log = self._log
+        if log is not None:
+            try:
+                # None when another worker already logged the same chain event; the tail thread delivers it.
+                event = {"id": log.append(event, _dedupe_key(event)), **event}
+            except sqlite3.Error as e:
+                logger.warning(f"Event log append failed for {event_type}: {e}")
+                event = {"id": None, **event}
+            with self._lock:
+                listeners = list(self._listeners)
+        else:
+            with self._lock:
+                event = {"id": next(self._ids), **event}
+                self._history.append(event)
+                subscriptions = [s for s in self._subscriptions if s.matches(event)]
+                listeners = list(self._listeners)
+        self._deliver(subscriptions, event)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"Event listener failed on {event_type}: {e}")
+        return event
+
+
+bus = EventBus()
@@ -0,0 +1,151 @@
+import itertools
+from typing import Any, Dict
+
+from eth_account import Account
+from eth_account.typed_transactions import TypedTransaction
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+# Same threshold the replacement engine targets (see tx_manager.MIN_REPLACEMENT_BUMP_PERCENT).
+REPLACEMENT_BUMP_PERCENT = 10
+
+
+class FakeChain:
+    """In-memory stand-in for the slice of ``w3.eth`` the transaction pipeline uses.
+
+    It keeps a mempool keyed by (sender, nonce), enforces the txpool replacement rule and only
+    includes transactions whose maxFeePerGas covers the current base fee, so stuck-transaction
+    and fee-spike scenarios can be reproduced without a node. Pass the instance wherever a
+    ``Web3`` object is expected: ``FakeChain().eth`` is the chain itself.
+
+    Args:
+        base_fee (int): Starting base fee in wei.
+        priority_fee (int): Value reported by ``max_priority_fee``.
+        blocks_per_poll (int): Blocks mined each time ``block_number`` is read, to let polling loops progress.
+    """
+
+    def __init__(self, base_fee: int = 10**8, priority_fee: int = 10**6, chain_id: int = 8453,
+                 blocks_per_poll: int = 0, gas_estimate: int = 50_000):
+        self.eth = self
+        self.account = Account
+        self.chain_id = chain_id
+        self.base_fee = base_fee
+        self.priority_fee = priority_fee
+        self.blocks_per_poll = blocks_per_poll
+        self.gas_estimate = gas_estimate
+        self._block_number = 0
+        self._timestamp = 1_700_000_000
+        self._mined_nonces: Dict[str, int] = {}
+        self._mempool: Dict[tuple, Dict[str, Any]] = {}
+        self._receipts: Dict[str, Dict[str, Any]] = {}
+        self._tx_index = itertools.count()
+
+    # ------------------------ w3.eth surface ------------------------
+    @property
+    def block_number(self) -> int:
+        if self.blocks_per_poll:
+            self.mine(self.blocks_per_poll)
+        return self._block_number
+
+    @property
+    def max_priority_fee(self) -> int:
+        return self.priority_fee
+
+    def is_connected(self) -> bool:
+        return True
+
+    def get_block(self, block_identifier: Any = 'latest') -> Dict[str, Any]:
+        number = self._block_number if block_identifier in ('latest', 'pending', 'safe', 'finalized') else int(block_identifier)
+        return {
+            "number": number,
+            "hash": HexBytes(Web3.keccak(text=f"block-{number}")),
+            "baseFeePerGas": self.base_fee,
+            "timestamp": self._timestamp + 2 * (number - self._block_number),
+        }
+
+    def get_transaction_count(self, address: str, block_identifier: Any = 'latest') -> int:
+        mined = self._mined_nonces.get(address, 0)
+        if block_identifier != 'pending':
+            return mined
+        nonce = mined
+        while (address, nonce) in self._mempool:
+            nonce += 1
+        return nonce
+
+    def get_balance(self, address: str, block_identifier: Any = 'latest') -> int:
+        return 10**24
+
+    def estimate_gas(self, tx: Dict[str, Any], block_identifier: Any = None) -> int:
+        return self.gas_estimate
+
+    def send_raw_transaction(self, raw_transaction: bytes) -> HexBytes:
+        tx = TypedTransaction.from_bytes(HexBytes(raw_transaction)).as_dict()
+        sender = Account.recover_transaction(raw_transaction)
+        tx_hash = Web3.to_hex(Web3.keccak(raw_transaction))
+        nonce = tx["nonce"]
+
+        if nonce < self._mined_nonces.get(sender, 0):
+            raise ValueError("nonce too low")
+        existing = self._mempool.get((sender, nonce))
+        if existing is not None:
+            if existing["hash"] == tx_hash:
+                raise ValueError("already known")
+            min_max = existing["maxFeePerGas"] * (100 + REPLACEMENT_BUMP_PERCENT) // 100
+            min_tip = existing["maxPriorityFeePerGas"] * (100 + REPLACEMENT_BUMP_PERCENT) // 100
+            if tx["maxFeePerGas"] < min_max or tx["maxPriorityFeePerGas"] < min_tip:
+                raise ValueError("replacement transaction underpriced")
+
+        self._mempool[(sender, nonce)] = {
+            "hash": tx_hash,
+            "from": sender,
+            "nonce": nonce,
+            "maxFeePerGas": tx["maxFeePerGas"],
+            "maxPriorityFeePerGas": tx["maxPriorityFeePerGas"],
+            "gas": tx["gas"],
+        }
+        return HexBytes(tx_hash)
+
+    def get_transaction_receipt(self, tx_hash: Any) -> Dict[str, Any]:
+        receipt = self._receipts.get(Web3.to_hex(HexBytes(tx_hash)))
+        if receipt is None:
+            raise TransactionNotFound(f"Transaction with hash: '{Web3.to_hex(HexBytes(tx_hash))}' not found.")
+        return receipt
+
+    def wait_for_transaction_receipt(self, tx_hash: Any, timeout: float = 120, poll_latency: float = 0.1) -> Dict[str, Any]:
+        return self.get_transaction_receipt(tx_hash)
+
+    # ------------------------ Simulation controls ------------------------
+    def set_base_fee(self, base_fee: int) -> None:
+        """Simulate a fee spike (or drop) that applies from the next mined block."""
+        self.base_fee = base_fee
+
+    def pending_count(self) -> int:
+        return len(self._mempool)
+
+    def mine(self, blocks: int = 1) -> None:
+        """Mine blocks, including each sender's executable transactions that pay the base fee."""
+        for _ in range(blocks):
+            self._block_number += 1
+            self._timestamp += 2
+            block_hash = self.get_block(self._block_number)["hash"]
+            for sender in sorted({key[0] for key in self._mempool}):
+                nonce = self._mined_nonces.get(sender, 0)
+                while (sender, nonce) in self._mempool:
+                    tx = self._mempool[(sender, nonce)]
+                    if tx["maxFeePerGas"] < self.base_fee:
+                        break
+                    del self._mempool[(sender, nonce)]
+                    self._receipts[tx["hash"]] = {
+                        "transactionHash": HexBytes(tx["hash"]),
+                        "blockNumber": self._block_number,
+                        "blockHash": block_hash,
+                        "transactionIndex": next(self._tx_index),
+                        "from": sender,
+                        "gasUsed": min(tx["gas"], self.gas_estimate),
+                        "effectiveGasPrice": min(tx["maxFeePerGas"], self.base_fee + tx["maxPriorityFeePerGas"]),
+                        "status": 1,
+                        "logs": [],
+                    }
+                    nonce += 1
+                self._mined_nonces[sender] = nonce
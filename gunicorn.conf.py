@@ -0,0 +1,13 @@
+# Picked up automatically by `gunicorn` from the working directory (see Procfile).
+import gc
+
+# Import api.py once in the master: parsed ABIs, selector tables and the shared state mmap are
+# then inherited by every worker instead of being rebuilt per worker.
+preload_app = True
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def when_ready(server):
+    # Move everything imported so far out of the collector's reach, so the first collection in a
+    # worker doesn't touch (and un-share) the master's pages.
+    gc.freeze()
@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from utils import get_logger
+from config import IDEMPOTENCY
+
+logger = get_logger(__name__)
+
+
+class IdempotencyStore:
+    """Map from Idempotency-Key to the (possibly still running) command result, shared by every worker.
+
+    Keys are claimed in a SQLite table with ``INSERT OR IGNORE``, so however many API workers
+    receive the same key, exactly one owns execution. Repeats get a Future: on the owning
+    worker it is the owner's own, elsewhere it is resolved by polling the table, so a retry
+    that arrives while a transfer is still being mined waits for it instead of broadcasting
+    again. A key is bound to the request it was first used with; reusing it for a different
+    one is rejected. Completed results expire after ``ttl`` seconds and the oldest completed
+    keys are evicted beyond ``max_keys``. Failures (exceptions, not error results) release the
+    key so the client can retry; a claim older than ``claim_timeout`` (its worker died) is
+    taken over by the next request.
+    """
+
+    def __init__(self, path: str = IDEMPOTENCY["path"], max_keys: int = IDEMPOTENCY["max_keys"],
+                 ttl: float = IDEMPOTENCY["ttl"], claim_timeout: float = IDEMPOTENCY["claim_timeout"],
+                 poll_interval: float = IDEMPOTENCY["poll_interval"]):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._owned: Dict[str, Future] = {}  # keys this process is executing
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        # Created on first use in each process: api.py builds the store before gunicorn forks.
+        if self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS idempotency (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                             "result TEXT, claimed_at REAL NOT NULL, completed_at REAL)")
+            self._owned, self._pid = {}, os.getpid()
+        return self._db
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute("DELETE FROM idempotency WHERE completed_at IS NOT NULL AND completed_at < ?", (now - self.ttl,))
+        # Keys still in flight are never evicted.
+        db.execute("DELETE FROM idempotency WHERE key IN (SELECT key FROM idempotency WHERE completed_at IS NOT NULL "
+                   "ORDER BY completed_at DESC LIMIT -1 OFFSET ?)", (self.max_keys,))
+
+    def begin(self, key: str, fingerprint: Hashable) -> Tuple[Future, bool]:
+        """Return ``(future, owner)``; only the owner runs the command and must call finish/fail."""
+        fingerprint = json.dumps(fingerprint, default=str)
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            self._evict(db, now)
+            claimed = db.execute(
+                "INSERT OR IGNORE INTO idempotency (key, fingerprint, claimed_at) VALUES (?, ?, ?)",
+                (key, fingerprint, now)).rowcount
+            if not claimed:
+                row = db.execute("SELECT fingerprint FROM idempotency WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] != fingerprint:
+                    raise ValueError("Idempotency-Key was already used with a different command.")
+                # Take over a claim whose worker stopped before finishing (or a row released meanwhile).
+                claimed = row is None and db.execute(
+                    "INSERT OR IGNORE INTO idempotency (key, fingerprint, claimed_at) VALUES (?, ?, ?)",
+                    (key, fingerprint, now)).rowcount
+                claimed = claimed or db.execute(
+                    "UPDATE idempotency SET claimed_at = ? WHERE key = ? AND completed_at IS NULL AND claimed_at < ?",
+                    (now, key, now - self.claim_timeout)).rowcount
+            if claimed:
+                future = self._owned[key] = Future()
+                return future, True
+            if key in self._owned:
+                return self._owned[key], False
+        future = Future()
+        threading.Thread(target=self._await, args=(key, future), name="idempotency-wait", daemon=True).start()
+        return future, False
+
+    def _await(self, key: str, future: Future) -> None:
+        """Resolve ``future`` from the table once another worker finishes (or abandons) ``key``."""
+        while True:
+            with self._lock:
+                row = self._conn().execute("SELECT result, completed_at FROM idempotency WHERE key = ?",
+                                           (key,)).fetchone()
+            if row is None:
+                future.set_exception(RuntimeError("The original request for this Idempotency-Key failed; retry it."))
+                return
+            if row[1] is not None:
+                future.set_result(json.loads(row[0]))
+                return
+            time.sleep(self.poll_interval)
+
+    def finish(self, key: str, result: Any) -> None:
+        with self._lock:
+            self._conn().execute("UPDATE idempotency SET result = ?, completed_at = ? WHERE key = ?",
+                                 (json.dumps(result, default=str), time.time(), key))
+            future = self._owned.pop(key, None)
+        if future is not None:
+            future.set_result(result)
+
+    def fail(self, key: str, exc: BaseException) -> None:
+        with self._lock:
+            self._conn().execute("DELETE FROM idempotency WHERE key = ? AND completed_at IS NULL", (key,))
+            future = self._owned.pop(key, None)
+        if future is not None:
+            future.set_exception(exc)
+
+
+class RequestCoalescer:
+    """Single-flight execution: concurrent calls with the same key share one run of ``fn``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+
+    def run(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
@@ -0,0 +1,226 @@
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from utils import get_logger
+from config import INTENT_PARSER
+from idempotency import RequestCoalescer
+from shared_state import SharedStore, get_shared_store
+from nlp_parser import ADDRESS_PATTERN, parse_command, resolve_time
+
+logger = get_logger(__name__)
+
+_ADDRESS = re.compile(ADDRESS_PATTERN)
+_NUMBER = re.compile(r"(?<![\w.<])\d*\.?\d+(?![\w.>])")
+
+SYSTEM_PROMPT = (
+    "You extract a single wallet command from a user's message. Addresses appear as <addr1>, <addr2>, ... and "
+    "numbers as <num1>, <num2>, ...; copy these placeholders verbatim, never invent values. Reply with JSON only:\n"
+    '{"action": "send_tokens", "amount": "<numN>", "to": "<addrN>"}\n'
+    '{"action": "batch_send_tokens", "amount": "<numN>", "recipients": ["<addrN>", ...]}\n'
+    '{"action": "schedule_transfers", "amount": "<numN>", "to": "<addrN>", "time": "<numN>" | "now" | "tomorrow"}\n'
+    '{"action": "cancel_tasks", "task_id": "<numN>"}\n'
+    '{"action": "list_tasks"} | {"action": "check_executor_permissions"} | '
+    '{"action": "check_scheduler_permissions"} | {"action": "help"}\n'
+    'If the message is not one of these, reply {"action": null}.'
+)
+
+# Actions that move funds or cancel them; when the model (not a rule) picked one, a human confirms first.
+CONFIRM_ACTIONS = {"send_tokens", "batch_send_tokens", "schedule_transfers", "cancel_tasks"}
+
+
+def unconfirmed(parsed: Dict[str, Any], confirm: Optional[bool]) -> bool:
+    """Pop ``needs_confirmation`` from a parse result; True if it must not run without an explicit confirm."""
+    return bool(parsed.pop("needs_confirmation", False)) and not confirm
+
+
+def normalize(command: str) -> Tuple[str, Dict[str, str]]:
+    """Lower-case, collapse whitespace and replace addresses/numbers with numbered placeholders.
+
+    "Send 0.1 to 0xAb.." and "send 2 to 0xCd.." share the template "send <num1> to <addr1>", so
+    one model call serves every command of the same shape.
+    """
+    text = " ".join(command.lower().split()).rstrip(".!?")
+    slots: Dict[str, str] = {}
+
+    def placeholder(kind: str) -> Any:
+        def replace(match: re.Match) -> str:
+            name = f"<{kind}{sum(1 for s in slots if s.startswith('<' + kind)) + 1}>"
+            slots[name] = match.group(0)
+            return name
+        return replace
+
+    text = _ADDRESS.sub(placeholder("addr"), text)
+    text = _NUMBER.sub(placeholder("num"), text)
+    return text, slots
+
+
+class IntentBackend:
+    """Turns a normalized prompt into the JSON intent described by SYSTEM_PROMPT."""
+
+    def extract(self, prompt: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class OpenAIIntentBackend(IntentBackend):
+    def __init__(self, model: str = INTENT_PARSER["model"], timeout: float = INTENT_PARSER["timeout"]):
+        from openai import OpenAI  # only needed when the LLM tier is enabled
+        self.model = model
+        self.client = OpenAI(timeout=timeout)
+
+    def extract(self, prompt: str) -> Dict[str, Any]:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            temperature=0,
+            response_format={"type": "json_object"},
+            messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+        )
+        return json.loads(response.choices[0].message.content)
+
+
+class StubIntentBackend(IntentBackend):
+    """Offline backend answering from a fixed template -> intent mapping (e.g. INTENT_STUB_FILE)."""
+
+    def __init__(self, responses: Optional[Dict[str, Dict[str, Any]]] = None, latency: float = 0.0):
+        self.responses = responses or {}
+        self.latency = latency
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> "StubIntentBackend":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def extract(self, prompt: str) -> Dict[str, Any]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.responses.get(prompt, {"action": None})
+
+
+class HybridParser:
+    """Compiled rules first; only misses reach the LLM backend.
+
+    Backend answers are cached per normalized template for ``cache_ttl`` (negative answers
+    included) in the shared state store, so every worker benefits from each model call;
+    identical concurrent misses share one call, and at most ``max_concurrency`` calls run at
+    once; a miss that cannot get a slot within ``timeout`` is treated as unparsed rather than
+    queueing behind the model. Intents may only reference placeholder values from the user's
+    own text, so the model cannot introduce an address or amount. Model-derived intents in
+    CONFIRM_ACTIONS come back with ``needs_confirmation`` set; callers must not execute them
+    without an explicit confirm.
+    """
+
+    def __init__(self, backend: Optional[IntentBackend] = None, cache_ttl: float = INTENT_PARSER["cache_ttl"],
+                 max_concurrency: int = INTENT_PARSER["max_concurrency"], timeout: float = INTENT_PARSER["timeout"],
+                 store: Optional[SharedStore] = None):
+        self.backend = backend
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self.store = store or get_shared_store()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._coalescer = RequestCoalescer()
+        self.stats = {"rule_hits": 0, "cache_hits": 0, "llm_calls": 0, "llm_errors": 0, "misses": 0}
+
+    def _cached(self, template: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(f"intent:{template}")
+
+    def _store(self, template: str, intent: Dict[str, Any]) -> None:
+        # Templates too long for a shared slot are simply not cached.
+        self.store.set(f"intent:{template}", intent, ttl=self.cache_ttl)
+
+    def _extract(self, template: str) -> Optional[Dict[str, Any]]:
+        if not self._slots.acquire(timeout=self.timeout):
+            logger.warning("Intent extraction saturated; treating command as unparsed")
+            return None
+        try:
+            self.stats["llm_calls"] += 1
+            intent = self.backend.extract(template)
+        except Exception as e:
+            # Backend failures are not cached; the next identical command tries again.
+            self.stats["llm_errors"] += 1
+            logger.warning(f"Intent backend failed: {e}")
+            return None
+        finally:
+            self._slots.release()
+        intent = intent if isinstance(intent, dict) else {"action": None}
+        self._store(template, intent)
+        return intent
+
+    @staticmethod
+    def _fill(intent: Dict[str, Any], slots: Dict[str, str]) -> Dict[str, Any]:
+        """Substitute placeholders and validate; anything malformed parses to ``{}``."""
+        def slot(name: Any, kind: str) -> str:
+            if not isinstance(name, str) or not name.startswith(f"<{kind}") or name not in slots:
+                raise ValueError(f"expected a <{kind}N> placeholder, got {name!r}")
+            return slots[name]
+
+        action = intent.get("action")
+        try:
+            if action in ("list_tasks", "check_executor_permissions", "check_scheduler_permissions", "help"):
+                return {"action": action}
+            if action == "cancel_tasks":
+                return {"action": action, "task_id": int(slot(intent.get("task_id"), "num"))}
+            if action == "send_tokens":
+                return {"action": action, "amount": float(slot(intent.get("amount"), "num")),
+                        "to": slot(intent.get("to"), "addr")}
+            if action == "batch_send_tokens":
+                amount = float(slot(intent.get("amount"), "num"))
+                recipients = [{"to": slot(name, "addr"), "amount": amount} for name in intent.get("recipients") or []]
+                return {"action": action, "recipients": recipients} if recipients else {}
+            if action == "schedule_transfers":
+                when = intent.get("time")
+                when = when if when in ("now", "tomorrow") else slot(when, "num")
+                return {"action": action, "amount": float(slot(intent.get("amount"), "num")),
+                        "to": slot(intent.get("to"), "addr"), "time": resolve_time(when)}
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Discarding malformed intent {intent}: {e}")
+        return {}
+
+    def parse(self, command: str) -> Dict[str, Any]:
+        result = parse_command(command)
+        if result:
+            self.stats["rule_hits"] += 1
+            return result
+        if self.backend is None:
+            self.stats["misses"] += 1
+            return {}
+
+        template, slots = normalize(command)
+        intent = self._cached(template)
+        if intent is not None:
+            self.stats["cache_hits"] += 1
+        else:
+            intent = self._coalescer.run(template, lambda: self._extract(template))
+        result = self._fill(intent, slots) if intent else {}
+        if not result:
+            self.stats["misses"] += 1
+        elif result["action"] in CONFIRM_ACTIONS:
+            result["needs_confirmation"] = True
+        logger.info(f"Free-form command parsed via intent backend: {result or 'no match'}")
+        return result
+
+
+def create_backend(name: str = INTENT_PARSER["backend"]) -> Optional[IntentBackend]:
+    if name == "openai":
+        return OpenAIIntentBackend()
+    if name == "stub":
+        return StubIntentBackend.from_file(INTENT_PARSER["stub_file"]) if INTENT_PARSER["stub_file"] else StubIntentBackend()
+    if name in ("", "none"):
+        return None
+    raise ValueError(f"Unknown INTENT_BACKEND '{name}'; expected openai, stub or none.")
+
+
+_parser: Optional[HybridParser] = None
+_parser_lock = threading.Lock()
+
+
+def get_intent_parser() -> HybridParser:
+    """Process-wide parser so every caller shares one cache and concurrency limit."""
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            _parser = HybridParser(create_backend())
+        return _parser
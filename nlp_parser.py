@@ -1,63 +1,82 @@
 import re
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Match, Tuple
 from datetime import datetime, timedelta
 import pytz
 
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+ADDRESS_PATTERN = r'0x[a-fA-F0-9]{40}'
+AMOUNT_PATTERN = r'\d*\.?\d+'
+TIME_PATTERN = r'\d{10}|tomorrow|now'
+
+# Optional unit after an amount ("0.1 eth to ...") and the trailing confirmation word.
+_UNIT = r'(?:\s*eth)?'
+_YES = r'(?:\s+yes)?'
+_SEND = r'(?:send_tokens|send|transfer|pay)'
+_SCHEDULE = r'(?:schedule_transfers|schedule(?:\s+a)?(?:\s+transfer)?(?:\s+of)?)'
+
+
+def resolve_time(time_str: str) -> int:
+    """Turn a parsed time token (unix timestamp, 'now' or 'tomorrow') into a unix timestamp."""
+    current_time = datetime.now(pytz.timezone("Africa/Kigali"))
+    if time_str == "tomorrow":
+        tomorrow = current_time + timedelta(days=1)
+        return int(tomorrow.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+    if time_str == "now":
+        return int(current_time.timestamp())
+    return int(time_str)
+
+
+def _send(match: Match) -> Dict[str, Any]:
+    return {"action": "send_tokens", "amount": float(match.group(1)), "to": match.group(2)}
+
+
+def _batch_send(match: Match) -> Dict[str, Any]:
+    amount = float(match.group(1))
+    return {"action": "batch_send_tokens",
+            "recipients": [{"to": address, "amount": amount} for address in re.findall(ADDRESS_PATTERN, match.group(2))]}
+
+
+def _schedule(match: Match) -> Dict[str, Any]:
+    return {"action": "schedule_transfers", "amount": float(match.group(1)), "to": match.group(2),
+            "time": resolve_time(match.group(3))}
+
+
+def _list_tasks(match: Match) -> Dict[str, Any]:
+    return {"action": "list_tasks", "after": int(match.group(1))} if match.group(1) else {"action": "list_tasks"}
+
+
+def _cancel(match: Match) -> Dict[str, Any]:
+    return {"action": "cancel_tasks", "task_id": int(match.group(1))}
+
+
+# Compiled once at import; tried in order against the lower-cased, whitespace-collapsed command.
+RULES: List[Tuple[re.Pattern, Callable[[Match], Dict[str, Any]]]] = [
+    (re.compile(r"^check executor permissions$"), lambda m: {"action": "check_executor_permissions"}),
+    (re.compile(r"^check scheduler permissions$"), lambda m: {"action": "check_scheduler_permissions"}),
+    (re.compile(r"^(?:list[ _]tasks|(?:show|list)(?: my)? (?:scheduled )?tasks|my tasks)(?: after (?:task\s*)?#?(\d+))?$"), _list_tasks),
+    (re.compile(r"^(?:help|hi|hello)$"), lambda m: {"action": "help"}),
+    (re.compile(r"^(?:cancel_tasks|cancel)\s+(?:task\s*)?#?(\d+)" + _YES + r"$"), _cancel),
+    (re.compile(r"^" + _SEND + r"\s+(" + AMOUNT_PATTERN + r")" + _UNIT + r"\s+to\s+(" + ADDRESS_PATTERN + r")" + _YES + r"$"), _send),
+    (re.compile(r"^" + _SEND + r"\s+(" + AMOUNT_PATTERN + r")" + _UNIT + r"\s+to\s+(" + ADDRESS_PATTERN
+                + r"(?:\s*,\s*(?:and\s+)?" + ADDRESS_PATTERN + r")+)" + _YES + r"$"), _batch_send),
+    (re.compile(r"^" + _SCHEDULE + r"\s+(" + AMOUNT_PATTERN + r")" + _UNIT + r"\s+to\s+(" + ADDRESS_PATTERN
+                + r")\s+(?:at|on)\s+(" + TIME_PATTERN + r")" + _YES + r"$"), _schedule),
+]
+
+
 def parse_command(command: str) -> Dict[str, Any]:
-    command_lower = command.lower().strip()
-    print(f"Debug: Command received: '{command_lower}'")  # Debug log
-    result: Dict[str, Any] = {}
-
-    address_pattern = r'0x[a-fA-F0-9]{40}'
-    amount_pattern = r'\d*\.?\d+'
-    time_pattern = r'\d{10}|tomorrow|now'
-
-    # Command matching with specific patterns
-    if command_lower == "check executor permissions":
-        result["action"] = "check_executor_permissions"
-    elif command_lower == "check scheduler permissions":
-        result["action"] = "check_scheduler_permissions"
-    elif command_lower in ["list tasks", "list_tasks"]:  # Handle both forms
-        result["action"] = "list_tasks"
-    elif command_lower in ["help", "hi", "hello"]:
-        result["action"] = "help"
-    elif re.match(r"^cancel_tasks\s+(?:task\s*)?(\d+)$", command_lower):
-        task_id_match = re.search(r"cancel_tasks\s+(?:task\s*)?(\d+)", command_lower)
-        if task_id_match:
-            result["action"] = "cancel_tasks"
-            result["task_id"] = int(task_id_match.group(1))
-            if "yes" in command_lower:
-                result["confirm"] = True
-    elif re.match(r"^send_tokens\s+" + amount_pattern + r"\s+to\s+" + address_pattern + r"(?:\s+yes)?$", command_lower):
-        match = re.match(r"^send_tokens\s(" + amount_pattern + r")\s+to\s(" + address_pattern + r")(?:\s+yes)?$", command_lower)
+    """Rule-based fast path: returns the parsed command, or ``{}`` if no rule matches."""
+    command_lower = " ".join(command.lower().split())
+    for pattern, build in RULES:
+        match = pattern.match(command_lower)
         if match:
-            result["action"] = "send_tokens"
-            result["amount"] = float(match.group(1))
-            result["to"] = match.group(2)
-            if "yes" in command_lower:
+            result = build(match)
+            if command_lower.endswith(" yes"):
                 result["confirm"] = True
-    elif re.match(r"^schedule_transfers\s+" + amount_pattern + r"\s+to\s+" + address_pattern + r"\s+at\s+" + time_pattern + r"(?:\s+yes)?$", command_lower):
-        match = re.match(r"^schedule_transfers\s(" + amount_pattern + r")\s+to\s(" + address_pattern + r")\s+at\s(" + time_pattern + r")(?:\s+yes)?$", command_lower)
-        if match:
-            result["action"] = "schedule_transfers"
-            result["amount"] = float(match.group(1))
-            result["to"] = match.group(2)
-            time_str = match.group(3)
-            cat_tz = pytz.timezone("Africa/Kigali")
-            current_time = datetime.now(cat_tz)
-            if time_str == "tomorrow":
-                tomorrow = current_time + timedelta(days=1)
-                tomorrow = tomorrow.replace(hour=0, minute=0, second=0, microsecond=0)
-                result["time"] = int(tomorrow.timestamp())
-            elif time_str == "now":
-                result["time"] = int(current_time.timestamp())
-            else:
-                result["time"] = int(time_str)
-            if "yes" in command_lower:
-                result["confirm"] = True
-
-    if not result:
-        print(f"Failed to parse command: {command}")
-    else:
-        print(f"Debug: Parsed result: {result}")
-    return result
\ No newline at end of file
+            logger.debug(f"Parsed command: {result}")
+            return result
+    logger.debug(f"Failed to parse command: {command}")
+    return {}
@@ -0,0 +1,33 @@
+import { HardhatRuntimeEnvironment } from "hardhat/types";
+import { DeployFunction } from "hardhat-deploy/types";
+
+const deployPaymentsModule: DeployFunction = async function (hre: HardhatRuntimeEnvironment) {
+  const { deployer } = await hre.getNamedAccounts();
+  const { deploy } = hre.deployments;
+
+  // --- Deploying PaymentsModule (batchSendETH / batchSendERC20 for multi-recipient payouts) ---
+  const payments = await deploy("PaymentsModule", {
+    from: deployer,
+    args: [deployer],
+    log: true,
+    autoMine: true,
+    waitConfirmations: 1,
+  });
+
+  console.log(`PaymentsModule deployed at: ${payments.address}`);
+  console.log("Set CONTRACT_PAYMENTS_ADDRESS to this address for the Python agent.");
+  console.log("========////////////////////////////////////////////////////////////====\n");
+
+  // --- Verification ---
+  if (process.env.VERIFY_CONTRACTS === "true") {
+    console.log("⏳Verifying PaymentsModule...");
+    await hre.run("verify:verify", {
+      address: payments.address,
+      constructorArguments: [deployer],
+    });
+    console.log("Verification complete");
+  }
+};
+
+export default deployPaymentsModule;
+deployPaymentsModule.tags = ["ChainPilot", "PaymentsModule"];
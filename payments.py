@@ -0,0 +1,86 @@
+from collections import Counter
+from typing import Any, Dict, List
+
+from web3 import Web3
+from web3.logs import DISCARD
+
+from utils import get_logger
+from config import PAYMENTS
+from erc20 import ERC20Client
+from tx_manager import TransactionManager
+
+logger = get_logger(__name__)
+
+
+class PaymentsBatcher:
+    """Routes multi-recipient ETH payouts through PaymentsModule.batchSendETH.
+
+    Recipient lists are split into chunks whose worst-case gas stays under ``max_batch_gas``;
+    all chunk transactions are signed together and broadcast at consecutive nonces. Results are
+    reported per recipient, decoded from each chunk's receipt.
+    """
+
+    def __init__(self, w3: Web3, payments_contract: Any, erc20: ERC20Client,
+                 max_batch_gas: int = PAYMENTS["max_batch_gas"]):
+        self.w3 = w3
+        self.payments = payments_contract
+        self.erc20 = erc20
+        self.max_batch_gas = max_batch_gas
+        self.chain_id = w3.eth.chain_id
+
+    def chunk(self, recipients: List[Dict[str, Any]], per_recipient_gas: int) -> List[List[Dict[str, Any]]]:
+        size = max(1, (self.max_batch_gas - PAYMENTS["base_gas"]) // per_recipient_gas)
+        return [recipients[offset:offset + size] for offset in range(0, len(recipients), size)]
+
+    def _tx(self, to: str, data: str, value: int, gas: int) -> Dict[str, Any]:
+        return {"to": to, "data": data, "value": value, "gas": gas, "chainId": self.chain_id}
+
+    @staticmethod
+    def _results(chunk: List[Dict[str, Any]], tx_hash: str, paid: Counter) -> List[Dict[str, Any]]:
+        results = []
+        for recipient in chunk:
+            key = (recipient["to"], recipient["value"])
+            status = "success" if paid[key] > 0 else "failed"
+            if paid[key] > 0:
+                paid[key] -= 1
+            results.append({"to": recipient["to"], "amount": recipient["amount"], "tx_hash": tx_hash, "status": status})
+        return results
+
+    def send_eth(self, tx_manager: TransactionManager, recipients: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Pay ``[{"to", "amount"}]`` (amounts in ETH) via batchSendETH; returns one result per recipient."""
+        recipients = [{**r, "to": Web3.to_checksum_address(r["to"]), "value": self.w3.to_wei(r["amount"], "ether")}
+                      for r in recipients]
+        chunks = self.chunk(recipients, PAYMENTS["eth_recipient_gas"])
+        txs = []
+        for chunk in chunks:
+            data = self.payments.encode_abi("batchSendETH", args=[[r["to"] for r in chunk], [r["value"] for r in chunk]])
+            gas = PAYMENTS["base_gas"] + PAYMENTS["eth_recipient_gas"] * len(chunk)
+            txs.append(self._tx(self.payments.address, data, sum(r["value"] for r in chunk), gas))
+        hashes = tx_manager.send_batch(txs)
+        logger.info(f"Paying {len(recipients)} recipients in {len(hashes)} batchSendETH transaction(s)")
+
+        results = []
+        for chunk, tx_hash in zip(chunks, hashes):
+            receipt = tx_manager.wait_for_receipt(tx_hash)
+            mined_hash = Web3.to_hex(receipt["transactionHash"])
+            events = self.payments.events.BatchPaymentSent().process_receipt(receipt, errors=DISCARD)
+            # batchSendETH is all-or-nothing and only emits a batch total, so a matching event means every recipient was paid.
+            paid = Counter()
+            if receipt["status"] == 1 and any(e["args"]["recipientCount"] == len(chunk) for e in events):
+                paid.update((r["to"], r["value"]) for r in chunk)
+            results.extend(self._results(chunk, mined_hash, paid))
+        return results
+
+    def send_erc20(self, token: str, recipients: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Pay ``[{"to", "amount"}]`` (whole tokens) with one ``transfer`` per recipient; returns one result each.
+
+        batchSendERC20 pays out of the module's own token balance and anyone may call it, so funding
+        the module first would leave the tokens claimable by whoever calls it next. Until the module
+        pulls with transferFrom, tokens go straight from the wallet via ERC20Client.batch_transfer,
+        which still signs every transfer together and broadcasts them at consecutive nonces.
+        """
+        transfers = [{"token": token, "to": Web3.to_checksum_address(r["to"]), "amount": r["amount"]} for r in recipients]
+        results = self.erc20.batch_transfer(transfers)
+        logger.info(f"Paid {len(recipients)} recipients in {len(results)} token transfer(s)")
+        return [{"to": r["to"], "amount": r["amount"], "tx_hash": r["transaction_hash"],
+                 "status": "success" if r["status"] == "success" else "failed"} for r in results]
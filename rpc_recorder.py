@@ -0,0 +1,232 @@
+import atexit
+import gzip
+import itertools
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from web3 import Web3
+from web3._utils.encoding import Web3JsonEncoder
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from utils import get_logger
+from config import NETWORK, RPC_RECORDING
+
+logger = get_logger(__name__)
+
+
+def _open(path: str, mode: str) -> Any:
+    return gzip.open(path, mode + "t") if path.endswith(".gz") else open(path, mode)
+
+
+def _plain(params: Any) -> Any:
+    """Params as plain JSON values (HexBytes, AttributeDicts, ... encoded the way they go over the wire)."""
+    return json.loads(json.dumps(params or [], cls=Web3JsonEncoder))
+
+
+def _key(method: str, params: Any) -> Tuple[str, str]:
+    return method, json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+class _RecordingFile:
+    """Append-only JSON-lines log shared by every RecordingProvider writing to the same path."""
+
+    _files: Dict[str, "_RecordingFile"] = {}
+    _files_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = _open(path, "w")
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    @classmethod
+    def for_path(cls, path: str) -> "_RecordingFile":
+        with cls._files_lock:
+            if path not in cls._files:
+                cls._files[path] = cls(path)
+            return cls._files[path]
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, separators=(",", ":"), cls=Web3JsonEncoder)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class RecordingProvider(JSONBaseProvider):
+    """Wraps another provider and logs every JSON-RPC exchange, with its wall time, to ``path``.
+
+    One line per request: ``{"m": method, "p": params, "r": response, "t": seconds}``; a batch is
+    ``{"b": [[method, params], ...], "r": [responses], "t": seconds}``. Paths ending in ``.gz``
+    are gzip-compressed.
+    """
+
+    def __init__(self, provider: JSONBaseProvider, path: str):
+        super().__init__()
+        self.provider = provider
+        self.recording = _RecordingFile.for_path(path)
+
+    def __str__(self) -> str:
+        return f"RPC recording of {self.provider} to {self.recording.path}"
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        started = time.perf_counter()
+        response = self.provider.make_request(method, params)
+        self.recording.write({"m": method, "p": _plain(params), "r": response,
+                              "t": round(time.perf_counter() - started, 6)})
+        return response
+
+    def make_batch_request(self, requests: List[Tuple[RPCEndpoint, Any]]) -> Any:
+        started = time.perf_counter()
+        responses = self.provider.make_batch_request(requests)
+        self.recording.write({"b": [[method, _plain(params)] for method, params in requests], "r": responses,
+                              "t": round(time.perf_counter() - started, 6)})
+        return responses
+
+
+def latency_model(spec: str, seed: Optional[int] = None) -> Callable[[float], float]:
+    """Build a delay function from a spec; it receives the recorded seconds and returns seconds to sleep.
+
+    Specs (milliseconds): ``none``, ``recorded``, ``fixed:MS``, ``uniform:LOW,HIGH``,
+    ``normal:MEAN,STDDEV`` and ``lognormal:MEDIAN,SIGMA``.
+    """
+    rng = random.Random(seed)
+    name, _, raw = spec.strip().lower().partition(":")
+    values = [float(v) for v in raw.split(",") if v.strip()]
+    if name == "none":
+        return lambda recorded: 0.0
+    if name == "recorded":
+        return lambda recorded: recorded
+    if name == "fixed" and len(values) == 1:
+        return lambda recorded: values[0] / 1000
+    if name == "uniform" and len(values) == 2:
+        return lambda recorded: rng.uniform(values[0], values[1]) / 1000
+    if name == "normal" and len(values) == 2:
+        return lambda recorded: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if name == "lognormal" and len(values) == 2:
+        return lambda recorded: values[0] * rng.lognormvariate(0.0, values[1]) / 1000
+    raise ValueError(f"Invalid RPC latency spec '{spec}'.")
+
+
+class _Recording:
+    """Loaded recording shared by every ReplayProvider reading the same path.
+
+    Responses are handed out in recorded order per exact (method, params) pair; when the exact
+    pair is exhausted or was never seen (params carrying timestamps, fresh signatures), the next
+    unused response for the method is used instead, unless ``strict``. Once a method's
+    responses are all used, the last one keeps being served, which suits polling reads.
+    """
+
+    _recordings: Dict[str, "_Recording"] = {}
+    _recordings_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self.exchanges: List[Dict[str, Any]] = []
+        self.by_key: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self.by_method: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+        with _open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    self._add(json.loads(line))
+        logger.info(f"Loaded {len(self.exchanges)} recorded RPC exchanges from {path}")
+
+    @classmethod
+    def for_path(cls, path: str) -> "_Recording":
+        with cls._recordings_lock:
+            if path not in cls._recordings:
+                cls._recordings[path] = cls(path)
+            return cls._recordings[path]
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        if "b" in entry:
+            pairs = [(method, params, response) for (method, params), response in zip(entry["b"], entry["r"])]
+        else:
+            pairs = [(entry["m"], entry["p"], entry["r"])]
+        for method, params, response in pairs:
+            exchange = {"response": response, "elapsed": entry["t"], "used": False}
+            self.exchanges.append(exchange)
+            self.by_key.setdefault(_key(method, params), []).append(exchange)
+            self.by_method.setdefault(method, []).append(exchange)
+
+    def _next_unused(self, name: Any, exchanges: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        cursor = self._cursors.get(name, 0)
+        while cursor < len(exchanges) and exchanges[cursor]["used"]:
+            cursor += 1
+        self._cursors[name] = cursor
+        return exchanges[cursor] if cursor < len(exchanges) else None
+
+    def take(self, method: str, params: Any, strict: bool) -> Dict[str, Any]:
+        key = _key(method, _plain(params))
+        with self._lock:
+            exchange = self._next_unused(key, self.by_key.get(key, []))
+            if exchange is None and not strict:
+                exchange = self._next_unused(method, self.by_method.get(method, []))
+            if exchange is None:
+                candidates = self.by_key.get(key) or ([] if strict else self.by_method.get(method))
+                if not candidates:
+                    raise ValueError(f"No recorded response for {method} in {self.path}.")
+                exchange = candidates[-1]
+            exchange["used"] = True
+            return exchange
+
+
+class ReplayProvider(JSONBaseProvider):
+    """Serves JSON-RPC responses from a RecordingProvider log, with no network access.
+
+    ``latency`` is a :func:`latency_model` spec applied per request (once per batch).
+    """
+
+    def __init__(self, path: str, latency: str = "recorded", seed: Optional[int] = None, strict: bool = False):
+        super().__init__()
+        self.recording = _Recording.for_path(path)
+        self.delay = latency_model(latency, seed)
+        self.strict = strict
+        self.ids = itertools.count()
+
+    def __str__(self) -> str:
+        return f"RPC replay of {self.recording.path}"
+
+    def _response(self, exchange: Dict[str, Any]) -> RPCResponse:
+        # Hand out a copy carrying a fresh id so the shared recording is never mutated by callers.
+        return {**exchange["response"], "id": next(self.ids)}
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        exchange = self.recording.take(method, params, self.strict)
+        delay = self.delay(exchange["elapsed"])
+        if delay > 0:
+            time.sleep(delay)
+        return self._response(exchange)
+
+    def make_batch_request(self, requests: List[Tuple[RPCEndpoint, Any]]) -> Any:
+        exchanges = [self.recording.take(method, params, self.strict) for method, params in requests]
+        delay = self.delay(max((e["elapsed"] for e in exchanges), default=0.0))
+        if delay > 0:
+            time.sleep(delay)
+        return [self._response(exchange) for exchange in exchanges]
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+
+def make_provider(rpc_url: Optional[str] = None) -> JSONBaseProvider:
+    """The provider the agent should use: replay if RPC_REPLAY_FILE is set, else HTTP, recorded if RPC_RECORD_FILE is set."""
+    if RPC_RECORDING["replay_file"]:
+        return ReplayProvider(RPC_RECORDING["replay_file"], RPC_RECORDING["replay_latency"],
+                              RPC_RECORDING["replay_seed"], RPC_RECORDING["replay_strict"])
+    provider = Web3.HTTPProvider(rpc_url or NETWORK["rpc_url"])
+    if RPC_RECORDING["record_file"]:
+        return RecordingProvider(provider, RPC_RECORDING["record_file"])
+    return provider
@@ -1,8 +1,8 @@
 import json
 import os
 import time
-from typing import Dict, List, Any
-from utils import send_token, get_logger
+from typing import Any, Callable, Dict, List, Optional
+from utils import get_logger
 from config import CONTRACT_ADDRESSES
 
 logger = get_logger(__name__)
@@ -10,9 +10,15 @@ logger.info("Scheduler started")  # Debug
 
 DATA_DIR = "data"
 JOBS_FILE = os.path.join(DATA_DIR, "scheduled_jobs.json")
+POLL_INTERVAL = 10  # seconds between passes over the job store
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
+def send_token(to_address: str, amount: float, token_contract: str) -> Dict[str, Any]:
+    # Imported lazily: the wallet provider connects to the RPC and needs the signer env at import time.
+    from wallet_provider import wallet_provider
+    return wallet_provider.transfer_token(token_contract, to_address, amount)
+
 def load_jobs() -> List[Dict[str, Any]]:
     try:
         if os.path.exists(JOBS_FILE):
@@ -54,29 +60,68 @@ def get_all_jobs() -> List[Dict[str, Any]]:
     """Return all pending scheduled jobs."""
     return load_jobs()
 
-def run_scheduler() -> None:
-    while True:
+class SystemClock:
+    """Wall-clock time source; the simulator swaps in a virtual clock with the same two methods."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class FileJobStore:
+    """Jobs persisted in JOBS_FILE (the store schedule_job writes to)."""
+
+    def load(self) -> List[Dict[str, Any]]:
+        return load_jobs()
+
+    def save(self, jobs: List[Dict[str, Any]]) -> None:
+        save_jobs(jobs)
+
+
+def dispatch_due(jobs: List[Dict[str, Any]], now: int, send: Callable[[str, float, str], Dict[str, Any]],
+                 on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """Send every job due at ``now``, one after another; returns the jobs still pending (not due, or failed)."""
+    remaining_jobs = []
+    for job in jobs:
+        if job["timestamp"] <= now:
+            result = send(job["to_address"], job["amount"], job["token_contract"])
+            if on_result is not None:
+                on_result(job, result)
+            if result["status"] == "success":
+                logger.info(f"Executed job {job['tx_hash']}: Sent {job['amount']} tokens to {job['to_address']}")
+            else:
+                logger.error(f"Failed to execute job {job['tx_hash']}: {result['message']}")
+                remaining_jobs.append(job)
+        else:
+            remaining_jobs.append(job)
+    return remaining_jobs
+
+
+def run_scheduler(clock: Optional[SystemClock] = None, send: Optional[Callable[[str, float, str], Dict[str, Any]]] = None,
+                  store: Optional[FileJobStore] = None, poll_interval: float = POLL_INTERVAL,
+                  until: Optional[float] = None,
+                  on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None) -> None:
+    """Poll the job store and send due jobs every ``poll_interval`` seconds.
+
+    Defaults run against the wall clock, the jobs file and ``send_token``; scheduler.simulator
+    injects a virtual clock, an in-memory store and a fake sender, and stops at ``until``.
+    """
+    clock = clock or SystemClock()
+    send = send or send_token
+    store = store or FileJobStore()
+    while until is None or clock.time() < until:
         logger.info("Checking jobs...")  # Debug
         try:
-            jobs = load_jobs()
-            current_time = int(time.time())
+            jobs = store.load()
+            current_time = int(clock.time())
             logger.info(f"Current time: {current_time}, Jobs: {len(jobs)}")  # Debug
-            remaining_jobs = []
-            for job in jobs:
-                if job["timestamp"] <= current_time:
-                    result = send_token(job["to_address"], job["amount"], job["token_contract"])
-                    if result["status"] == "success":
-                        logger.info(f"Executed job {job['tx_hash']}: Sent {job['amount']} tokens to {job['to_address']}")
-                    else:
-                        logger.error(f"Failed to execute job {job['tx_hash']}: {result['message']}")
-                        remaining_jobs.append(job)
-                else:
-                    remaining_jobs.append(job)
-            save_jobs(remaining_jobs)
-            time.sleep(10)
+            store.save(dispatch_due(jobs, current_time, send, on_result))
+            clock.sleep(poll_interval)
         except Exception as e:
             logger.error(f"Scheduler error: {e}")
-            time.sleep(10)
+            clock.sleep(poll_interval)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,240 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from eth_abi import encode
+from web3 import Web3
+
+from utils import get_logger, load_abi, batch_call
+from config import CONTRACT_ADDRESSES, KEEPER, WALLET_POOL
+from wallet_pool import PooledWallet, WalletPool
+from rpc_recorder import make_provider
+from tx_simulator import RevertDecoder, TransactionSimulator
+from tx_history import get_tx_history
+
+logger = get_logger(__name__)
+
+# Scheduler overloads executeTask; the keeper entry point is the uint256 one.
+EXECUTE_TASK_SELECTOR = Web3.keccak(text="executeTask(uint256)")[:4]
+GAS_MARGIN = 1.5
+
+
+class SchedulerKeeper:
+    """Executes due on-chain Scheduler tasks in batches.
+
+    Due task ids come from windowed ``getPendingTasks(from, to)`` reads over the lookback
+    period, task details from one batched read per chunk. Tasks are ordered by ``executeAt``
+    and any that would revert with ExecutionWindowNotReached/ExecutionWindowExpired at the
+    latest block are skipped locally. The rest are spread round-robin over the wallet pool and
+    submitted concurrently, one signed batch per wallet through its TransactionManager.
+
+    Every execution is simulated before it is signed. A task that reverts, in simulation or
+    on-chain, is left alone for ``revert_backoff`` seconds, doubling per revert, and dropped
+    for good after ``max_reverts``, so a task that can never succeed stops costing gas. Gas
+    limits are estimated once per task shape (executer, target, whether value is forwarded).
+    """
+
+    def __init__(self, w3: Web3, scheduler_contract: Any, pool: WalletPool,
+                 window: int = KEEPER["window"], lookback: int = KEEPER["lookback"],
+                 expiry_margin: int = KEEPER["expiry_margin"], max_batch: int = KEEPER["max_batch"],
+                 read_chunk: int = KEEPER["read_chunk"], default_gas: int = KEEPER["default_gas"],
+                 revert_backoff: float = KEEPER["revert_backoff"], max_reverts: int = KEEPER["max_reverts"],
+                 simulator: Optional[TransactionSimulator] = None):
+        self.w3 = w3
+        self.scheduler = scheduler_contract
+        self.pool = pool
+        self.window = window
+        self.lookback = lookback
+        self.expiry_margin = expiry_margin
+        self.max_batch = max_batch
+        self.read_chunk = read_chunk
+        self.default_gas = default_gas
+        self.revert_backoff = revert_backoff
+        self.max_reverts = max_reverts
+        self.simulator = simulator or TransactionSimulator(
+            w3, RevertDecoder.from_abi_names(["ChainPilotExecutor", "ChainPilotScheduler"]))
+        self.chain_id = w3.eth.chain_id
+        self._gas_limits: Dict[tuple, int] = {}
+        self._reverts: Dict[int, Tuple[int, float]] = {}  # task id -> (revert count, monotonic retry-after)
+        self._in_flight: Set[int] = set()
+
+    def _record_revert(self, task_id: int, message: str) -> None:
+        count = self._reverts.get(task_id, (0, 0.0))[0] + 1
+        self._reverts[task_id] = (count, time.monotonic() + self.revert_backoff * 2 ** (count - 1))
+        if count >= self.max_reverts:
+            logger.warning(f"Task {task_id} reverted {count} times ({message}); no longer executing it")
+        else:
+            logger.info(f"Task {task_id} reverted ({message}); retrying in {self.revert_backoff * 2 ** (count - 1):.0f}s")
+
+    def _backed_off(self, task_id: int) -> Optional[str]:
+        count, retry_after = self._reverts.get(task_id, (0, 0.0))
+        if count >= self.max_reverts:
+            return "RevertedTooOften"
+        if count and time.monotonic() < retry_after:
+            return "RevertBackoff"
+        return None
+
+    def _pending_ids(self, now: int) -> List[int]:
+        start = max(0, now - self.lookback)
+        calls = []
+        for window_start in range(start, now + 1, self.window):
+            window_end = min(window_start + self.window - 1, now)
+            calls.append(self.scheduler.functions.getPendingTasks(window_start, window_end))
+        ids: List[int] = []
+        for window_ids in batch_call(self.w3, calls):
+            ids.extend(window_ids)
+        return ids
+
+    def find_due_tasks(self, now: int) -> Dict[str, List[Dict[str, Any]]]:
+        """Return ``{"due": [...], "skipped": [...]}`` task dicts for the given block timestamp."""
+        task_ids = [task_id for task_id in dict.fromkeys(self._pending_ids(now)) if task_id not in self._in_flight]
+        due, skipped = [], []
+        for offset in range(0, len(task_ids), self.read_chunk):
+            chunk = task_ids[offset:offset + self.read_chunk]
+            details = batch_call(self.w3, [self.scheduler.functions.tasks(task_id) for task_id in chunk])
+            for task_id, task in zip(chunk, details):
+                entry = {"task_id": task_id, "execute_at": task[0], "expiry_at": task[1], "user": task[2],
+                         "executer": task[3], "target": task[4], "value": task[6]}
+                if task[7]:
+                    continue
+                backed_off = self._backed_off(task_id)
+                if backed_off:
+                    entry["reason"] = backed_off
+                    skipped.append(entry)
+                elif task[0] > now:
+                    entry["reason"] = "ExecutionWindowNotReached"
+                    skipped.append(entry)
+                elif task[1] != 0 and now + self.expiry_margin > task[1]:
+                    entry["reason"] = "ExecutionWindowExpired"
+                    skipped.append(entry)
+                else:
+                    due.append(entry)
+        due.sort(key=lambda entry: (entry["execute_at"], entry["task_id"]))
+        return {"due": due, "skipped": skipped}
+
+    def _build(self, task: Dict[str, Any], sender: str) -> Dict[str, Any]:
+        return {
+            "to": self.scheduler.address,
+            "data": Web3.to_hex(EXECUTE_TASK_SELECTOR + encode(["uint256"], [task["task_id"]])),
+            "value": 0,
+            "chainId": self.chain_id,
+            "from": sender,
+        }
+
+    def _gas(self, task: Dict[str, Any], tx: Dict[str, Any]) -> int:
+        # Tasks forwarding to the same executer and target with or without value cost about the same.
+        shape = (task.get("executer"), task.get("target"), bool(task.get("value")))
+        if shape not in self._gas_limits:
+            try:
+                self._gas_limits[shape] = int(self.w3.eth.estimate_gas(tx) * GAS_MARGIN)
+            except Exception as e:
+                logger.warning(f"Gas estimation for task {task['task_id']} failed: {e}. Using default gas value.")
+                return self.default_gas
+        return self._gas_limits[shape]
+
+    def _prepare(self, wallet: PooledWallet, tasks: List[Dict[str, Any]]) -> Tuple[list, list]:
+        """Simulate each execution; returns (tasks with their transactions, results for those that would revert)."""
+        ready, rejected = [], []
+        for task in tasks:
+            tx = self._build(task, wallet.address)
+            verdict = self.simulator.simulate(tx)
+            if not verdict["ok"]:
+                self._record_revert(task["task_id"], verdict["message"])
+                rejected.append({**task, "status": "rejected", "message": verdict["message"]})
+                continue
+            ready.append((task, {**tx, "gas": self._gas(task, tx)}))
+        return ready, rejected
+
+    def _submit(self, wallet: PooledWallet, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ready, results = self._prepare(wallet, tasks)
+        for offset in range(0, len(ready), self.max_batch):
+            chunk = [task for task, _ in ready[offset:offset + self.max_batch]]
+            try:
+                hashes = wallet.tx_manager.send_batch([tx for _, tx in ready[offset:offset + self.max_batch]])
+            except Exception as e:
+                logger.error(f"Submitting {len(chunk)} task executions from {wallet.address} failed: {e}")
+                results.extend({**t, "status": "error", "message": str(e)} for t in chunk)
+                continue
+            results.extend({**t, "tx_hash": tx_hash, "executor": wallet.address} for t, tx_hash in zip(chunk, hashes))
+
+        for result in results:
+            if "tx_hash" not in result:
+                continue
+            try:
+                receipt = wallet.tx_manager.wait_for_receipt(result["tx_hash"])
+                result["tx_hash"] = Web3.to_hex(receipt["transactionHash"])
+                result["status"] = "success" if receipt["status"] == 1 else "reverted"
+                if receipt["status"] == 1:
+                    self._reverts.pop(result["task_id"], None)
+                else:
+                    self._record_revert(result["task_id"], "reverted on-chain")
+            except Exception as e:
+                result["status"] = "error"
+                result["message"] = str(e)
+        return results
+
+    def execute(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Spread executions over the pool and submit them concurrently, one signed batch per wallet."""
+        if not tasks:
+            return []
+        wallets = list(self.pool.wallets.values())
+        assignments: Dict[str, List[Dict[str, Any]]] = {w.address: [] for w in wallets}
+        for index, task in enumerate(tasks):
+            assignments[wallets[index % len(wallets)].address].append(task)
+
+        self._in_flight.update(task["task_id"] for task in tasks)
+        try:
+            with ThreadPoolExecutor(max_workers=len(wallets)) as executor:
+                futures = [executor.submit(self._submit, self.pool.get(address), assigned)
+                           for address, assigned in assignments.items() if assigned]
+                results = [result for future in futures for result in future.result()]
+        finally:
+            self._in_flight.difference_update(task["task_id"] for task in tasks)
+        return sorted(results, key=lambda result: (result["execute_at"], result["task_id"]))
+
+    def run_once(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        now = self.w3.eth.get_block('latest')['timestamp']
+        found = self.find_due_tasks(now)
+        results = self.execute(found["due"])
+        summary = {
+            "block_timestamp": now,
+            "due": len(found["due"]),
+            "skipped": len(found["skipped"]),
+            "succeeded": sum(1 for r in results if r.get("status") == "success"),
+            "reverted": sum(1 for r in results if r.get("status") == "reverted"),
+            "rejected": sum(1 for r in results if r.get("status") == "rejected"),
+            "errors": sum(1 for r in results if r.get("status") == "error"),
+            "elapsed": round(time.monotonic() - started, 3),
+            "results": results,
+        }
+        if summary["due"]:
+            logger.info(f"Keeper run: {summary['due']} due, {summary['succeeded']} executed, "
+                        f"{summary['reverted']} reverted, {summary['rejected']} rejected in simulation, "
+                        f"{summary['errors']} errors in {summary['elapsed']}s")
+        return summary
+
+    def run_forever(self, poll_interval: float = KEEPER["poll_interval"]) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Keeper error: {e}", exc_info=True)
+            time.sleep(poll_interval)
+
+
+def create_keeper(w3: Optional[Web3] = None) -> SchedulerKeeper:
+    w3 = w3 or Web3(make_provider())
+    scheduler = w3.eth.contract(
+        address=Web3.to_checksum_address(CONTRACT_ADDRESSES["Scheduler"]),
+        abi=load_abi("ChainPilotScheduler")["abi"],
+    )
+    # With SIGNER_SOCKET set the primary key may be absent; get_signer(None) then resolves to the socket signer.
+    keys = [os.getenv("WALLET_PRIVATE_KEY")] + WALLET_POOL["private_keys"]
+    get_tx_history()  # record keeper executions alongside the agent's transactions
+    return SchedulerKeeper(w3, scheduler, WalletPool.from_private_keys(w3, keys))
+
+
+if __name__ == "__main__":
+    create_keeper().run_forever()
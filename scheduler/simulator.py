@@ -0,0 +1,285 @@
+"""Virtual-clock simulation of ``run_scheduler`` for capacity planning.
+
+Usage (from the repository root)::
+
+    python -m scheduler.simulator --rate 1200 --duration 3600 --latency lognormal:2500,0.4 --failure-rate 0.02
+    python -m scheduler.simulator --trace scheduler/data/scheduled_jobs.json --poll-interval 10
+    python -m scheduler.simulator --find-capacity --max-lag 60 --latency fixed:3000
+
+The real scheduler loop runs unchanged against a VirtualClock, an in-memory job store fed
+from an arrival trace and a fake ``send_token``. Sends take virtual time drawn from a latency
+spec (the RPC replay specs: ``fixed:MS``, ``uniform:LOW,HIGH``, ``normal:MEAN,STDDEV``,
+``lognormal:MEDIAN,SIGMA``) and fail with probability ``--failure-rate``. Hours of traffic
+replay in seconds. The JSON report gives:
+- dispatch lag percentiles (due time to the start of the successful send)
+- sends per hour and sender utilisation
+- backlog (jobs due but not yet sent) with its growth rate
+"""
+import argparse
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from rpc_recorder import latency_model
+from scheduler import job_scheduler
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class VirtualClock:
+    """Drop-in for SystemClock: ``sleep`` advances time instantly."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += max(0.0, seconds)
+
+
+class FakeSender:
+    """Stands in for ``send_token``: spends virtual latency, then succeeds or fails at random."""
+
+    def __init__(self, clock: VirtualClock, latency: str = "fixed:2000", failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        if not 0.0 <= failure_rate <= 1.0:
+            raise ValueError("failure_rate must be between 0 and 1.")
+        self.clock = clock
+        self.delay = latency_model(latency, seed)
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.busy = 0.0
+        self.last_started = 0.0
+
+    def __call__(self, to_address: str, amount: float, token_contract: str) -> Dict[str, Any]:
+        self.last_started = self.clock.time()
+        seconds = self.delay(0.0)
+        self.busy += seconds
+        self.clock.sleep(seconds)
+        if self.rng.random() < self.failure_rate:
+            return {"status": "error", "message": "simulated send failure"}
+        return {"status": "success", "tx_hash": f"0xsim{int(self.last_started * 1000):x}"}
+
+
+class TraceJobStore:
+    """In-memory job store that releases trace jobs as the clock passes their ``scheduled_at``.
+
+    Each ``load`` (one per scheduler pass) also samples the backlog: jobs already due but
+    not yet sent.
+    """
+
+    def __init__(self, clock: VirtualClock, trace: List[Dict[str, Any]]):
+        self.clock = clock
+        self.arrivals = sorted(trace, key=lambda job: job["scheduled_at"])
+        self.next_arrival = 0
+        self.jobs: List[Dict[str, Any]] = []
+        self.backlog: List[Tuple[float, int]] = []
+
+    def load(self) -> List[Dict[str, Any]]:
+        now = self.clock.time()
+        while self.next_arrival < len(self.arrivals) and self.arrivals[self.next_arrival]["scheduled_at"] <= now:
+            self.jobs.append(self.arrivals[self.next_arrival])
+            self.next_arrival += 1
+        self.backlog.append((now, sum(1 for job in self.jobs if job["timestamp"] <= now)))
+        return list(self.jobs)
+
+    def save(self, jobs: List[Dict[str, Any]]) -> None:
+        self.jobs = jobs
+
+
+def synthetic_trace(rate_per_hour: float, duration: float, lead: Tuple[float, float] = (60, 3600),
+                    align: int = 0, seed: Optional[int] = None, start: float = 0.0) -> List[Dict[str, Any]]:
+    """Poisson arrivals at ``rate_per_hour`` for ``duration`` seconds, each due ``lead`` seconds later.
+
+    ``align`` rounds due times up to a multiple of that many seconds (users scheduling "at
+    10:00" rather than at arbitrary seconds), which turns steady arrivals into dispatch bursts.
+    """
+    if rate_per_hour <= 0:
+        raise ValueError("rate_per_hour must be positive.")
+    rng = random.Random(seed)
+    trace, now = [], start
+    while True:
+        now += rng.expovariate(rate_per_hour / 3600)
+        if now >= start + duration:
+            return trace
+        due = int(now + rng.uniform(*lead))
+        if align:
+            due = -(-due // align) * align
+        trace.append({"tx_hash": f"sim-{len(trace)}", "amount": 0.001, "to_address": "0x" + "11" * 20,
+                      "token_contract": "0x" + "22" * 20, "timestamp": due, "scheduled_at": now})
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """Jobs from a JSON array (the scheduled_jobs.json format) or JSON lines.
+
+    ``scheduled_at`` is when the job arrived; without it the job is present from the start.
+    """
+    with open(path, "r") as f:
+        text = f.read().strip()
+    jobs = json.loads(text) if text.startswith("[") else [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not jobs:
+        raise ValueError(f"Trace {path} contains no jobs.")
+    start = min(min(job["timestamp"], job.get("scheduled_at", job["timestamp"])) for job in jobs)
+    return [{"tx_hash": job.get("tx_hash", f"trace-{index}"), "amount": job.get("amount", 0),
+             "to_address": job.get("to_address", ""), "token_contract": job.get("token_contract", ""),
+             "timestamp": int(job["timestamp"]), "scheduled_at": job.get("scheduled_at", start)}
+            for index, job in enumerate(jobs)]
+
+
+@contextmanager
+def _quiet_scheduler() -> Iterator[None]:
+    # Per-job and per-pass log lines would dominate the run time of a simulated day.
+    previous = job_scheduler.logger.level
+    job_scheduler.logger.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        job_scheduler.logger.setLevel(previous)
+
+
+def _slope_per_hour(samples: List[Tuple[float, int]]) -> float:
+    """Least-squares backlog growth in jobs per hour; near zero when the scheduler keeps up."""
+    if len(samples) < 2:
+        return 0.0
+    mean_t = sum(t for t, _ in samples) / len(samples)
+    mean_b = sum(b for _, b in samples) / len(samples)
+    spread = sum((t - mean_t) ** 2 for t, _ in samples)
+    if not spread:
+        return 0.0
+    return sum((t - mean_t) * (b - mean_b) for t, b in samples) / spread * 3600
+
+
+def simulate(trace: List[Dict[str, Any]], poll_interval: float = job_scheduler.POLL_INTERVAL,
+             latency: str = "fixed:2000", failure_rate: float = 0.0, drain: float = 3600,
+             seed: Optional[int] = None) -> Dict[str, Any]:
+    """Run the scheduler loop over ``trace`` in virtual time and report lag, throughput and backlog.
+
+    The run stops ``drain`` seconds after the last job falls due; jobs still unsent then are
+    reported as ``unsent``.
+    """
+    if not trace:
+        raise ValueError("Trace is empty.")
+    start = min(job["scheduled_at"] for job in trace)
+    end = max(job["timestamp"] for job in trace) + drain
+    clock = VirtualClock(start)
+    sender = FakeSender(clock, latency, failure_rate, seed)
+    store = TraceJobStore(clock, trace)
+    lags, completions, attempts, failures, last_finished = [], [], 0, 0, start
+
+    def record(job: Dict[str, Any], result: Dict[str, Any]) -> None:
+        nonlocal attempts, failures, last_finished
+        attempts += 1
+        last_finished = clock.time()
+        if result["status"] == "success":
+            lags.append(sender.last_started - job["timestamp"])
+            completions.append(clock.time() - job["timestamp"])
+        else:
+            failures += 1
+
+    wall_started = time.perf_counter()
+    with _quiet_scheduler():
+        job_scheduler.run_scheduler(clock=clock, send=sender, store=store, poll_interval=poll_interval,
+                                    until=end, on_result=record)
+    elapsed = clock.time() - start
+    backlog = [b for _, b in store.backlog]
+    first_due = min(job["timestamp"] for job in trace)
+    due_span = max(job["timestamp"] for job in trace) - first_due
+    # Rates are taken over the dispatch window (first due time to last send), not the lead-in and drain.
+    window = max(last_finished - first_due, 1.0)
+
+    def rounded(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value, 3)
+
+    return {
+        "jobs": len(trace),
+        "sent": len(lags),
+        "unsent": len(trace) - len(lags),
+        "attempts": attempts,
+        "failed_attempts": failures,
+        "poll_interval": poll_interval,
+        "latency": latency,
+        "failure_rate": failure_rate,
+        "virtual_seconds": round(elapsed, 1),
+        "wall_seconds": round(time.perf_counter() - wall_started, 3),
+        "dispatch_lag": {f"p{p}": rounded(percentile(lags, p)) for p in (50, 95, 99)} | {"max": rounded(max(lags, default=None))},
+        "completion_lag": {f"p{p}": rounded(percentile(completions, p)) for p in (50, 95, 99)},
+        "offered_per_hour": round(len(trace) / due_span * 3600, 1) if due_span else None,
+        "throughput_per_hour": round(len(lags) / window * 3600, 1),
+        "sender_utilisation": round(sender.busy / window, 4),
+        # Sends are sequential, so one process completes at most 3600 / mean send time per hour.
+        "estimated_capacity_per_hour": round(attempts / sender.busy * 3600 * (1 - failure_rate), 1) if sender.busy else None,
+        "backlog": {"max": max(backlog, default=0), "final": backlog[-1] if backlog else 0,
+                    "growth_per_hour": round(_slope_per_hour(
+                        [sample for sample in store.backlog if first_due <= sample[0] <= first_due + due_span]), 2)},
+    }
+
+
+def find_capacity(max_lag: float, duration: float = 3600, low: float = 1.0, high: float = 100_000.0,
+                  iterations: int = 14, **options: Any) -> Dict[str, Any]:
+    """Binary-search the highest synthetic arrival rate whose p95 dispatch lag stays within ``max_lag`` seconds.
+
+    ``sustainable_per_hour`` is the matching rate of jobs falling due, which is what the
+    scheduler actually has to keep up with (arrivals are spread further by their lead times).
+    """
+    seed = options.pop("seed", None)
+    lead = options.pop("lead", (60, 3600))
+    align = options.pop("align", 0)
+    best = None
+    for _ in range(iterations):
+        rate = (low * high) ** 0.5  # geometric midpoint: the range spans orders of magnitude
+        report = simulate(synthetic_trace(rate, duration, lead, align, seed), seed=seed, **options)
+        p95 = report["dispatch_lag"]["p95"]
+        if report["unsent"] == 0 and p95 is not None and p95 <= max_lag:
+            low, best = rate, report
+        else:
+            high = rate
+    return {"max_lag": max_lag, "arrival_rate_per_hour": round(low, 1),
+            "sustainable_per_hour": best["offered_per_hour"] if best else None, "report": best}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Virtual-clock simulation of the job scheduler")
+    parser.add_argument("--trace", help="Replay jobs from a JSON/JSONL file instead of a synthetic trace")
+    parser.add_argument("--rate", type=float, default=600, help="Synthetic arrivals per hour")
+    parser.add_argument("--duration", type=float, default=3600, help="Synthetic arrival window in seconds")
+    parser.add_argument("--lead", default="60,3600", help="Seconds between arrival and due time: MIN,MAX")
+    parser.add_argument("--align", type=int, default=0, help="Round due times up to this many seconds")
+    parser.add_argument("--poll-interval", type=float, default=job_scheduler.POLL_INTERVAL)
+    parser.add_argument("--latency", default="fixed:2000", help="Send latency spec (milliseconds)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--drain", type=float, default=3600, help="Seconds simulated after the last due time")
+    parser.add_argument("--find-capacity", action="store_true", help="Search for the highest sustainable rate")
+    parser.add_argument("--max-lag", type=float, default=60, help="p95 dispatch lag budget for --find-capacity")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    lead = tuple(float(v) for v in args.lead.split(","))
+    options = {"poll_interval": args.poll_interval, "latency": args.latency, "failure_rate": args.failure_rate,
+               "drain": args.drain}
+    if args.find_capacity:
+        report = find_capacity(args.max_lag, args.duration, lead=lead, align=args.align, seed=args.seed, **options)
+    else:
+        trace = load_trace(args.trace) if args.trace else synthetic_trace(args.rate, args.duration, lead, args.align, args.seed)
+        report = simulate(trace, seed=args.seed, **options)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from utils import get_logger
+from config import SHARED_STATE
+
+logger = get_logger(__name__)
+
+_MAGIC = b"CPSS"
+_HEADER = struct.Struct("<4sIII QQ")  # magic, version, slots, slot size, hits, misses
+_SLOT = struct.Struct("<QdI")  # key hash (0 = empty), expiry (unix time, 0 = never), value length
+_VERSION = 1
+_PROBE = 8  # slots examined per key; a full window evicts its soonest-expiring entry
+_MISSING = object()
+
+
+class SharedStore:
+    """Small TTL key/value store in shared memory, visible to every worker forked from one master.
+
+    Entries live in a fixed table of ``slots`` slots of ``slot_size`` bytes in an mmap. Values
+    are JSON, and a value too large for a slot is simply not stored. Without ``path`` the map
+    is anonymous: created before ``gunicorn --preload`` forks, every worker inherits the same
+    pages. With ``path`` the table is a file that unrelated processes (the keeper, a second
+    server) can open too. All access is serialized by one lock that works across processes,
+    so ``update`` is an atomic read-modify-write, e.g. for nonce cursors. With ``evict=False``
+    a write into a full probe window fails instead of displacing a live entry.
+    """
+
+    def __init__(self, path: Optional[str] = SHARED_STATE["path"], slots: int = SHARED_STATE["slots"],
+                 slot_size: int = SHARED_STATE["slot_size"], evict: bool = True):
+        if slot_size <= _SLOT.size:
+            raise ValueError(f"slot_size must be larger than {_SLOT.size} bytes.")
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.evict = evict
+        size = _HEADER.size + slots * slot_size
+        self._thread_lock = threading.RLock()
+        self._process_lock = None
+        self._fd = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            with self._locked_file():
+                if os.fstat(self._fd).st_size != size:
+                    os.ftruncate(self._fd, size)
+                self._map = mmap.mmap(self._fd, size)
+                self._init_header()
+        else:
+            self._map = mmap.mmap(-1, size)  # MAP_SHARED: stays shared with children after fork
+            try:
+                self._process_lock = multiprocessing.Lock()
+            except OSError as e:
+                # No POSIX semaphores (e.g. no /dev/shm); only safe while a single process uses the store.
+                logger.warning(f"Shared store lock unavailable, falling back to a thread lock: {e}")
+            self._init_header()
+
+    @contextmanager
+    def _locked_file(self) -> Iterator[None]:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._thread_lock:
+            if self._fd is not None:
+                with self._locked_file():
+                    yield
+            elif self._process_lock is not None:
+                with self._process_lock:
+                    yield
+            else:
+                yield
+
+    def _init_header(self) -> None:
+        magic, version, slots, slot_size, _, _ = _HEADER.unpack_from(self._map, 0)
+        if (magic, version, slots, slot_size) != (_MAGIC, _VERSION, self.slots, self.slot_size):
+            # New file, or one laid out by a different configuration: start empty.
+            self._map[:] = bytes(len(self._map))
+            _HEADER.pack_into(self._map, 0, _MAGIC, _VERSION, self.slots, self.slot_size, 0, 0)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def _offset(self, index: int) -> int:
+        return _HEADER.size + (index % self.slots) * self.slot_size
+
+    def _window(self, key_hash: int) -> Iterator[int]:
+        return (self._offset(key_hash + probe) for probe in range(min(_PROBE, self.slots)))
+
+    def _count(self, hit: bool) -> None:
+        magic, version, slots, slot_size, hits, misses = _HEADER.unpack_from(self._map, 0)
+        _HEADER.pack_into(self._map, 0, magic, version, slots, slot_size, hits + hit, misses + (not hit))
+
+    def _read(self, key: str) -> Any:
+        key_hash, now = self._hash(key), time.time()
+        for offset in self._window(key_hash):
+            slot_hash, expires_at, length = _SLOT.unpack_from(self._map, offset)
+            if slot_hash != key_hash:
+                continue
+            if expires_at and expires_at <= now:
+                return _MISSING
+            start = offset + _SLOT.size
+            stored_key, value = json.loads(self._map[start:start + length])
+            return value if stored_key == key else _MISSING
+        return _MISSING
+
+    def _write(self, key: str, value: Any, ttl: Optional[float]) -> bool:
+        payload = json.dumps([key, value], separators=(",", ":")).encode()
+        if _SLOT.size + len(payload) > self.slot_size:
+            return False
+        key_hash, now = self._hash(key), time.time()
+        window = [(offset, *_SLOT.unpack_from(self._map, offset)[:2]) for offset in self._window(key_hash)]
+        # The key's own slot, else a free or expired one, else the one expiring soonest (never-expiring last).
+        target = next((offset for offset, slot_hash, _ in window if slot_hash == key_hash), None)
+        if target is None and not self.evict:
+            target = next((offset for offset, slot_hash, expires_at in window
+                           if slot_hash == 0 or 0 < expires_at <= now), None)
+            if target is None:
+                return False
+        if target is None:
+            target = min(window, key=lambda slot: 0.0 if slot[1] == 0 or 0 < slot[2] <= now
+                         else slot[2] or float("inf"))[0]
+        _SLOT.pack_into(self._map, target, key_hash, now + ttl if ttl else 0.0, len(payload))
+        self._map[target + _SLOT.size:target + _SLOT.size + len(payload)] = payload
+        return True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._locked():
+            value = self._read(key)
+            self._count(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store a JSON-serializable value; False if it does not fit in a slot."""
+        with self._locked():
+            return self._write(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        key_hash = self._hash(key)
+        with self._locked():
+            for offset in self._window(key_hash):
+                if _SLOT.unpack_from(self._map, offset)[0] == key_hash:
+                    _SLOT.pack_into(self._map, offset, 0, 0.0, 0)
+
+    def update(self, key: str, fn: Callable[[Any], Any], ttl: Optional[float] = None) -> Any:
+        """Atomically replace the value with ``fn(current or None)`` across every process; returns the new value.
+
+        An exception raised by ``fn`` leaves the stored value untouched.
+        """
+        with self._locked():
+            current = self._read(key)
+            value = fn(None if current is _MISSING else current)
+            if not self._write(key, value, ttl):
+                raise ValueError(f"Value for shared key '{key}' does not fit in a {self.slot_size}-byte slot "
+                                 f"or its probe window is full.")
+            return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._locked():
+            _, _, _, _, hits, misses = _HEADER.unpack_from(self._map, 0)
+            used = sum(1 for index in range(self.slots) if _SLOT.unpack_from(self._map, self._offset(index))[0])
+        return {"slots": self.slots, "used": used, "hits": hits, "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None}
+
+
+_store: Optional[SharedStore] = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store() -> SharedStore:
+    """Process-wide store; call it before workers fork (api.py does at import) so they all share it."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SharedStore()
+            logger.info(f"Shared state store ready ({_store.path or 'anonymous mmap'}, {_store.slots} slots)")
+        return _store
+
+
+_nonce_store: Optional[SharedStore] = None
+
+
+def get_nonce_store() -> SharedStore:
+    """Non-evicting store for nonce cursors, kept apart so cache churn can never displace a cursor.
+
+    Like ``get_shared_store``, call it before workers fork.
+    """
+    global _nonce_store
+    with _store_lock:
+        if _nonce_store is None:
+            path = f"{SHARED_STATE['path']}.nonces" if SHARED_STATE["path"] else None
+            _nonce_store = SharedStore(path, slots=SHARED_STATE["nonce_slots"], evict=False)
+        return _nonce_store
+
+
+_wallet_store: Optional[SharedStore] = None
+
+
+def get_wallet_store() -> SharedStore:
+    """Non-evicting store for wallet pool ledgers, with slots large enough for a wallet's pending nonces.
+
+    Like ``get_shared_store``, call it before workers fork.
+    """
+    global _wallet_store
+    with _store_lock:
+        if _wallet_store is None:
+            path = f"{SHARED_STATE['path']}.wallets" if SHARED_STATE["path"] else None
+            _wallet_store = SharedStore(path, slots=SHARED_STATE["wallet_slots"],
+                                        slot_size=SHARED_STATE["wallet_slot_size"], evict=False)
+        return _wallet_store
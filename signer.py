@@ -0,0 +1,232 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from hexbytes import HexBytes
+from web3 import Web3
+
+from utils import get_logger
+from config import SIGNER
+
+logger = get_logger(__name__)
+
+
+class Signer:
+    """Single signing interface shared by the wallet providers and the transaction pipeline."""
+
+    address: str
+
+    def sign_transaction(self, tx: Dict[str, Any]) -> HexBytes:
+        """Return the raw signed transaction, ready for ``eth_sendRawTransaction``."""
+        return self.sign_transactions([tx])[0]
+
+    def sign_transactions(self, txs: List[Dict[str, Any]]) -> List[HexBytes]:
+        raise NotImplementedError
+
+    def sign_message(self, message: str) -> str:
+        """Sign ``solidityKeccak(string)`` of the message as an EIP-191 personal message."""
+        raise NotImplementedError
+
+
+# ------------------------ Local signing ------------------------
+_worker_account = None
+
+
+def _init_worker(private_key: str) -> None:
+    global _worker_account
+    _worker_account = Account.from_key(private_key)
+
+
+def _sign_in_worker(tx: Dict[str, Any]) -> bytes:
+    return bytes(_worker_account.sign_transaction(tx).raw_transaction)
+
+
+class LocalSigner(Signer):
+    """Signs in-process with an account derived once from the key.
+
+    Batches at or above ``parallel_threshold`` are spread across a process pool whose workers
+    each derive the account once at start-up, so large batches are not serialized on the GIL.
+    """
+
+    def __init__(self, private_key: str, workers: int = SIGNER["workers"],
+                 parallel_threshold: int = SIGNER["parallel_threshold"]):
+        self._private_key = private_key
+        self._account = Account.from_key(private_key)
+        self.address = self._account.address
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker, initargs=(self._private_key,)
+                )
+            return self._pool
+
+    def sign_transactions(self, txs: List[Dict[str, Any]]) -> List[HexBytes]:
+        if self.workers <= 1 or len(txs) < self.parallel_threshold:
+            return [self._account.sign_transaction(tx).raw_transaction for tx in txs]
+        chunksize = max(1, len(txs) // (self.workers * 4))
+        return [HexBytes(raw) for raw in self._get_pool().map(_sign_in_worker, txs, chunksize=chunksize)]
+
+    def sign_message(self, message: str) -> str:
+        digest = Web3.solidity_keccak(['string'], [message])
+        return Web3.to_hex(self._account.sign_message(encode_defunct(primitive=digest)).signature)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+# ------------------------ Unix socket transport ------------------------
+def _to_wire(tx: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: Web3.to_hex(value) if isinstance(value, (bytes, bytearray)) else value for key, value in tx.items()}
+
+
+class SocketSigner(Signer):
+    """Client for a signer process listening on a Unix socket (see ``serve``).
+
+    Requests are newline-delimited JSON over one persistent connection, so the API workers never
+    hold key material and signing CPU runs in the signer process.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self.address = self._request({"op": "address"})
+
+    def _connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._sock = sock
+        self._reader = sock.makefile("r", encoding="utf-8")
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = None
+        self._reader = None
+
+    def _request(self, payload: Dict[str, Any]) -> Any:
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+                    line = self._reader.readline()
+                    if not line:
+                        raise ConnectionError("Signer closed the connection")
+                    break
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt == 1:
+                        raise
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise ValueError(f"Signer error: {response.get('error')}")
+        return response["result"]
+
+    def sign_transactions(self, txs: List[Dict[str, Any]]) -> List[HexBytes]:
+        result = self._request({"op": "sign_transactions", "txs": [_to_wire(tx) for tx in txs]})
+        return [HexBytes(raw) for raw in result]
+
+    def sign_message(self, message: str) -> str:
+        return self._request({"op": "sign_message", "message": message})
+
+
+class _SignerRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        signer: LocalSigner = self.server.signer
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+                if op == "address":
+                    result = signer.address
+                elif op == "sign_transactions":
+                    result = [Web3.to_hex(raw) for raw in signer.sign_transactions(request["txs"])]
+                elif op == "sign_message":
+                    result = signer.sign_message(request["message"])
+                else:
+                    raise ValueError(f"Unsupported op: {op}")
+                response = {"ok": True, "result": result}
+            except Exception as e:
+                logger.warning(f"Signer request failed: {e}")
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+class _SignerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: str, private_key: str) -> None:
+    """Run a signer process that owns the key and answers signing requests on ``socket_path``."""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = _SignerServer(socket_path, _SignerRequestHandler)
+    os.chmod(socket_path, 0o600)
+    server.signer = LocalSigner(private_key)
+    logger.info(f"Signer for {server.signer.address} listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.signer.close()
+        server.server_close()
+        os.remove(socket_path)
+
+
+# ------------------------ Factory ------------------------
+_signers: Dict[str, Signer] = {}
+_signers_lock = threading.Lock()
+
+
+def get_signer(private_key: Optional[str] = None) -> Signer:
+    """Return the shared signer: the socket signer when SIGNER_SOCKET is set, otherwise a local one per key."""
+    cache_key = SIGNER["socket"] or private_key
+    if not cache_key:
+        raise ValueError("No signer configured: set SIGNER_SOCKET or provide a private key.")
+    with _signers_lock:
+        if cache_key not in _signers:
+            _signers[cache_key] = SocketSigner(SIGNER["socket"]) if SIGNER["socket"] else LocalSigner(private_key)
+        return _signers[cache_key]
+
+
+def get_pool_signers(private_keys: List[str]) -> List[Signer]:
+    """Signers for the extra wallet-pool keys, which only local signing can serve.
+
+    The socket signer process holds a single key, so pooling alongside it would give every
+    pool entry that one wallet and silently shrink the pool to it.
+    """
+    if private_keys and SIGNER["socket"]:
+        raise ValueError("WALLET_POOL_PRIVATE_KEYS cannot be combined with SIGNER_SOCKET: the signer process "
+                         "holds one key, so every pool wallet would sign as the same address.")
+    return [get_signer(key) for key in private_keys]
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    path = SIGNER["socket"] or "/tmp/chainpilot-signer.sock"
+    key = os.getenv("WALLET_PRIVATE_KEY")
+    if not key:
+        raise EnvironmentError("WALLET_PRIVATE_KEY must be set for the signer process.")
+    serve(path, key)
@@ -0,0 +1,21 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def test_streams_have_their_own_budget():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_streams=1)
+        release = admission.open_stream()
+        with pytest.raises(AdmissionRejected):
+            admission.open_stream()
+        async with admission.slot("send_tokens"):  # an open stream never takes a command slot
+            pass
+        release()
+        release()  # the body's finally and the response's background task may both release
+        assert admission.status()["streams"] == 0
+        admission.open_stream()
+
+    asyncio.run(scenario())
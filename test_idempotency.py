@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from idempotency import IdempotencyStore
+
+COMMAND = ("send 0.1 ETH to 0x1111111111111111111111111111111111111111", None, None)
+
+
+def make_stores(tmp_path):
+    path = os.path.join(tmp_path, "idempotency.sqlite3")
+    return IdempotencyStore(path, poll_interval=0.01), IdempotencyStore(path, poll_interval=0.01)
+
+
+def test_two_workers_share_one_key(tmp_path):
+    first, second = make_stores(tmp_path)
+    owner_future, owner = first.begin("key-1", COMMAND)
+    repeat_future, repeat_owner = second.begin("key-1", COMMAND)
+    assert owner and not repeat_owner
+    first.finish("key-1", {"status": "success", "tx_hash": "0xabc"})
+    assert repeat_future.result(timeout=2) == {"status": "success", "tx_hash": "0xabc"}
+    # A later retry on either worker replays without executing.
+    assert not second.begin("key-1", COMMAND)[1]
+
+
+def test_key_reused_for_another_command_is_rejected(tmp_path):
+    first, second = make_stores(tmp_path)
+    first.begin("key-1", COMMAND)
+    with pytest.raises(ValueError):
+        second.begin("key-1", ("list_tasks", None, None))
+
+
+def test_failure_releases_the_key(tmp_path):
+    first, second = make_stores(tmp_path)
+    first.begin("key-1", COMMAND)
+    waiting, _ = second.begin("key-1", COMMAND)
+    first.fail("key-1", RuntimeError("rpc down"))
+    with pytest.raises(RuntimeError):
+        waiting.result(timeout=2)
+    assert second.begin("key-1", COMMAND)[1]
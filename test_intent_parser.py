@@ -0,0 +1,78 @@
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from intent_parser import HybridParser, StubIntentBackend, unconfirmed
+from shared_state import SharedStore
+
+ADDRESS = "0x" + "ab" * 20
+MOVE = "could you move <num1> eth over to <addr1>"
+WIRE = "please wire <num1> eth across to <addr1>"
+RESPONSES = {
+    MOVE: {"action": "send_tokens", "amount": "<num1>", "to": "<addr1>"},
+    WIRE: {"action": "send_tokens", "amount": "<num1>", "to": "<addr1>"},
+}
+
+
+def make_parser(backend, **kwargs):
+    return HybridParser(backend, store=SharedStore(None, slots=64), **kwargs)
+
+
+def test_rule_hit_never_calls_the_backend():
+    backend = StubIntentBackend(RESPONSES)
+    result = make_parser(backend).parse(f"send 0.1 ETH to {ADDRESS}")
+    assert result["action"] == "send_tokens" and "needs_confirmation" not in result
+    assert backend.calls == 0
+
+
+def test_miss_is_cached_per_template_until_the_ttl():
+    backend = StubIntentBackend(RESPONSES)
+    parser = make_parser(backend, cache_ttl=0.2)
+    assert parser.parse(f"could you move 0.5 eth over to {ADDRESS}")["amount"] == 0.5
+    assert parser.parse(f"Could you move 2 ETH over to {ADDRESS}")["amount"] == 2.0  # same template
+    assert backend.calls == 1 and parser.stats["cache_hits"] == 1
+    time.sleep(0.25)
+    parser.parse(f"could you move 0.5 eth over to {ADDRESS}")
+    assert backend.calls == 2
+
+
+def test_saturated_backend_is_treated_as_unparsed():
+    backend = StubIntentBackend(RESPONSES, latency=0.5)
+    parser = make_parser(backend, max_concurrency=1, timeout=0.05)
+    slow = threading.Thread(target=parser.parse, args=(f"could you move 1 eth over to {ADDRESS}",))
+    slow.start()
+    while backend.calls == 0:
+        time.sleep(0.01)
+    assert parser.parse(f"please wire 1 eth across to {ADDRESS}") == {}  # a different template, no free slot
+    slow.join()
+    assert backend.calls == 1
+
+
+def test_model_derived_send_needs_confirmation():
+    result = make_parser(StubIntentBackend(RESPONSES)).parse(f"could you move 0.5 eth over to {ADDRESS}")
+    assert result == {"action": "send_tokens", "amount": 0.5, "to": ADDRESS, "needs_confirmation": True}
+    # The gate POST /triggers and the chatbot share: refused without confirm, and the flag is consumed.
+    assert unconfirmed(dict(result), confirm=False)
+    assert not unconfirmed(dict(result), confirm=True)
+    assert not unconfirmed({"action": "send_tokens", "amount": 0.1, "to": ADDRESS}, confirm=False)
+
+
+def test_chatbot_prompts_before_running_a_model_derived_send(monkeypatch):
+    # The real wallet_provider connects to the RPC node at import; the chatbot only passes its handle through.
+    monkeypatch.setitem(sys.modules, "wallet_provider", SimpleNamespace(wallet_provider_dict=None))
+    from chatbot import ChainPilotAgent
+
+    agent = object.__new__(ChainPilotAgent)
+    agent.parser = make_parser(StubIntentBackend(RESPONSES))
+    agent.pending_action = None
+    executed = []
+    agent._execute_action = lambda action, args: executed.append((action, args)) or {"status": "success"}
+
+    reply = agent.process_command(f"could you move 0.5 eth over to {ADDRESS}")
+    assert reply["status"] == "prompt" and reply["action"] == "send_tokens" and executed == []
+    assert agent.process_command("no")["message"] == "Action aborted." and executed == []
+
+    agent.process_command(f"could you move 0.5 eth over to {ADDRESS}")
+    assert agent.process_command("yes")["status"] == "success"
+    assert executed == [("send_tokens", {"to": ADDRESS, "amount": 0.5})]
@@ -0,0 +1,103 @@
+from web3 import Web3
+
+from fake_chain import FakeChain
+from shared_state import SharedStore
+from signer import LocalSigner
+from tx_manager import NonceManager, TransactionManager, bump_fees
+
+KEY = "0x" + "42" * 32
+RECIPIENT = "0x" + "11" * 20
+BASE_FEE = 10**8
+
+
+def make_manager(chain, **kwargs):
+    kwargs.setdefault("stuck_blocks", 3)
+    kwargs.setdefault("max_fee_cap", None)
+    return TransactionManager(chain, LocalSigner(KEY, workers=1), NonceManager(chain, SharedStore(None, slots=64)),
+                              poll_interval=0, **kwargs)
+
+
+def transfer():
+    return {"to": RECIPIENT, "value": 1, "gas": 21_000, "chainId": 8453}
+
+
+def test_only_replaces_after_stuck_blocks():
+    chain = FakeChain(base_fee=BASE_FEE)
+    manager = make_manager(chain)
+    manager.send(transfer())
+    chain.set_base_fee(BASE_FEE * 10)  # the original maxFeePerGas no longer clears the base fee
+    chain.mine(2)
+    assert manager.replace_stuck() == []
+    chain.mine(1)
+    assert len(manager.replace_stuck()) == 1
+    assert manager.pending_transactions()[0]["bumps"] == 1
+
+
+def test_bump_is_floored_at_txpool_minimum():
+    tx = {"maxFeePerGas": 1000, "maxPriorityFeePerGas": 100}
+    fees = bump_fees(tx, base_fee=0, bump_percent=1)
+    assert fees["maxFeePerGas"] >= 1100 and fees["maxPriorityFeePerGas"] >= 110
+    fees = bump_fees(tx, base_fee=0, bump_percent=12.5)
+    assert fees["maxFeePerGas"] >= 1125 and fees["maxPriorityFeePerGas"] >= 113
+
+
+def test_replacement_is_accepted_by_the_txpool():
+    chain = FakeChain(base_fee=BASE_FEE)
+    manager = make_manager(chain, bump_percent=1)
+    manager.send(transfer())
+    chain.set_base_fee(BASE_FEE * 10)
+    chain.mine(3)  # the chain accepts a replacement only with both caps raised by at least 10%
+    assert len(manager.replace_stuck()) == 1
+
+
+def test_fee_cap_clamps_or_blocks_replacement():
+    tx = {"maxFeePerGas": 1000, "maxPriorityFeePerGas": 100}
+    assert bump_fees(tx, base_fee=1000, max_fee_cap=1200) == {"maxFeePerGas": 1200, "maxPriorityFeePerGas": 113}
+    assert bump_fees(tx, base_fee=1000, max_fee_cap=1050) is None
+
+    chain = FakeChain(base_fee=BASE_FEE)
+    manager = make_manager(chain)
+    manager.send(transfer())
+    manager.max_fee_cap = manager.pending_transactions()[0]["tx"]["maxFeePerGas"]
+    chain.mine(3)
+    assert manager.replace_stuck() == []
+
+
+def test_wait_returns_the_replacement_receipt():
+    chain = FakeChain(base_fee=BASE_FEE)
+    manager = make_manager(chain)
+    original = manager.send(transfer())
+    chain.set_base_fee(BASE_FEE * 10)
+    chain.blocks_per_poll = 1  # each block_number read by the wait loop mines a block
+    receipt = manager.wait_for_receipt(original, timeout=5)
+    assert receipt["status"] == 1
+    assert Web3.to_hex(receipt["transactionHash"]) != original
+    assert manager.pending_transactions() == {}
+
+
+def test_wait_survives_a_record_settled_by_another_waiter():
+    chain = FakeChain(base_fee=BASE_FEE)
+    manager = make_manager(chain)
+    original = manager.send(transfer())
+    chain.mine(1)
+    manager._nonce_for = lambda tx_hash: 0  # looked up before the other waiter popped it
+    manager._pending.clear()
+    assert Web3.to_hex(manager.wait_for_receipt(original, timeout=1)["transactionHash"]) == original
+
+
+def test_nonce_cursor_is_seeded_from_chain_once():
+    chain = FakeChain(base_fee=BASE_FEE)
+    reads = []
+    chain.get_transaction_count = lambda address, block_identifier='latest': reads.append(address) or 7
+    nonces = NonceManager(chain, SharedStore(None, slots=64, evict=False))
+    address = LocalSigner(KEY, workers=1).address
+    assert [nonces.next_nonce(address) for _ in range(3)] == [7, 8, 9]
+    assert reads == [address]
+
+
+def test_non_evicting_store_refuses_rather_than_displacing_an_entry():
+    store = SharedStore(None, slots=8, evict=False)
+    for index in range(8):
+        assert store.set(f"cursor:{index}", index)
+    assert not store.set("another", 1)
+    assert [store.get(f"cursor:{index}") for index in range(8)] == list(range(8))
@@ -0,0 +1,54 @@
+from web3 import Web3
+from web3.providers.base import JSONBaseProvider
+
+from utils import batch_call
+
+ADDRESSES = ["0x" + "11" * 20, "0x" + "22" * 20, "0x" + "33" * 20]
+
+
+class CountingProvider(JSONBaseProvider):
+    """Records every request the provider receives; a JSON-RPC batch is one entry."""
+
+    def __init__(self, batching: bool = True):
+        super().__init__()
+        self.batching = batching
+        self.requests = []
+
+    def make_request(self, method, params):
+        self.requests.append([method])
+        return {"jsonrpc": "2.0", "id": 1, "result": hex(len(self.requests))}
+
+    def make_batch_request(self, requests):
+        if not self.batching:
+            raise NotImplementedError("no batch support")
+        self.requests.append([method for method, _ in requests])
+        return [{"jsonrpc": "2.0", "id": index, "result": hex(index + 100)} for index in range(len(requests))]
+
+    def is_connected(self, show_traceback=False):
+        return True
+
+
+def test_tuple_calls_go_out_as_one_batch():
+    w3 = Web3(CountingProvider())
+    results = batch_call(w3, [(w3.eth.get_balance, address) for address in ADDRESSES])
+    assert results == [100, 101, 102]
+    assert w3.provider.requests == [["eth_getBalance"] * 3]
+
+
+def test_tuple_calls_keep_extra_arguments():
+    w3 = Web3(CountingProvider())
+    batch_call(w3, [(w3.eth.get_balance, ADDRESSES[0], 7), (w3.eth.get_transaction_count, ADDRESSES[1], "pending")])
+    assert w3.provider.requests == [["eth_getBalance", "eth_getTransactionCount"]]
+
+
+def test_falls_back_to_sequential_calls_without_batch_support():
+    w3 = Web3(CountingProvider(batching=False))
+    results = batch_call(w3, [(w3.eth.get_balance, address) for address in ADDRESSES])
+    assert results == [1, 2, 3]
+    assert w3.provider.requests == [["eth_getBalance"]] * 3
+
+
+def test_empty_call_list_makes_no_request():
+    w3 = Web3(CountingProvider())
+    assert batch_call(w3, []) == []
+    assert w3.provider.requests == []
@@ -0,0 +1,73 @@
+import pytest
+from web3 import Web3
+
+from fake_chain import FakeChain
+from shared_state import SharedStore
+from signer import LocalSigner
+from wallet_pool import WalletPool
+
+RECIPIENT = "0x" + "11" * 20
+ETH = 10**18
+
+
+class PoolChain(FakeChain):
+    """FakeChain with a settable balance and the ``Web3`` bits the pool reads."""
+
+    from_wei = staticmethod(Web3.from_wei)
+
+    def __init__(self, balance: int, **kwargs):
+        super().__init__(**kwargs)
+        self.provider = object()
+        self.balance = balance
+
+    def get_balance(self, address, block_identifier='latest'):
+        return self.balance
+
+
+def make_pool(chain, key, store):
+    return WalletPool(chain, [LocalSigner(key, workers=1)], min_balance=0, store=store)
+
+
+def transfer(value):
+    return {"to": RECIPIENT, "value": value, "gas": 21_000, "chainId": 8453}
+
+
+def test_workers_cannot_overdraw_a_shared_wallet():
+    chain, store, key = PoolChain(ETH), SharedStore(None, slots=64), "0x" + "51" * 32
+    first, second = make_pool(chain, key, store), make_pool(chain, key, store)  # two API workers
+    with first.acquire(ETH * 6 // 10):
+        with pytest.raises(ValueError, match="Insufficient ETH balance"):
+            with second.acquire(ETH * 6 // 10):
+                pass
+        with second.acquire(ETH * 3 // 10):
+            pass
+    with second.acquire(ETH * 6 // 10):
+        pass
+
+
+def test_receipt_releases_the_reservation():
+    chain, store = PoolChain(ETH), SharedStore(None, slots=64)
+    pool = make_pool(chain, "0x" + "52" * 32, store)
+    with pool.acquire(ETH // 2) as wallet:
+        tx_hash = wallet.tx_manager.send(transfer(ETH // 4))
+    ledger = pool.ledger(wallet)
+    assert list(ledger["p"]) == ["0"] and not ledger["h"]
+    assert ledger["b"] - pool.available(wallet) > ETH // 4
+
+    chain.mine()
+    wallet.tx_manager.wait_for_receipt(tx_hash)
+    assert pool.ledger(wallet)["p"] == {}
+    assert pool.available(wallet) < ETH - ETH // 4  # debited by the receipt until the next head re-reads it
+
+
+def test_head_refresh_releases_confirmed_nonces():
+    chain, store = PoolChain(ETH), SharedStore(None, slots=64)
+    pool = make_pool(chain, "0x" + "53" * 32, store)
+    with pool.acquire(ETH // 2) as wallet:
+        wallet.tx_manager.send(transfer(ETH // 4))
+    assert pool.available(wallet) < ETH * 3 // 4
+
+    chain.mine()  # no receipt is read: only the head refresh sees the confirmed nonce
+    pool.note_head(chain.block_number)
+    assert pool.ledger(wallet)["p"] == {}
+    assert pool.available(wallet) == ETH
@@ -0,0 +1,402 @@
+import json
+import operator
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import compress
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from web3 import Web3
+
+from utils import get_logger, batch_call
+from config import TRIGGERS
+from event_bus import bus
+
+logger = get_logger(__name__)
+
+# Columns are compared as ``read value OP threshold``.
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq}
+CONDITION_TYPES = ("balance", "token_balance", "base_fee", "time_window", "block")
+TRIGGER_ACTIONS = ("send_tokens", "batch_send_tokens", "schedule_transfers", "cancel_tasks")
+# Repeating triggers for these need a cooldown, so one stuck-true condition cannot drain a wallet block by block.
+VALUE_ACTIONS = ("send_tokens", "batch_send_tokens", "schedule_transfers")
+BALANCE_OF_SELECTOR = Web3.keccak(text="balanceOf(address)")[:4]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS triggers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    command TEXT NOT NULL,
+    action TEXT NOT NULL,
+    parsed TEXT NOT NULL,
+    conditions TEXT NOT NULL,
+    once INTEGER NOT NULL DEFAULT 1,
+    cooldown_blocks INTEGER NOT NULL DEFAULT 0,
+    max_fires INTEGER NOT NULL DEFAULT 1,
+    not_before_block INTEGER NOT NULL DEFAULT 0,
+    expires_at INTEGER,
+    status TEXT NOT NULL DEFAULT 'active',
+    created_at REAL NOT NULL,
+    fired_count INTEGER NOT NULL DEFAULT 0,
+    last_fired_block INTEGER,
+    last_result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_triggers_status ON triggers (status);
+"""
+
+
+def normalize_condition(condition: Dict[str, Any], to_base_units: Optional[Callable[[str, float], int]] = None) -> Dict[str, Any]:
+    """Validate a user condition and convert it to the integer form the engine compares.
+
+    ``balance`` (ETH) and ``base_fee`` (gwei) thresholds become wei, ``token_balance`` becomes
+    base units via ``to_base_units(token, amount)``; ``time_window`` takes unix seconds
+    ``start`` and optional ``end``; ``block`` takes ``op`` and ``value`` on the block number.
+    """
+    kind = condition.get("type")
+    if kind not in CONDITION_TYPES:
+        raise ValueError(f"Unknown condition type '{kind}'. Use one of: {', '.join(CONDITION_TYPES)}.")
+    if kind == "time_window":
+        start, end = condition.get("start"), condition.get("end")
+        if not isinstance(start, int) or (end is not None and (not isinstance(end, int) or end <= start)):
+            raise ValueError("time_window needs an integer 'start' and, optionally, a later integer 'end'.")
+        return {"type": kind, "start": start, "end": end}
+
+    op, value = condition.get("op"), condition.get("value")
+    if op not in OPERATORS:
+        raise ValueError(f"Invalid operator '{op}'. Use one of: {', '.join(OPERATORS)}.")
+    if not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"{kind} condition needs a non-negative numeric 'value'.")
+    if kind == "block":
+        return {"type": kind, "op": op, "value": int(value)}
+    if kind == "base_fee":
+        return {"type": kind, "op": op, "value": Web3.to_wei(value, "gwei")}
+    address = condition.get("address")
+    if not address or not Web3.is_address(address):
+        raise ValueError(f"{kind} condition needs a valid 'address'.")
+    address = Web3.to_checksum_address(address)
+    if kind == "balance":
+        return {"type": kind, "address": address, "op": op, "value": Web3.to_wei(value, "ether")}
+    token = condition.get("token")
+    if not token or not Web3.is_address(token):
+        raise ValueError("token_balance condition needs a valid 'token' address.")
+    token = Web3.to_checksum_address(token)
+    if to_base_units is None:
+        raise ValueError("token_balance conditions need token metadata to convert the amount.")
+    return {"type": kind, "token": token, "address": address, "op": op, "value": to_base_units(token, value)}
+
+
+class TriggerStore:
+    """SQLite registry of triggers, shared by the API (which registers them) and the engine process.
+
+    Firing is claimed with a conditional UPDATE, so even two engines on one file fire a
+    trigger once. A trigger settles as ``fired`` once it has fired ``max_fires`` times.
+    """
+
+    def __init__(self, path: str = TRIGGERS["path"]):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(triggers)")}
+        if "max_fires" not in columns:  # files created before the limit existed
+            self._db.execute("ALTER TABLE triggers ADD COLUMN max_fires INTEGER NOT NULL DEFAULT 1")
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        trigger = dict(row)
+        trigger["conditions"] = json.loads(trigger["conditions"])
+        trigger["parsed"] = json.loads(trigger["parsed"])
+        trigger["once"] = bool(trigger["once"])
+        trigger["last_result"] = json.loads(trigger["last_result"]) if trigger["last_result"] else None
+        return trigger
+
+    def add(self, command: str, parsed: Dict[str, Any], conditions: List[Dict[str, Any]], once: bool = True,
+            cooldown_blocks: int = 0, expires_at: Optional[int] = None, max_fires: Optional[int] = None) -> int:
+        """Register ``command`` (already parsed, so firing needs no parser call) behind normalized ``conditions``.
+
+        One-shot triggers fire at most once; repeating ones at most ``max_fires`` times
+        (TRIGGERS["max_fires"] by default).
+        """
+        action = parsed.get("action")
+        if action not in TRIGGER_ACTIONS:
+            raise ValueError(f"Action '{action}' cannot be triggered. Use one of: {', '.join(TRIGGER_ACTIONS)}.")
+        if not conditions:
+            raise ValueError("A trigger needs at least one condition.")
+        if cooldown_blocks < 0:
+            raise ValueError("cooldown_blocks must not be negative.")
+        if once:
+            max_fires = 1
+        else:
+            max_fires = TRIGGERS["max_fires"] if max_fires is None else max_fires
+            if not 1 <= max_fires <= TRIGGERS["max_fires"]:
+                raise ValueError(f"max_fires must be between 1 and {TRIGGERS['max_fires']}.")
+            if action in VALUE_ACTIONS and cooldown_blocks < TRIGGERS["min_cooldown_blocks"]:
+                raise ValueError(f"Repeating {action} triggers need cooldown_blocks of at least "
+                                 f"{TRIGGERS['min_cooldown_blocks']}.")
+        with self._lock:
+            active = self._db.execute("SELECT COUNT(*) FROM triggers WHERE status = 'active'").fetchone()[0]
+            if active >= TRIGGERS["max_active"]:
+                raise ValueError(f"Too many active triggers (limit {TRIGGERS['max_active']}).")
+            cursor = self._db.execute(
+                "INSERT INTO triggers (command, action, parsed, conditions, once, cooldown_blocks, max_fires, expires_at, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (command, action, json.dumps(parsed), json.dumps(conditions), int(once), cooldown_blocks, max_fires,
+                 expires_at, time.time()),
+            )
+            return cursor.lastrowid
+
+    def get(self, trigger_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM triggers WHERE id = ?", (trigger_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        query, params = "SELECT * FROM triggers", ()
+        if status:
+            query, params = query + " WHERE status = ?", (status,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY id", params).fetchall()
+        return [self._row(row) for row in rows]
+
+    def cancel(self, trigger_id: int) -> bool:
+        with self._lock:
+            return self._db.execute("UPDATE triggers SET status = 'cancelled' WHERE id = ? AND status = 'active'",
+                                    (trigger_id,)).rowcount == 1
+
+    def expire(self, now: int) -> int:
+        with self._lock:
+            return self._db.execute("UPDATE triggers SET status = 'expired' WHERE status = 'active' AND expires_at <= ?",
+                                    (now,)).rowcount
+
+    def claim(self, trigger_id: int) -> bool:
+        with self._lock:
+            return self._db.execute("UPDATE triggers SET status = 'firing' WHERE id = ? AND status = 'active'",
+                                    (trigger_id,)).rowcount == 1
+
+    def recover(self) -> int:
+        """Fail triggers left ``firing`` by an engine that stopped mid-fire; their send may or may not have gone out."""
+        result = {"status": "error", "message": "Trigger engine stopped while firing; outcome unknown, not retried."}
+        with self._lock:
+            return self._db.execute("UPDATE triggers SET status = 'failed', last_result = ? WHERE status = 'firing'",
+                                    (json.dumps(result),)).rowcount
+
+    def finish(self, trigger: Dict[str, Any], block_number: int, result: Dict[str, Any]) -> None:
+        """Record a firing; repeating triggers re-arm after their cooldown until ``max_fires``, one-shot ones settle."""
+        ok = result.get("status") == "success"
+        status = ("fired" if ok else "failed") if trigger["once"] else "active"
+        with self._lock:
+            self._db.execute(
+                "UPDATE triggers SET status = CASE WHEN fired_count + 1 >= max_fires AND ? = 'active' THEN 'fired' "
+                "ELSE ? END, fired_count = fired_count + 1, last_fired_block = ?, not_before_block = ?, "
+                "last_result = ? WHERE id = ?",
+                (status, status, block_number, block_number + trigger["cooldown_blocks"] + 1,
+                 json.dumps(result, default=str), trigger["id"]),
+            )
+
+    def data_version(self) -> int:
+        """Changes whenever another connection commits, i.e. when the API registers or cancels triggers."""
+        with self._lock:
+            return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+
+class TriggerPlan:
+    """Active triggers compiled into columns, evaluated against one block's reads at a time.
+
+    Each distinct read (an address balance, a token balance) gets one slot however many
+    triggers share it. Conditions are grouped by (source, operator) into parallel columns of
+    trigger index, read slot and threshold. Evaluating a block is then one ``map`` over each
+    column, and any trigger with a failing condition is knocked out of an ``alive`` mask.
+    """
+
+    def __init__(self, triggers: List[Dict[str, Any]]):
+        self.triggers = triggers
+        self.balance_reads: List[str] = []
+        self.token_reads: List[Tuple[str, str]] = []
+        slots: Dict[Any, int] = {}
+        # (source, op) -> (trigger indexes, read slots, thresholds); block-level sources use slot -1.
+        self.columns: Dict[Tuple[str, str], Tuple[List[int], List[int], List[int]]] = {}
+        self.min_expiry: Optional[int] = None
+
+        def add(index: int, source: str, op: str, threshold: int, slot: int = -1) -> None:
+            column = self.columns.setdefault((source, op), ([], [], []))
+            column[0].append(index)
+            column[1].append(slot)
+            column[2].append(threshold)
+
+        for index, trigger in enumerate(triggers):
+            expires_at = trigger["expires_at"]
+            if expires_at is not None and (self.min_expiry is None or expires_at < self.min_expiry):
+                self.min_expiry = expires_at
+            if trigger["not_before_block"]:
+                add(index, "number", ">=", trigger["not_before_block"])
+            for condition in trigger["conditions"]:
+                kind = condition["type"]
+                if kind == "time_window":
+                    add(index, "timestamp", ">=", condition["start"])
+                    if condition["end"] is not None:
+                        add(index, "timestamp", "<", condition["end"])
+                elif kind == "base_fee":
+                    add(index, "baseFeePerGas", condition["op"], condition["value"])
+                elif kind == "block":
+                    add(index, "number", condition["op"], condition["value"])
+                else:
+                    key = condition["address"] if kind == "balance" else (condition["token"], condition["address"])
+                    if key not in slots:
+                        slots[key] = len(slots)
+                        (self.balance_reads if kind == "balance" else self.token_reads).append(key)
+                    add(index, "read", condition["op"], condition["value"], slots[key])
+        # Slots were numbered in first-seen order across both kinds; reads are issued balances first.
+        order = {key: position for position, key in enumerate(self.balance_reads + self.token_reads)}
+        renumber = {slot: order[key] for key, slot in slots.items()}
+        for (source, _), (_, column_slots, _) in self.columns.items():
+            if source == "read":
+                column_slots[:] = [renumber[slot] for slot in column_slots]
+
+    def read_calls(self, w3: Web3, block_number: int) -> List[tuple]:
+        calls = [(w3.eth.get_balance, address, block_number) for address in self.balance_reads]
+        for token, owner in self.token_reads:
+            data = Web3.to_hex(BALANCE_OF_SELECTOR + bytes(12) + bytes.fromhex(owner[2:]))
+            calls.append((w3.eth.call, {"to": token, "data": data}, block_number))
+        return calls
+
+    def evaluate(self, block: Dict[str, Any], reads: List[Any]) -> List[Dict[str, Any]]:
+        """Triggers whose every condition holds at ``block`` given the values of ``read_calls``."""
+        values = [int.from_bytes(bytes(value), "big") if isinstance(value, (bytes, bytearray)) else int(value)
+                  for value in reads]
+        alive = bytearray(b"\x01") * len(self.triggers)
+        for (source, op), (indexes, slots, thresholds) in self.columns.items():
+            compare = OPERATORS[op]
+            if source == "read":
+                passed = map(compare, map(values.__getitem__, slots), thresholds)
+            else:
+                # Block-level value compared against every threshold in the column.
+                scalar = block.get(source) or 0
+                passed = map(partial(compare, scalar), thresholds)
+            for index in compress(indexes, map(operator.not_, passed)):
+                alive[index] = 0
+        return list(compress(self.triggers, alive))
+
+
+class TriggerEngine:
+    """Evaluates every active trigger once per new block and fires the ones whose conditions hold.
+
+    Per block, the cost is one header read plus the plan's deduplicated reads, pinned to that
+    block and sent in batches of ``read_chunk``. Evaluation is columnar. Matching triggers are
+    claimed in the store and fired on a small thread pool through ``fire``, so slow sends never
+    delay the next block.
+    """
+
+    def __init__(self, w3: Web3, store: TriggerStore, fire: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 poll_interval: float = TRIGGERS["poll_interval"], read_chunk: int = TRIGGERS["read_chunk"],
+                 fire_workers: int = TRIGGERS["fire_workers"]):
+        self.w3 = w3
+        self.store = store
+        self.fire = fire
+        self.poll_interval = poll_interval
+        self.read_chunk = read_chunk
+        self._executor = ThreadPoolExecutor(max_workers=fire_workers, thread_name_prefix="trigger-fire")
+        self._plan: Optional[TriggerPlan] = None
+        self._version: Optional[int] = None
+        self._dirty = True
+        self._last_block: Optional[int] = None
+        recovered = store.recover()
+        if recovered:
+            logger.warning(f"Marked {recovered} trigger(s) left mid-fire by a previous engine as failed")
+
+    def _current_plan(self, timestamp: int) -> TriggerPlan:
+        version = self.store.data_version()
+        if self._plan is not None and self._plan.min_expiry is not None and timestamp >= self._plan.min_expiry:
+            self.store.expire(timestamp)
+            self._dirty = True
+        if self._dirty or version != self._version or self._plan is None:
+            # Cleared before reading, so a firing that finishes meanwhile forces another compile.
+            self._version, self._dirty = version, False
+            self._plan = TriggerPlan(self.store.list("active"))
+            logger.info(f"Compiled {len(self._plan.triggers)} active trigger(s) into "
+                        f"{len(self._plan.balance_reads) + len(self._plan.token_reads)} distinct read(s)")
+        return self._plan
+
+    def _read(self, plan: TriggerPlan, block_number: int) -> List[Any]:
+        calls = plan.read_calls(self.w3, block_number)
+        values: List[Any] = []
+        for offset in range(0, len(calls), self.read_chunk):
+            values.extend(batch_call(self.w3, calls[offset:offset + self.read_chunk]))
+        return values
+
+    def _fire(self, trigger: Dict[str, Any], block_number: int) -> None:
+        try:
+            result = self.fire(trigger)
+        except Exception as e:
+            logger.error(f"Trigger {trigger['id']} failed: {e}", exc_info=True)
+            result = {"status": "error", "message": str(e)}
+        self.store.finish(trigger, block_number, result)
+        self._dirty = True
+        bus.publish("trigger_fired", None, trigger_id=trigger["id"], block=block_number,
+                    status=result.get("status"), tx_hash=result.get("tx_hash"))
+        logger.info(f"Trigger {trigger['id']} fired at block {block_number}: {result.get('status')}")
+
+    def run_once(self) -> Dict[str, Any]:
+        """Evaluate the latest block if it is new; returns what happened."""
+        block = self.w3.eth.get_block("latest")
+        number = block["number"]
+        if number == self._last_block:
+            return {"block": number, "evaluated": 0, "fired": []}
+        started = time.perf_counter()
+        plan = self._current_plan(block["timestamp"])
+        matched = plan.evaluate(block, self._read(plan, number)) if plan.triggers else []
+        fired = []
+        for trigger in matched:
+            if self.store.claim(trigger["id"]):
+                self._dirty = True
+                fired.append(trigger["id"])
+                self._executor.submit(self._fire, trigger, number)
+        self._last_block = number
+        elapsed = time.perf_counter() - started
+        if fired or elapsed > self.poll_interval:
+            logger.info(f"Block {number}: {len(plan.triggers)} trigger(s) checked in {elapsed:.3f}s, fired {fired}")
+        return {"block": number, "evaluated": len(plan.triggers), "fired": fired, "seconds": round(elapsed, 4)}
+
+    def run_forever(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Trigger engine error: {e}", exc_info=True)
+            time.sleep(self.poll_interval)
+
+
+_store: Optional[TriggerStore] = None
+_store_lock = threading.Lock()
+
+
+def get_trigger_store() -> TriggerStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TriggerStore()
+        return _store
+
+
+def create_trigger_engine() -> TriggerEngine:
+    """Engine firing through a ChainPilotAgent, so triggered sends take the same path as chat commands."""
+    from chatbot import ChainPilotAgent  # needs the wallet env; only the engine process builds one
+    from tx_history import command_context
+
+    agent = ChainPilotAgent()
+
+    def fire(trigger: Dict[str, Any]) -> Dict[str, Any]:
+        args = agent._map_action_args(trigger["parsed"])
+        with command_context(f"trigger {trigger['id']}: {trigger['command']}", trigger["action"]):
+            return agent._format_result(agent._execute_action(trigger["action"], args), trigger["action"], args)
+
+    return TriggerEngine(agent.actions.w3, get_trigger_store(), fire)
+
+
+if __name__ == "__main__":
+    create_trigger_engine().run_forever()
@@ -0,0 +1,73 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from eth_abi import encode
+from web3 import Web3
+
+from config import NETWORK
+
+
+@lru_cache(maxsize=4096)
+def checksum(address: str) -> str:
+    """``Web3.to_checksum_address``, memoized: the same few wallets and targets recur on every request."""
+    return Web3.to_checksum_address(address)
+
+
+@lru_cache(maxsize=None)
+def selector(signature: str) -> bytes:
+    """4-byte function selector for a canonical signature such as ``cancelTask(uint256)``."""
+    return Web3.keccak(text=signature)[:4]
+
+
+EMPTY_PAYLOAD_HASH = Web3.keccak(b"")
+
+
+def task_hash(target: str, payload: bytes, max_value: int) -> bytes:
+    """Local Executor/Scheduler ``getTaskHash``: keccak256(abi.encode(target, keccak256(payload), maxValue))."""
+    payload_hash = Web3.keccak(payload) if payload else EMPTY_PAYLOAD_HASH
+    return Web3.keccak(encode(["address", "bytes32", "uint256"], [target, payload_hash, max_value]))
+
+
+def _abi_type(param: Dict[str, Any]) -> str:
+    if param["type"].startswith("tuple"):
+        return f"({','.join(_abi_type(c) for c in param['components'])}){param['type'][5:]}"
+    return param["type"]
+
+
+class ContractEncoder:
+    """Precompiled calldata for one contract, replacing ``contract.functions.X(...).build_transaction``.
+
+    Selectors and argument types are derived from the ABI once. Encoding a call is then a
+    dict lookup plus ``eth_abi.encode``, with no per-call ABI matching and no RPCs. Transactions
+    carry ``chainId`` from config and no gas or fees, which ``_build_and_send_transaction``
+    fills in anyway. Functions are addressed by name, or by full signature when overloaded
+    (the Scheduler's two ``executeTask``).
+    """
+
+    def __init__(self, address: str, abi: List[Dict[str, Any]]):
+        self.address = checksum(address)
+        self._functions: Dict[str, Tuple[bytes, List[str]]] = {}
+        entries = [entry for entry in abi if entry.get("type") == "function"]
+        names = [entry["name"] for entry in entries]
+        for entry in entries:
+            types = [_abi_type(param) for param in entry["inputs"]]
+            signature = f"{entry['name']}({','.join(types)})"
+            self._functions[signature] = (selector(signature), types)
+            if names.count(entry["name"]) == 1:
+                self._functions[entry["name"]] = self._functions[signature]
+
+    def encode(self, function: str, *args: Any) -> str:
+        """Hex calldata for ``function(*args)``."""
+        try:
+            function_selector, types = self._functions[function]
+        except KeyError:
+            raise ValueError(f"No function '{function}' on {self.address}; overloaded functions need their full signature.")
+        if len(args) != len(types):
+            raise ValueError(f"{function} takes {len(types)} argument(s), got {len(args)}.")
+        return Web3.to_hex(function_selector + encode(types, args))
+
+    def transaction(self, function: str, *args: Any, sender: str, value: int = 0,
+                    chain_id: int = NETWORK["chain_id"]) -> Dict[str, Any]:
+        """Unsigned transaction calling ``function(*args)`` from ``sender``, ready for the TransactionManager."""
+        return {"from": sender, "to": self.address, "data": self.encode(function, *args), "value": value,
+                "chainId": chain_id}
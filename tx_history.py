@@ -0,0 +1,204 @@
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils import get_logger
+from config import TX_HISTORY
+from event_bus import bus
+
+logger = get_logger(__name__)
+
+# The command being executed on this thread, attached to every transaction it broadcasts.
+current_command: contextvars.ContextVar = contextvars.ContextVar("current_command", default=None)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tx_hash TEXT NOT NULL UNIQUE,
+    wallet TEXT NOT NULL,
+    nonce INTEGER NOT NULL,
+    action TEXT,
+    command TEXT,
+    to_address TEXT,
+    value_wei TEXT,
+    gas_limit INTEGER,
+    max_fee_per_gas INTEGER,
+    max_priority_fee_per_gas INTEGER,
+    replaces TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    broadcast_at REAL NOT NULL,
+    broadcast_block INTEGER,
+    settled_at REAL,
+    block_number INTEGER,
+    gas_used INTEGER,
+    effective_gas_price INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_wallet ON transactions (wallet, broadcast_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions (status, broadcast_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_broadcast ON transactions (broadcast_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_nonce ON transactions (wallet, nonce);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY,
+    wallet TEXT,
+    scheduled_tx TEXT,
+    cancelled_tx TEXT,
+    executed_tx TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+TASK_COLUMNS = {"task_scheduled": "scheduled_tx", "task_cancelled": "cancelled_tx", "task_executed": "executed_tx"}
+
+
+@contextmanager
+def command_context(command: str, action: Optional[str]) -> Iterator[None]:
+    token = current_command.set({"command": command, "action": action})
+    try:
+        yield
+    finally:
+        current_command.reset(token)
+
+
+class TxHistory:
+    """Local SQLite ledger of every transaction this process broadcasts.
+
+    Rows are written from EventBus events: one per broadcast hash (replacements get their own
+    row pointing at the hash they replace), settled once with the receipt outcome; when a nonce
+    is mined its other versions become ``replaced``. Rows are never deleted. Task ids are
+    mapped to the transactions that scheduled, cancelled and executed them. Queries are served
+    from indexes on wallet, status and broadcast time without touching the chain.
+    """
+
+    def __init__(self, path: str = TX_HISTORY["path"]):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # WAL lets the API workers share one file; busy_timeout absorbs their write contention.
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def on_event(self, event: Dict[str, Any]) -> None:
+        try:
+            if event["type"] in ("tx_broadcast", "tx_replaced"):
+                self.record_broadcast(event)
+            elif event["type"] in ("tx_confirmed", "tx_failed"):
+                self.record_settlement(event)
+            elif event["type"] == "tx_reorged":
+                self.record_reorg(event)
+            elif event["type"] in TASK_COLUMNS:
+                self.record_task(event["task_id"], event["type"], event["tx_hash"], event.get("wallet"))
+        except sqlite3.Error as e:
+            logger.error(f"Failed to record {event['type']} in transaction history: {e}")
+
+    def record_broadcast(self, event: Dict[str, Any]) -> None:
+        context = current_command.get() or {}
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO transactions (tx_hash, wallet, nonce, action, command, to_address, value_wei, "
+                "gas_limit, max_fee_per_gas, max_priority_fee_per_gas, replaces, broadcast_at, broadcast_block) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (event["tx_hash"], event["wallet"], event["nonce"], context.get("action"), context.get("command"),
+                 event.get("to"), str(event.get("value", 0)), event.get("gas"), event.get("max_fee_per_gas"),
+                 event.get("max_priority_fee_per_gas"), event.get("replaces"), time.time(), event.get("block")),
+            )
+            if event.get("replaces"):
+                # A replacement inherits the command that created the original.
+                self._db.execute(
+                    "UPDATE transactions SET action = (SELECT action FROM transactions WHERE tx_hash = ?), "
+                    "command = (SELECT command FROM transactions WHERE tx_hash = ?) WHERE tx_hash = ? AND command IS NULL",
+                    (event["replaces"], event["replaces"], event["tx_hash"]),
+                )
+
+    def record_settlement(self, event: Dict[str, Any]) -> None:
+        status = "confirmed" if event["type"] == "tx_confirmed" else "failed"
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute(
+                    "UPDATE transactions SET status = ?, settled_at = ?, block_number = ?, gas_used = ?, "
+                    "effective_gas_price = ? WHERE tx_hash = ? AND status = 'pending'",
+                    (status, now, event.get("block"), event.get("gas_used"), event.get("effective_gas_price"),
+                     event["tx_hash"]),
+                )
+                self._db.execute(
+                    "UPDATE transactions SET status = 'replaced', settled_at = ? "
+                    "WHERE wallet = ? AND nonce = ? AND tx_hash != ? AND status = 'pending'",
+                    (now, event["wallet"], event["nonce"], event["tx_hash"]),
+                )
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def record_reorg(self, event: Dict[str, Any]) -> None:
+        """A mined transaction left the canonical chain; it is pending again until re-settled."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE transactions SET status = 'pending', settled_at = NULL, block_number = NULL, gas_used = NULL, "
+                "effective_gas_price = NULL WHERE tx_hash = ?", (event["tx_hash"],),
+            )
+
+    def record_task(self, task_id: int, event_type: str, tx_hash: str, wallet: Optional[str] = None) -> None:
+        column = TASK_COLUMNS[event_type]
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO tasks (task_id, wallet, {column}, updated_at) VALUES (?, ?, ?, ?) "
+                f"ON CONFLICT(task_id) DO UPDATE SET {column} = excluded.{column}, "
+                f"wallet = COALESCE(tasks.wallet, excluded.wallet), updated_at = excluded.updated_at",
+                (task_id, wallet, tx_hash, time.time()),
+            )
+
+    def task_transactions(self, task_ids: List[int]) -> Dict[int, Dict[str, Optional[str]]]:
+        found: Dict[int, Dict[str, Optional[str]]] = {}
+        # Chunked to stay under SQLite's bound-parameter limit.
+        for offset in range(0, len(task_ids), 500):
+            chunk = list(task_ids[offset:offset + 500])
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT task_id, scheduled_tx, cancelled_tx, executed_tx FROM tasks "
+                    f"WHERE task_id IN ({','.join('?' * len(chunk))})", chunk,
+                ).fetchall()
+            found.update((row["task_id"], dict(row)) for row in rows)
+        return found
+
+    def query(self, wallet: Optional[str] = None, status: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, cursor: Optional[int] = None, limit: int = 50) -> Dict[str, Any]:
+        """Newest first, keyset-paginated on row id: pass the returned ``next_cursor`` to get the next page."""
+        clauses, params = [], []
+        for clause, value in (("wallet = ?", wallet), ("status = ?", status), ("broadcast_at >= ?", since),
+                              ("broadcast_at < ?", until), ("id < ?", cursor)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._db.execute(f"SELECT * FROM transactions {where} ORDER BY id DESC LIMIT ?",
+                                    params + [limit + 1]).fetchall()
+        items = [dict(row) for row in rows[:limit]]
+        return {"items": items, "next_cursor": items[-1]["id"] if len(rows) > limit else None}
+
+
+_history: Optional[TxHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_tx_history() -> Optional[TxHistory]:
+    """Process-wide ledger, subscribed to the event bus on first use; None when TX_HISTORY_ENABLED is false."""
+    global _history
+    if not TX_HISTORY["enabled"]:
+        return None
+    with _history_lock:
+        if _history is None:
+            _history = TxHistory()
+            bus.add_listener(_history.on_event)
+            logger.info(f"Recording transaction history to {_history.path}")
+        return _history
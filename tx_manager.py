@@ -0,0 +1,319 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound, TimeExhausted
+
+from utils import get_logger
+from config import NETWORK, SHARED_STATE, TX_REPLACEMENT
+from signer import Signer
+from event_bus import bus
+from shared_state import SharedStore, get_nonce_store, get_shared_store
+
+logger = get_logger(__name__)
+
+# Geth-style txpools only accept a same-nonce replacement when both fee caps rise by at least 10%.
+MIN_REPLACEMENT_BUMP_PERCENT = 10.0
+
+
+def suggest_fees(w3: Web3) -> Dict[str, int]:
+    """Return EIP-1559 fee fields using the pipeline's default policy (1.5x base fee plus tip).
+
+    The snapshot is shared by every worker for SHARED_FEE_TTL seconds, so a burst of sends
+    costs two RPC reads per block rather than two per transaction per worker.
+    """
+    key = f"fees:{NETWORK['chain_id']}"
+    store = get_shared_store() if SHARED_STATE["fee_ttl"] else None
+    if store is not None:
+        cached = store.get(key)
+        if cached is not None:
+            return dict(cached)
+    base_fee = w3.eth.get_block('latest')['baseFeePerGas']
+    max_priority_fee = w3.eth.max_priority_fee
+    fees = {
+        "maxFeePerGas": int(base_fee * 1.5 + max_priority_fee),
+        "maxPriorityFeePerGas": max_priority_fee,
+    }
+    if store is not None:
+        store.set(key, fees, ttl=SHARED_STATE["fee_ttl"])
+    return fees
+
+
+def _raise_by_percent(value: int, percent: float) -> int:
+    # Integer ceiling so rounding can never leave a replacement just under the node's threshold.
+    scaled = int(round(percent * 1000))
+    return max(value + 1, -(-value * (100_000 + scaled) // 100_000))
+
+
+def bump_fees(tx: Dict[str, Any], base_fee: int, bump_percent: float = 12.5,
+              max_fee_cap: Optional[int] = None) -> Optional[Dict[str, int]]:
+    """Compute replacement fee fields for a stuck EIP-1559 transaction.
+
+    Args:
+        tx (Dict[str, Any]): The transaction currently occupying the nonce.
+        base_fee (int): Latest block base fee, used to keep the new cap above a spike.
+        bump_percent (float): Requested increase, floored at the txpool minimum.
+        max_fee_cap (Optional[int]): Hard ceiling for maxFeePerGas in wei.
+    Returns:
+        Optional[Dict[str, int]]: New fee fields, or None if the cap forbids a valid replacement.
+    """
+    percent = max(bump_percent, MIN_REPLACEMENT_BUMP_PERCENT)
+    old_tip = tx["maxPriorityFeePerGas"]
+    old_max = tx["maxFeePerGas"]
+
+    new_tip = _raise_by_percent(old_tip, percent)
+    new_max = max(_raise_by_percent(old_max, percent), 2 * base_fee + new_tip)
+
+    if max_fee_cap is not None and new_max > max_fee_cap:
+        # Clamp to the cap as long as it still clears the smallest bump the txpool accepts.
+        if (max_fee_cap < _raise_by_percent(old_max, MIN_REPLACEMENT_BUMP_PERCENT)
+                or max_fee_cap < _raise_by_percent(old_tip, MIN_REPLACEMENT_BUMP_PERCENT)):
+            return None
+        new_max = max_fee_cap
+    return {"maxFeePerGas": new_max, "maxPriorityFeePerGas": min(new_tip, new_max)}
+
+
+def publish_receipt(wallet: str, nonce: int, receipt: Dict[str, Any]) -> None:
+    bus.publish("tx_confirmed" if receipt["status"] == 1 else "tx_failed", wallet,
+                tx_hash=Web3.to_hex(receipt["transactionHash"]), nonce=nonce, block=receipt["blockNumber"],
+                gas_used=receipt["gasUsed"], effective_gas_price=receipt.get("effectiveGasPrice"))
+
+
+class _CursorMissing(Exception):
+    pass
+
+
+class NonceManager:
+    """Hands out sequential nonces per account without a chain read for every transaction.
+
+    Cursors live in the non-evicting nonce store, so API workers sending from the same wallet
+    draw from one sequence instead of colliding on the pending nonce they each read. A missing
+    cursor is seeded from the chain, read outside the store's cross-process lock.
+    """
+
+    def __init__(self, w3: Web3, store: Optional[SharedStore] = None, ttl: float = SHARED_STATE["nonce_ttl"]):
+        self.w3 = w3
+        self.store = store or get_nonce_store()
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(address: str) -> str:
+        return f"nonce:{NETWORK['chain_id']}:{address}"
+
+    def next_nonce(self, address: str) -> int:
+        chain_nonce: Optional[int] = None
+
+        def advance(cursor: Optional[int]) -> int:
+            if cursor is None:
+                if chain_nonce is None:
+                    raise _CursorMissing()
+                cursor = chain_nonce
+            return cursor + 1
+
+        try:
+            return self.store.update(self._key(address), advance, ttl=self.ttl) - 1
+        except _CursorMissing:
+            # If another worker seeds the cursor meanwhile, its sequence wins and this read goes unused.
+            chain_nonce = self.w3.eth.get_transaction_count(address, 'pending')
+            return self.store.update(self._key(address), advance, ttl=self.ttl) - 1
+
+    def resync(self, address: str) -> None:
+        """Forget the shared cursor so the next nonce is re-read from the pending pool."""
+        self.store.delete(self._key(address))
+
+
+class TransactionManager:
+    """Signs, broadcasts and tracks transactions per nonce, replacing ones that get stuck.
+
+    A transaction is considered stuck once ``stuck_blocks`` blocks have passed since its last
+    broadcast without a receipt. It is then re-signed at the same nonce with bumped EIP-1559
+    fees, up to ``max_bumps`` times and never above ``max_fee_cap``, so a fee spike cannot
+    block every later transfer queued behind it.
+    """
+
+    def __init__(self, w3: Web3, signer: Signer, nonce_manager: Optional[NonceManager] = None,
+                 stuck_blocks: int = TX_REPLACEMENT["stuck_blocks"],
+                 bump_percent: float = TX_REPLACEMENT["bump_percent"],
+                 max_bumps: int = TX_REPLACEMENT["max_bumps"],
+                 max_fee_cap: Optional[int] = TX_REPLACEMENT["max_fee_cap_wei"],
+                 poll_interval: float = TX_REPLACEMENT["poll_interval"]):
+        self.w3 = w3
+        self.signer = signer
+        self.address = signer.address
+        self.nonces = nonce_manager or NonceManager(w3)
+        self.stuck_blocks = stuck_blocks
+        self.bump_percent = bump_percent
+        self.max_bumps = max_bumps
+        self.max_fee_cap = max_fee_cap
+        self.poll_interval = poll_interval
+        self._lock = threading.RLock()
+        self._pending: Dict[int, Dict[str, Any]] = {}
+
+    def _broadcast(self, tx: Dict[str, Any]) -> str:
+        return Web3.to_hex(self.w3.eth.send_raw_transaction(self.signer.sign_transaction(tx)))
+
+    def _prepare(self, tx: Dict[str, Any], fees: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        tx = dict(tx)
+        tx['from'] = self.address
+        if 'nonce' not in tx:
+            tx['nonce'] = self.nonces.next_nonce(self.address)
+        if 'maxFeePerGas' not in tx or 'maxPriorityFeePerGas' not in tx:
+            tx.pop('gasPrice', None)
+            tx.update(fees or suggest_fees(self.w3))
+        return tx
+
+    def _track(self, tx: Dict[str, Any], tx_hash: str, sent_block: int) -> None:
+        with self._lock:
+            self._pending[tx['nonce']] = {
+                "tx": tx,
+                "hashes": [tx_hash],
+                "sent_block": sent_block,
+                "bumps": 0,
+            }
+        logger.info(f"Broadcast tx {tx_hash} at nonce {tx['nonce']}")
+        bus.publish("tx_broadcast", self.address, tx_hash=tx_hash, nonce=tx['nonce'], to=tx.get('to'),
+                    value=tx.get('value', 0), gas=tx.get('gas'), max_fee_per_gas=tx.get('maxFeePerGas'),
+                    max_priority_fee_per_gas=tx.get('maxPriorityFeePerGas'), block=sent_block)
+
+    def send(self, tx: Dict[str, Any]) -> str:
+        """Assign a nonce (and fees, if missing), broadcast and start tracking a transaction."""
+        tx = self._prepare(tx)
+        try:
+            tx_hash = self._broadcast(tx)
+        except Exception:
+            # The nonce was never used on-chain; drop the cursor so the gap is not carried forward.
+            self.nonces.resync(self.address)
+            raise
+        self._track(tx, tx_hash, self.w3.eth.block_number)
+        return tx_hash
+
+    def send_batch(self, txs: List[Dict[str, Any]]) -> List[str]:
+        """Sign a batch in one signer call and broadcast it at consecutive nonces.
+
+        Fees are read once for the whole batch. If a broadcast fails, the remaining transactions
+        are not sent (their nonces would be unfillable) and the error is raised.
+        """
+        if not txs:
+            return []
+        fees = suggest_fees(self.w3)
+        prepared = [self._prepare(tx, fees) for tx in txs]
+        raw_transactions = self.signer.sign_transactions(prepared)
+        sent_block = self.w3.eth.block_number
+        hashes = []
+        for tx, raw in zip(prepared, raw_transactions):
+            try:
+                tx_hash = Web3.to_hex(self.w3.eth.send_raw_transaction(raw))
+            except Exception:
+                self.nonces.resync(self.address)
+                raise
+            self._track(tx, tx_hash, sent_block)
+            hashes.append(tx_hash)
+        return hashes
+
+    def pending_transactions(self) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            return {nonce: dict(record) for nonce, record in self._pending.items()}
+
+    def _nonce_for(self, tx_hash: str) -> Optional[int]:
+        with self._lock:
+            for nonce, record in self._pending.items():
+                if tx_hash in record["hashes"]:
+                    return nonce
+        return None
+
+    def _find_receipt(self, hashes: List[str]) -> Optional[Dict[str, Any]]:
+        for tx_hash in reversed(hashes):
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+            if receipt is not None:
+                return receipt
+        return None
+
+    def replace_stuck(self) -> List[str]:
+        """Rebroadcast every tracked transaction that has been pending past the block threshold."""
+        current_block = self.w3.eth.block_number
+        base_fee = None
+        replaced = []
+        with self._lock:
+            candidates = sorted(self._pending.items())
+        for nonce, record in candidates:
+            if current_block - record["sent_block"] < self.stuck_blocks:
+                continue
+            if record["bumps"] >= self.max_bumps:
+                continue
+            if base_fee is None:
+                base_fee = self.w3.eth.get_block('latest')['baseFeePerGas']
+            fees = bump_fees(record["tx"], base_fee, self.bump_percent, self.max_fee_cap)
+            if fees is None:
+                logger.warning(f"Nonce {nonce} is stuck but the fee cap prevents another replacement")
+                continue
+
+            new_tx = {**record["tx"], **fees}
+            try:
+                new_hash = self._broadcast(new_tx)
+            except Exception as e:
+                # "nonce too low" / "already known" mean an earlier version was mined; the receipt check picks it up.
+                logger.warning(f"Replacement for nonce {nonce} rejected: {e}")
+                continue
+
+            with self._lock:
+                record["tx"] = new_tx
+                record["hashes"].append(new_hash)
+                record["sent_block"] = current_block
+                record["bumps"] += 1
+            replaced.append(new_hash)
+            bus.publish("tx_replaced", self.address, tx_hash=new_hash, replaces=record["hashes"][-2], nonce=nonce,
+                        to=new_tx.get('to'), value=new_tx.get('value', 0), gas=new_tx.get('gas'),
+                        max_fee_per_gas=fees['maxFeePerGas'], max_priority_fee_per_gas=fees['maxPriorityFeePerGas'],
+                        block=current_block)
+            logger.info(f"Replaced stuck nonce {nonce} with {new_hash} "
+                        f"(bump {record['bumps']}/{self.max_bumps}, maxFeePerGas {fees['maxFeePerGas']})")
+        return replaced
+
+    def wait_for_receipt(self, tx_hash: str, timeout: float = 120) -> Dict[str, Any]:
+        """Wait for any version of the transaction's nonce to be mined, bumping fees while it is stuck."""
+        nonce = self._nonce_for(tx_hash)
+        if nonce is None:
+            return self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+
+        deadline = time.monotonic() + timeout
+        hashes = [tx_hash]
+        while True:
+            with self._lock:
+                # Another waiter on the same nonce may have settled and dropped the record; keep the last known hashes.
+                record = self._pending.get(nonce)
+                if record is not None:
+                    hashes = list(record["hashes"])
+            receipt = self._find_receipt(hashes)
+            if receipt is not None:
+                with self._lock:
+                    settled = self._pending.pop(nonce, None) is not None
+                if settled:
+                    publish_receipt(self.address, nonce, receipt)
+                return receipt
+            if time.monotonic() >= deadline:
+                raise TimeExhausted(f"Nonce {nonce} not mined after {timeout}s (hashes: {', '.join(hashes)})")
+            self.replace_stuck()
+            time.sleep(self.poll_interval)
+
+
+_managers: Dict[Tuple[int, str], TransactionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_transaction_manager(w3: Web3, signer: Signer) -> TransactionManager:
+    """Return the shared manager for a signer on ``w3``'s provider.
+
+    Callers on the same provider share one manager; a caller with its own provider (e.g. a
+    recording or replay one from ``make_provider``) gets a manager that sends through it. Nonces
+    stay in one sequence either way, since every manager allocates them from the shared store.
+    The cached manager keeps its provider alive, so the ``id`` in the key cannot be reused.
+    """
+    key = (id(w3.provider), signer.address)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = TransactionManager(w3, signer)
+        return _managers[key]
@@ -0,0 +1,150 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from eth_abi import decode
+from eth_utils.abi import collapse_if_tuple
+from web3 import Web3
+from web3.exceptions import ContractCustomError, ContractLogicError, ContractPanicError
+
+from utils import load_abi, get_logger
+from config import SIMULATION
+
+logger = get_logger(__name__)
+
+# Built-in Solidity revert encodings: Error(string) and Panic(uint256).
+ERROR_STRING_SELECTOR = "0x08c379a0"
+PANIC_SELECTOR = "0x4e487b71"
+
+_REVERT_DATA_PATTERN = re.compile(r"0x[0-9a-fA-F]{8,}")
+
+
+_decoders: Dict[tuple, "RevertDecoder"] = {}
+_decoders_lock = threading.Lock()
+
+
+class RevertDecoder:
+    """Maps 4-byte custom error selectors from contract ABIs back to readable errors."""
+
+    def __init__(self, abis: List[List[Dict[str, Any]]]):
+        self.errors: Dict[str, Dict[str, Any]] = {}
+        for abi in abis:
+            for entry in abi:
+                if entry.get("type") != "error":
+                    continue
+                types = [collapse_if_tuple(item) for item in entry.get("inputs", [])]
+                signature = f"{entry['name']}({','.join(types)})"
+                selector = Web3.to_hex(Web3.keccak(text=signature)[:4])
+                self.errors[selector] = {
+                    "name": entry["name"],
+                    "types": types,
+                    "names": [item.get("name", "") for item in entry.get("inputs", [])],
+                }
+
+    @classmethod
+    def from_abi_names(cls, abi_names: List[str]) -> "RevertDecoder":
+        """Selector tables are built once per set of ABIs and shared (decoders are read-only)."""
+        key = tuple(abi_names)
+        with _decoders_lock:
+            if key not in _decoders:
+                _decoders[key] = cls([load_abi(name)["abi"] for name in abi_names])
+            return _decoders[key]
+
+    def decode(self, revert_data: Optional[str]) -> Dict[str, Any]:
+        """Decode raw revert data into ``{"selector", "error", "args", "message"}``."""
+        if not revert_data or len(revert_data) < 10:
+            return {"selector": None, "error": "Reverted", "args": {}, "message": "Execution reverted without data"}
+        selector = revert_data[:10].lower()
+        payload = bytes.fromhex(revert_data[10:])
+
+        if selector == ERROR_STRING_SELECTOR:
+            reason = decode(["string"], payload)[0]
+            return {"selector": selector, "error": "Error", "args": {"reason": reason}, "message": reason}
+        if selector == PANIC_SELECTOR:
+            code = decode(["uint256"], payload)[0]
+            return {"selector": selector, "error": "Panic", "args": {"code": code}, "message": f"Panic(0x{code:02x})"}
+
+        spec = self.errors.get(selector)
+        if spec is None:
+            return {"selector": selector, "error": "Unknown", "args": {}, "message": f"Unknown custom error {selector}"}
+        values = decode(spec["types"], payload) if spec["types"] else ()
+        args = {}
+        for index, (name, value) in enumerate(zip(spec["names"], values)):
+            args[name or f"arg{index}"] = Web3.to_hex(value) if isinstance(value, bytes) else value
+        rendered = ", ".join(f"{key}={value}" for key, value in args.items())
+        return {"selector": selector, "error": spec["name"], "args": args, "message": f"{spec['name']}({rendered})"}
+
+
+def _revert_data(error: Exception) -> Optional[str]:
+    data = getattr(error, "data", None)
+    if isinstance(data, str) and data.startswith("0x"):
+        return data
+    match = _REVERT_DATA_PATTERN.search(str(error))
+    return match.group(0) if match else None
+
+
+class TransactionSimulator:
+    """Dry-runs transactions with ``eth_call`` at the pending block before they are signed.
+
+    Verdicts are cached per call shape (sender, target, calldata, value) for ``cache_ttl`` seconds,
+    so a retried command that is already known to revert is rejected without another RPC.
+    """
+
+    def __init__(self, w3: Web3, decoder: RevertDecoder, cache_ttl: float = SIMULATION["cache_ttl"],
+                 cache_size: int = SIMULATION["cache_size"]):
+        self.w3 = w3
+        self.decoder = decoder
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _call_shape(tx: Dict[str, Any]) -> tuple:
+        data = tx.get("data") or "0x"
+        if isinstance(data, bytes):
+            data = Web3.to_hex(data)
+        return (str(tx.get("from", "")).lower(), str(tx.get("to", "")).lower(), data.lower(), int(tx.get("value", 0)))
+
+    def _cached(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, verdict = entry
+            if expires_at < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return verdict
+
+    def _store(self, key: tuple, verdict: Dict[str, Any]) -> None:
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, verdict)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def simulate(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+        """Return ``{"ok": True}`` or ``{"ok": False, "error", "selector", "args", "message"}`` for a transaction."""
+        key = self._call_shape(tx)
+        verdict = self._cached(key)
+        if verdict is not None:
+            return {**verdict, "cached": True}
+
+        call = {"from": tx.get("from"), "to": tx.get("to"), "data": tx.get("data", "0x"), "value": tx.get("value", 0)}
+        try:
+            self.w3.eth.call(call, "pending")
+            verdict = {"ok": True}
+        except (ContractCustomError, ContractPanicError, ContractLogicError) as e:
+            verdict = {"ok": False, **self.decoder.decode(_revert_data(e))}
+            logger.info(f"Simulation reverted: {verdict['message']}")
+        except Exception as e:
+            # Transport or node errors say nothing about the transaction itself; don't block or cache on them.
+            logger.warning(f"Simulation unavailable, continuing without it: {e}")
+            return {"ok": True, "skipped": True}
+
+        self._store(key, verdict)
+        return {**verdict, "cached": False}
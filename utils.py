@@ -14,8 +14,12 @@ def get_logger(name: str) -> logging.Logger:
         logger.setLevel(logging.INFO)
     return logger
 
+# Parsed ABIs by name. Filled once (in the gunicorn master under --preload) and only ever read.
+_abi_cache: Dict[str, Dict[str, any]] = {}
+
 def load_abi(abi_name: str) -> Dict[str, any]:
     """Load an ABI and bytecode (if available) from a JSON file based on the contract name.
+    Each file is parsed once per process; callers share the returned dict and must not modify it.
     Args:
         abi_name (str): Name of the ABI to load (e.g., 'ERC20', 'ChainPilotExecutor', 'ChainPilotScheduler').
     Returns:
@@ -24,6 +28,8 @@ def load_abi(abi_name: str) -> Dict[str, any]:
         FileNotFoundError: If the ABI file is not found in either directory.
         ValueError: If the ABI file is invalid or missing required fields.
     """
+    if abi_name in _abi_cache:
+        return _abi_cache[abi_name]
     logger = get_logger(__name__)
     base_dir = os.path.dirname(os.path.abspath(__file__))
     # Explicitly set the abis directory
@@ -45,10 +51,43 @@ def load_abi(abi_name: str) -> Dict[str, any]:
             if bytecode and isinstance(bytecode, str) and not bytecode.startswith("0x"):
                 bytecode = "0x" + bytecode
             logger.info(f"Loaded ABI for {abi_name} from {abi_file_path}")
-            return {"abi": abi, "bytecode": bytecode}
+            _abi_cache[abi_name] = {"abi": abi, "bytecode": bytecode}
+            return _abi_cache[abi_name]
         except FileNotFoundError:
             continue  # Try the next directory if file not found
 
     # If file not found in either directory
     logger.error(f"ABI file not found in contracts or abis: {abi_name}.json")
-    raise FileNotFoundError(f"ABI file not found in contracts or abis: {abi_name}.json")
\ No newline at end of file
+    raise FileNotFoundError(f"ABI file not found in contracts or abis: {abi_name}.json")
+
+def preload_abis() -> int:
+    """Parse every ABI in abis/ up front; returns how many were loaded.
+    Called before workers fork so the parsed ABIs are shared copy-on-write instead of parsed per worker.
+    """
+    abis_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "abis")
+    names = [name[:-5] for name in sorted(os.listdir(abis_dir)) if name.endswith(".json")]
+    for name in names:
+        load_abi(name)
+    return len(names)
+
+def batch_call(w3, calls: list) -> list:
+    """Execute read calls in a single JSON-RPC batch.
+    Args:
+        w3: Web3 instance.
+        calls (list): Unexecuted contract function calls, e.g. ``contract.functions.balanceOf(addr)``,
+            or ``(method, *args)`` tuples such as ``(w3.eth.get_balance, addr)``.
+    Returns:
+        list: Decoded results in the same order as ``calls``.
+    """
+    if not calls:
+        return []
+    try:
+        with w3.batch_requests() as batch:
+            for call in calls:
+                # Inside the batch context a web3 method call returns request info instead of sending it.
+                batch.add(call[0](*call[1:]) if isinstance(call, tuple) else call)
+            return list(batch.execute())
+    except Exception as e:
+        # Providers without batch support (or a failed batch) fall back to one call per read.
+        get_logger(__name__).warning(f"Batch request unavailable, falling back to sequential calls: {e}")
+        return [call[0](*call[1:]) if isinstance(call, tuple) else call.call() for call in calls]
@@ -0,0 +1,276 @@
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import requests
+from web3 import Web3
+
+from utils import get_logger, batch_call
+from config import NETWORK, WALLET_POOL
+from signer import Signer, get_pool_signers, get_signer
+from shared_state import SharedStore, get_wallet_store
+from tx_manager import TransactionManager, get_transaction_manager
+from event_bus import bus
+
+logger = get_logger(__name__)
+
+
+def _empty_ledger() -> Dict[str, Any]:
+    # b: balance, v: bumped by every debit, p: nonce -> [value, max cost], h: hold id -> [wei, expires at]
+    return {"b": 0, "v": 0, "p": {}, "h": {}}
+
+
+def _reserved(ledger: Dict[str, Any], now: float) -> int:
+    return (sum(cost for _, cost in ledger["p"].values())
+            + sum(wei for wei, expires_at in ledger["h"].values() if expires_at > now))
+
+
+class PooledWallet:
+    """One signer in the pool with its own nonce queue; its balance ledger lives in the shared wallet store.
+
+    ``in_flight`` (open ``acquire`` blocks) and ``holds`` (thread id -> hold id) are this
+    process's own bookkeeping.
+    """
+
+    def __init__(self, signer: Signer, tx_manager: TransactionManager):
+        self.signer = signer
+        self.tx_manager = tx_manager
+        self.address = signer.address
+        self.holds: Dict[int, str] = {}
+        self.in_flight = 0
+        self.refreshed_at = 0.0
+        self.last_alert_at = 0.0
+
+
+def _post_webhook(url: str, address: str, balance_wei: int) -> None:
+    try:
+        requests.post(url, json={"address": address, "balance_wei": str(balance_wei)}, timeout=5)
+    except Exception as e:
+        logger.warning(f"Top-up webhook failed for {address}: {e}")
+
+
+class WalletPool:
+    """Spreads independent transactions across several signer wallets.
+
+    Each wallet keeps its own nonce sequence (via its TransactionManager), so N wallets can
+    have N transactions in flight at once. ``acquire`` picks the least busy wallet whose
+    balance, minus amounts reserved by in-flight sends, covers the request. Each wallet's
+    ledger (balance, per-nonce reservations and open holds) is one entry in the shared wallet
+    store, and the check and the hold are one ``SharedStore.update``, so concurrent sends
+    cannot both spend the same wei, even from different API workers.
+
+    Reservations follow the EventBus: a broadcast reserves value + gas * maxFeePerGas for its
+    nonce (a fee bump raises it), and a settled receipt releases it and debits what was
+    actually spent. Balances and confirmed nonces are re-read for the whole pool in one
+    JSON-RPC batch on the ChainWatcher thread whenever a new block arrives (``note_head``);
+    reservations for nonces the chain has already confirmed are released then, so a receipt
+    no process saw cannot pin funds, and holds left by a worker that died expire after
+    ``hold_ttl``. ``acquire`` only reads the ledger, falling back to a re-read only on first
+    use or when no head has refreshed it for ``balance_ttl``. Wallets that fall below
+    ``min_balance`` trigger a rate-limited top-up alert.
+    """
+
+    def __init__(self, w3: Web3, signers: List[Signer],
+                 min_balance: int = Web3.to_wei(WALLET_POOL["min_balance_eth"], "ether"),
+                 balance_ttl: float = WALLET_POOL["balance_ttl"],
+                 alert_interval: float = WALLET_POOL["alert_interval"],
+                 hold_ttl: float = WALLET_POOL["hold_ttl"],
+                 on_low_balance: Optional[Callable[[str, int], None]] = None,
+                 store: Optional[SharedStore] = None):
+        self.w3 = w3
+        self.store = store or get_wallet_store()
+        self.min_balance = min_balance
+        self.balance_ttl = balance_ttl
+        self.alert_interval = alert_interval
+        self.hold_ttl = hold_ttl
+        self._hold_ids = itertools.count()
+        self.on_low_balance = on_low_balance
+        if on_low_balance is None and WALLET_POOL["topup_webhook"]:
+            self.on_low_balance = lambda address, balance: _post_webhook(WALLET_POOL["topup_webhook"], address, balance)
+        self._lock = threading.Lock()
+        self.wallets: Dict[str, PooledWallet] = {}
+        for signer in signers:
+            # The same key (or a shared socket signer) must not get two entries competing for one nonce sequence.
+            if signer.address not in self.wallets:
+                self.wallets[signer.address] = PooledWallet(signer, get_transaction_manager(w3, signer))
+        self._head: Optional[int] = None
+        bus.add_listener(self._on_event)
+        logger.info(f"Wallet pool ready with {len(self.wallets)} signer(s)")
+
+    @classmethod
+    def from_private_keys(cls, w3: Web3, private_keys: List[Optional[str]], **kwargs: Any) -> "WalletPool":
+        """The first key is the primary wallet (None resolves to the socket signer); the rest are extra pool wallets."""
+        return cls(w3, [get_signer(private_keys[0])] + get_pool_signers(private_keys[1:]), **kwargs)
+
+    @property
+    def addresses(self) -> List[str]:
+        return list(self.wallets)
+
+    def get(self, address: str) -> PooledWallet:
+        return self.wallets[Web3.to_checksum_address(address)]
+
+    @staticmethod
+    def _key(address: str) -> str:
+        return f"ledger:{NETWORK['chain_id']}:{address}"
+
+    def _update(self, wallet: PooledWallet, fn: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Apply ``fn`` to the wallet's shared ledger atomically across processes; an exception in ``fn`` changes nothing."""
+        def apply(ledger: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            ledger = ledger or _empty_ledger()
+            fn(ledger)
+            return ledger
+        return self.store.update(self._key(wallet.address), apply)
+
+    def ledger(self, wallet: PooledWallet) -> Dict[str, Any]:
+        return self.store.get(self._key(wallet.address)) or _empty_ledger()
+
+    def available(self, wallet: PooledWallet) -> int:
+        ledger = self.ledger(wallet)
+        return ledger["b"] - _reserved(ledger, time.time())
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        # Listeners run on the publishing thread, so a broadcast from inside acquire() sees its own hold.
+        wallet = self.wallets.get(event.get("wallet"))
+        if wallet is None:
+            return
+        nonce = str(event.get("nonce"))
+        if event["type"] in ("tx_broadcast", "tx_replaced"):
+            value = int(event.get("value") or 0)
+            hold_id = wallet.holds.get(threading.get_ident())
+
+            def reserve(ledger: Dict[str, Any]) -> None:
+                previous = ledger["p"].get(nonce, [value, 0])[1]
+                cost = max(value + (event.get("gas") or 0) * (event.get("max_fee_per_gas") or 0), previous)
+                # The transaction's own reservation takes over the part of the sender's hold it covers.
+                if hold_id in ledger["h"]:
+                    ledger["h"][hold_id][0] -= min(ledger["h"][hold_id][0], cost - previous)
+                ledger["p"][nonce] = [value, cost]
+            self._update(wallet, reserve)
+        elif event["type"] in ("tx_confirmed", "tx_failed"):
+            def settle(ledger: Dict[str, Any]) -> None:
+                if nonce not in ledger["p"]:
+                    return  # already released by a refresh, whose balance includes the spend
+                value, _ = ledger["p"].pop(nonce)
+                spent = (event.get("gas_used") or 0) * (event.get("effective_gas_price") or 0)
+                if event["type"] == "tx_confirmed":
+                    spent += value
+                # Exact until the next head's re-read, which also covers receipts never seen here.
+                ledger["b"] -= spent
+                ledger["v"] += 1
+            self._update(wallet, settle)
+        elif event["type"] == "tx_reorged":
+            self._update(wallet, lambda ledger: ledger.update(v=ledger["v"] + 1))
+
+    def note_head(self, block_number: int) -> None:
+        """A new block may have changed balances (e.g. incoming transfers); re-read them now, off the send path."""
+        with self._lock:
+            if self._head is not None and block_number <= self._head:
+                return
+            self._head = block_number
+        try:
+            self.refresh_balances(force=True)
+        except Exception as e:
+            logger.warning(f"Balance refresh at block {block_number} failed: {e}")
+
+    def refresh_balances(self, force: bool = False) -> None:
+        """Re-read expired balances and confirmed nonces (or all, with ``force``) in a single batch."""
+        now = time.monotonic()
+        due = [w for w in self.wallets.values() if force or now - w.refreshed_at >= self.balance_ttl]
+        if not due:
+            return
+        versions = [self.ledger(wallet)["v"] for wallet in due]
+        calls = []
+        for wallet in due:
+            calls += [(self.w3.eth.get_balance, wallet.address), (self.w3.eth.get_transaction_count, wallet.address)]
+        results = batch_call(self.w3, calls)
+        for index, (wallet, version) in enumerate(zip(due, versions)):
+            balance, confirmed = results[2 * index], results[2 * index + 1]
+
+            def refresh(ledger: Dict[str, Any]) -> None:
+                # Nonces below the confirmed count are settled whether or not any worker saw the receipt.
+                for nonce in [n for n in ledger["p"] if int(n) < confirmed]:
+                    del ledger["p"][nonce]
+                wall_clock = time.time()
+                for hold_id in [h for h, (_, expires_at) in ledger["h"].items() if expires_at <= wall_clock]:
+                    del ledger["h"][hold_id]
+                if ledger["v"] == version:  # otherwise a receipt settled mid-read, which the read may or may not include
+                    ledger["b"] = balance
+            ledger = self._update(wallet, refresh)
+            wallet.refreshed_at = now
+            self._check_top_up(wallet, ledger["b"])
+
+    def _check_top_up(self, wallet: PooledWallet, balance: int) -> None:
+        if balance >= self.min_balance:
+            return
+        now = time.monotonic()
+        if wallet.last_alert_at and now - wallet.last_alert_at < self.alert_interval:
+            return
+        wallet.last_alert_at = now
+        logger.warning(f"Wallet {wallet.address} needs a top-up: {self.w3.from_wei(balance, 'ether')} ETH "
+                       f"(threshold {self.w3.from_wei(self.min_balance, 'ether')} ETH)")
+        if self.on_low_balance:
+            self.on_low_balance(wallet.address, balance)
+
+    def _hold(self, wallet: PooledWallet, hold_id: str, required_wei: int) -> bool:
+        """Atomically check the shared ledger and place the hold; False if the wallet cannot cover it."""
+        def place(ledger: Dict[str, Any]) -> None:
+            now = time.time()
+            if ledger["b"] - _reserved(ledger, now) < required_wei:
+                raise _Uncovered()
+            ledger["h"][hold_id] = [required_wei, now + self.hold_ttl]
+        try:
+            self._update(wallet, place)
+        except _Uncovered:
+            return False
+        return True
+
+    @contextmanager
+    def acquire(self, required_wei: int = 0) -> Iterator[PooledWallet]:
+        """Hold ``required_wei`` on the least busy wallet that can cover it for the duration of the block.
+
+        Transactions broadcast inside the block draw their reservations from the hold first;
+        whatever is left of it is released on exit.
+        """
+        self.refresh_balances()
+        ident = threading.get_ident()
+        hold_id = f"{os.getpid()}:{next(self._hold_ids)}"
+        with self._lock:
+            ranked = sorted(self.wallets.values(), key=lambda w: (w.in_flight, -self.available(w)))
+            # The shared ledger is the authority: another worker may have taken the funds since ranking.
+            wallet = next((w for w in ranked if self._hold(w, hold_id, required_wei)), None)
+            if wallet is None:
+                best = max(self.available(w) for w in self.wallets.values())
+                raise ValueError(f"Insufficient ETH balance: no pooled wallet can cover "
+                                 f"{self.w3.from_wei(required_wei, 'ether')} ETH (best available: "
+                                 f"{self.w3.from_wei(max(best, 0), 'ether')} ETH).")
+            wallet.in_flight += 1
+            wallet.holds[ident] = hold_id
+        try:
+            yield wallet
+        finally:
+            with self._lock:
+                wallet.in_flight -= 1
+                wallet.holds.pop(ident, None)
+            self._update(wallet, lambda ledger: ledger["h"].pop(hold_id, None))
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        rows = []
+        for w in self.wallets.values():
+            ledger = self.ledger(w)
+            rows.append({
+                "address": w.address,
+                "balance": self.w3.from_wei(ledger["b"], "ether"),
+                "reserved": self.w3.from_wei(_reserved(ledger, now), "ether"),
+                "in_flight": w.in_flight,
+                "pending_nonces": len(w.tx_manager.pending_transactions()),
+                "needs_top_up": ledger["b"] < self.min_balance,
+            })
+        return rows
+
+
+class _Uncovered(Exception):
+    pass
@@ -4,6 +4,11 @@ import logging
 from dotenv import load_dotenv
 from web3 import Web3
 from types import SimpleNamespace
+from config import SIGNER
+from signer import get_signer
+from tx_manager import get_transaction_manager
+from erc20 import ERC20Client
+from rpc_recorder import make_provider
 
 # Attempt to load environment variables from .env (for local development), but don't fail if missing
 load_dotenv()  # Silently fails if .env is not present, which is fine for Render
@@ -18,9 +23,10 @@ RPC_URL = os.getenv("NETWORK_RPC_URL")
 
 # Validate required environment variables
 required_vars = {
-    "WALLET_PRIVATE_KEY": PRIVATE_KEY,
     "NETWORK_RPC_URL": RPC_URL,
 }
+if not SIGNER["socket"]:
+    required_vars["WALLET_PRIVATE_KEY"] = PRIVATE_KEY
 missing_vars = [key for key, value in required_vars.items() if not value]
 if missing_vars:
     raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
@@ -28,6 +34,7 @@ if missing_vars:
 class CustomWalletProvider:
     def __init__(self, base_provider):
         self.base_provider = base_provider
+        self.signer = base_provider.signer
 
     def get_address(self):
         return self.base_provider.get_address()
@@ -56,6 +63,14 @@ class CustomWalletProvider:
             raise ValueError(f"Invalid recipient address: {to}")
         return self.base_provider.transfer_token(token_contract, to, amount)
 
+    def transfer_tokens(self, transfers):
+        for transfer in transfers:
+            if not Web3.is_checksum_address(transfer["token"]):
+                raise ValueError(f"Invalid token contract address: {transfer['token']}")
+            if not Web3.is_checksum_address(transfer["to"]):
+                raise ValueError(f"Invalid recipient address: {transfer['to']}")
+        return self.base_provider.transfer_tokens(transfers)
+
     def get_name(self):
         return "Custom Wallet Provider"
 
@@ -70,21 +85,28 @@ class CustomWalletProvider:
     def call_contract(self, contract_address, abi, function_name, args):
         return self.base_provider.call_contract(contract_address, abi, function_name, args)
 
+    def sign_transactions(self, txs):
+        return self.signer.sign_transactions(txs)
+
 class WalletProvider:
     def __init__(self, private_key, network_name, rpc_url):
-        self.private_key = private_key
         self.network_name = network_name
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.w3 = Web3(make_provider(rpc_url))
         if not self.w3.is_connected():
             raise ConnectionError("Failed to connect to the blockchain network. Check the RPC_URL.")
-        self.account = self.w3.eth.account.from_key(private_key)
+        # Shared with ChainPilotActions for the same key; with SIGNER_SOCKET the key never enters this process.
+        self.signer = get_signer(private_key)
+        self.address = self.signer.address
+        # Every send goes through the shared manager: pending-aware nonces, EIP-1559 fees and stuck-tx replacement.
+        self.tx_manager = get_transaction_manager(self.w3, self.signer)
+        self.erc20 = ERC20Client(self.w3, self.tx_manager)
 
     def get_address(self):
-        return self.account.address
+        return self.address
 
     def get_balance(self):
         try:
-            balance = self.w3.eth.get_balance(self.account.address)
+            balance = self.w3.eth.get_balance(self.address)
             return {"ETH": self.w3.from_wei(balance, 'ether')}
         except Exception as e:
             logging.error("Error getting balance: %s", e)
@@ -102,47 +124,57 @@ class WalletProvider:
                 'to': Web3.to_checksum_address(to),
                 'value': self.w3.to_wei(value, 'ether'),
                 'gas': 21000,
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
                 'chainId': self.w3.eth.chain_id
             }
-            signed_tx = self.w3.eth.account.sign_transaction(tx, self.private_key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            logging.info(f"Transferred {value} ETH to {to}, tx hash: {tx_hash.hex()}")
-            return {"status": "success", "transaction_hash": tx_hash.hex()}
+            tx_hash = self.tx_manager.send(tx)
+            logging.info(f"Transferred {value} ETH to {to}, tx hash: {tx_hash}")
+            return {"status": "success", "transaction_hash": tx_hash}
         except Exception as e:
             logging.error(f"Transfer failed: {e}")
             return {"status": "error", "message": str(e)}
 
     def transfer_token(self, token_contract, to, amount):
         try:
-            logging.warning("Token transfer not implemented: requires TokenABI.json and contract deployment.")
-            return {"status": "error", "message": "Token transfer not implemented in wallet provider."}
+            return self.erc20.transfer(token_contract, to, amount)
+        except ValueError as ve:
+            logging.warning(f"Token transfer rejected: {ve}")
+            return {"status": "error", "message": str(ve)}
         except Exception as e:
             logging.error(f"Token transfer failed: {e}")
             return {"status": "error", "message": str(e)}
 
+    def transfer_tokens(self, transfers):
+        """Send a list of {"token", "to", "amount"} transfers, across one or more tokens, as a single batch."""
+        try:
+            return {"status": "success", "results": self.erc20.batch_transfer(transfers)}
+        except ValueError as ve:
+            logging.warning(f"Batch token transfer rejected: {ve}")
+            return {"status": "error", "message": str(ve)}
+        except Exception as e:
+            logging.error(f"Batch token transfer failed: {e}")
+            return {"status": "error", "message": str(e)}
+
     def call_contract(self, contract_address, abi, function_name, args):
         try:
             contract = self.w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=abi)
-            tx = getattr(contract.functions, function_name)(*args).build_transaction({
-                'from': self.account.address,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                'gasPrice': self.w3.eth.gas_price,
+            tx = {
+                'from': self.address,
+                'to': contract.address,
+                'data': contract.encode_abi(function_name, args=args),
+                'value': 0,
                 'chainId': self.w3.eth.chain_id
-            })
-            signed_tx = self.account.sign_transaction(tx)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            logging.info(f"Called {function_name} on contract {contract_address}, tx hash: {tx_hash.hex()}")
-            return tx_hash.hex()
+            }
+            tx['gas'] = self.w3.eth.estimate_gas(tx)
+            tx_hash = self.tx_manager.send(tx)
+            logging.info(f"Called {function_name} on contract {contract_address}, tx hash: {tx_hash}")
+            return tx_hash
         except Exception as e:
             logging.error(f"Contract call failed: {e}")
             return f"Error: {e}"
 
     def sign_message(self, message):
         try:
-            signed_message = self.account.sign_message(self.w3.solidity_keccak(['string'], [message]))
-            return signed_message.signature.hex()
+            return self.signer.sign_message(message)
         except Exception as e:
             logging.error(f"Message signing failed: {e}")
             return f"Error: {e}"